@@ -14,6 +14,8 @@ import logging
 from os import fdopen, dup
 import sys
 
+# imported first to record import times of everything else, see the module
+from atomic_reactor.profiling import startup_profiler  # noqa
 from atomic_reactor.version import __version__  # noqa
 
 from osbs.constants import ATOMIC_REACTOR_LOGGING_FMT, USER_WARNING_LEVEL
@@ -0,0 +1,164 @@
+"""
+Copyright (c) 2026 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+
+
+Cold start benchmark of the atomic-reactor tasks
+
+Each task from atomic_reactor.cli.task is started in a fresh Python process
+with startup profiling turned on and is stopped when it would start working:
+the CLI modules are imported and the plugins of the task are loaded. A task
+goes over budget when this takes longer than its import budget.
+
+    python3 -m atomic_reactor.cli.benchmark [--budget SECONDS]
+        [--task-budget TASK=SECONDS ...] [--runs N] [TASK ...]
+
+Exit code is 1 when any task goes over budget or fails to start.
+"""
+import argparse
+import inspect
+import json
+import os
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional, Sequence
+
+from atomic_reactor.constants import PROFILE_STARTUP_ENV, STARTUP_IMPORT_BUDGET
+
+BENCHMARK_MODULE = "atomic_reactor.cli.benchmark"
+
+
+def get_task_names() -> List[str]:
+    """Get CLI names of all the tasks"""
+    from atomic_reactor.cli import task
+
+    return sorted(
+        name.replace("_", "-")
+        for name, func in inspect.getmembers(task, inspect.isfunction)
+        if func.__module__ == task.__name__
+    )
+
+
+def measure_task(task_name: str) -> Dict[str, Any]:
+    """Start a task up to the point where it would start working
+
+    Must be called in a fresh process with startup profiling turned on.
+
+    :param task_name: str, CLI name of the task
+    :return: dict, startup profile summary with startup_time in addition
+    """
+    from atomic_reactor.profiling import startup_profiler
+    from atomic_reactor.cli import main, task  # noqa: F401, imported like the entry point does
+    from atomic_reactor.plugin import PluginsRunner
+    from atomic_reactor.tasks.common import Task, TaskParams
+
+    startup_profiler.mark("cli_imported")
+
+    # find out which Task the CLI function runs, without running it
+    task_classes = []
+
+    def record_task(self, *args, **kwargs):
+        task_classes.append(type(self))
+
+    Task.run = record_task
+    TaskParams.from_cli_args = classmethod(lambda cls, args: None)
+    getattr(task, task_name.replace("-", "_"))({})
+
+    for task_class in task_classes:
+        plugins_conf = getattr(task_class, "plugins_conf", None)
+        if plugins_conf:
+            PluginsRunner(None, plugins_conf)
+    startup_profiler.mark("plugins_loaded")
+
+    return {"startup_time": startup_profiler.elapsed(), **startup_profiler.summary()}
+
+
+def run_task_benchmark(task_name: str, runs: int) -> Dict[str, Any]:
+    """Measure cold start of a task in new processes, keep the fastest run
+
+    :param task_name: str, CLI name of the task
+    :param runs: int, number of runs
+    :return: dict, result of measure_task
+    """
+    env = {**os.environ, PROFILE_STARTUP_ENV: "1"}
+    results = []
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, "-m", BENCHMARK_MODULE, "--measure", task_name], env=env
+        )
+        # the summary is printed last, in case anything else is printed while starting up
+        results.append(json.loads(output.splitlines()[-1]))
+    return min(results, key=lambda result: result["startup_time"])
+
+
+def _parse_task_budget(value: str) -> Dict[str, float]:
+    task_name, sep, seconds = value.partition("=")
+    try:
+        if not sep:
+            raise ValueError(value)
+        return {task_name.replace("_", "-"): float(seconds)}
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"expected TASK=SECONDS, got {value!r}") from e
+
+
+def parse_args(args: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog=f"python3 -m {BENCHMARK_MODULE}",
+        description="Measure cold start of atomic-reactor tasks.",
+    )
+    parser.add_argument("tasks", metavar="TASK", nargs="*",
+                        help="tasks to measure, all by default")
+    parser.add_argument("--budget", metavar="SECONDS", type=float,
+                        default=STARTUP_IMPORT_BUDGET,
+                        help="import budget of every task (default: %(default)s)")
+    parser.add_argument("--task-budget", metavar="TASK=SECONDS", type=_parse_task_budget,
+                        action="append", default=[],
+                        help="import budget of a specific task, can be used multiple times")
+    parser.add_argument("--runs", metavar="N", type=int, default=3,
+                        help="number of runs of each task, the fastest one counts "
+                             "(default: %(default)s)")
+    # used internally to measure a single task in a new process
+    parser.add_argument("--measure", metavar="TASK", help=argparse.SUPPRESS)
+    return parser.parse_args(args)
+
+
+def main(args: Optional[Sequence[str]] = None) -> int:
+    parsed = parse_args(args)
+    if parsed.measure:
+        print(json.dumps(measure_task(parsed.measure)))
+        return 0
+
+    budgets = {}
+    for task_budget in parsed.task_budget:
+        budgets.update(task_budget)
+
+    over_budget = []
+    for task_name in parsed.tasks or get_task_names():
+        budget = budgets.get(task_name, parsed.budget)
+        try:
+            result = run_task_benchmark(task_name, parsed.runs)
+        except subprocess.CalledProcessError:
+            print(f"{task_name:40} failed to start")
+            over_budget.append(task_name)
+            continue
+        status = "ok"
+        if result["startup_time"] > budget:
+            status = "OVER BUDGET"
+            over_budget.append(task_name)
+        print(f"{task_name:40} {result['startup_time']:7.3f}s "
+              f"(budget {budget:.3f}s, {result['modules']} modules) {status}")
+        if status != "ok":
+            for package, import_time in list(result["packages"].items())[:5]:
+                print(f"    {package:36} {import_time:7.3f}s")
+
+    if over_budget:
+        print(f"tasks over budget or failed: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
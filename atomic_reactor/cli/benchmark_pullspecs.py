@@ -0,0 +1,129 @@
+"""
+Copyright (c) 2026 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+
+
+Benchmark of the pullspec heuristic on ClusterServiceVersion annotations
+
+Annotation strings are collected from CSV files, e.g. from a checkout of
+operator bundles, and searched for pullspecs by the reference
+candidate-by-candidate heuristic and by default_pullspec_heuristic, both
+with an empty and with a warm cache.
+
+    python3 -m atomic_reactor.cli.benchmark_pullspecs [--runs N] PATH [PATH ...]
+
+PATH is a CSV file or a directory searched for CSV files recursively.
+Exit code is 1 when the heuristics don't find the same pullspecs.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from ruamel.yaml import YAMLError
+
+from atomic_reactor.utils.operator import (NotOperatorCSV, OperatorCSV, _scan_pullspecs,
+                                           candidate_pullspec_heuristic,
+                                           default_pullspec_heuristic)
+
+BENCHMARK_MODULE = "atomic_reactor.cli.benchmark_pullspecs"
+
+
+def find_csv_files(paths: Sequence[str]) -> List[Path]:
+    """Find the YAML files to read CSVs from
+
+    :param paths: sequence of paths to files or directories
+    :return: list of paths to files
+    """
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob("*") if p.suffix in (".yaml", ".yml")))
+        else:
+            files.append(path)
+    return files
+
+
+def collect_annotation_texts(files: Sequence[Path]) -> List[str]:
+    """Get all the string values of annotations in the CSVs
+
+    Files which are not CSVs are skipped.
+
+    :param files: sequence of paths to YAML files
+    :return: list of strings
+    """
+    texts = []
+    for path in files:
+        try:
+            csv = OperatorCSV.from_file(str(path))
+        except (NotOperatorCSV, YAMLError):
+            continue
+        for annotations in csv._find_all_annotations(csv.data):
+            texts.extend(str(value) for value in annotations.values() if isinstance(value, str))
+    return texts
+
+
+def time_heuristic(heuristic: Callable[[str], list], texts: Sequence[str], runs: int,
+                   clear_cache: bool = True) -> Tuple[float, list]:
+    """Run a heuristic on all the texts, keep the fastest run
+
+    :param heuristic: callable, the pullspec heuristic
+    :param texts: sequence of strings to search
+    :param runs: int, number of runs
+    :param clear_cache: bool, clear the cache of default_pullspec_heuristic before each run
+    :return: tuple, seconds taken by the fastest run and the found pullspecs
+    """
+    best = None
+    results: list = []
+    for _ in range(runs):
+        if clear_cache:
+            _scan_pullspecs.cache_clear()
+        start = time.perf_counter()
+        results = [heuristic(text) for text in texts]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best or 0.0, results
+
+
+def parse_args(args: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog=f"python3 -m {BENCHMARK_MODULE}",
+        description="Measure how long it takes to find pullspecs in CSV annotations.",
+    )
+    parser.add_argument("paths", metavar="PATH", nargs="+",
+                        help="CSV files or directories with CSV files")
+    parser.add_argument("--runs", metavar="N", type=int, default=5,
+                        help="number of runs, the fastest one counts (default: %(default)s)")
+    return parser.parse_args(args)
+
+
+def main(args: Optional[Sequence[str]] = None) -> int:
+    parsed = parse_args(args)
+    texts = collect_annotation_texts(find_csv_files(parsed.paths))
+    print(f"{len(texts)} annotation strings, {sum(map(len, texts))} characters")
+
+    reference_time, expected = time_heuristic(candidate_pullspec_heuristic, texts, parsed.runs)
+    cold_time, found = time_heuristic(default_pullspec_heuristic, texts, parsed.runs)
+    warm_time, _ = time_heuristic(default_pullspec_heuristic, texts, parsed.runs,
+                                  clear_cache=False)
+
+    pullspecs = sum(map(len, found))
+    for name, seconds in (("candidates (reference)", reference_time),
+                          ("scan", cold_time),
+                          ("scan, cached", warm_time)):
+        speedup = reference_time / seconds if seconds else float("inf")
+        print(f"{name:24} {seconds:9.4f}s {speedup:8.1f}x  {pullspecs} pullspecs")
+
+    if found != expected:
+        mismatches = sum(1 for a, b in zip(found, expected) if a != b)
+        print(f"pullspecs differ from the reference in {mismatches} annotation strings")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -42,3 +42,5 @@ def remote_hosts_unlocking_recovery(job_args: dict) -> None:
                 if not osbs.build_not_finished(prid):
                     logger.info('prid: %s finished, will unlock slot: %s', prid, slot)
                     host.unlock(slot, prid)
+
+        platform_pool.close()
@@ -14,6 +14,7 @@ import osbs
 
 import atomic_reactor
 from atomic_reactor.cli import parser
+from atomic_reactor.profiling import startup_profiler
 from atomic_reactor.util import setup_introspection_signal_handler
 
 
@@ -23,6 +24,8 @@ def _process_global_args(args: dict) -> dict:
 
     verbose = task_args.pop("verbose")
     quiet = task_args.pop("quiet")
+    # profiling is already set up when atomic_reactor is imported
+    task_args.pop("profile_startup")
     # Note: the version argument is not stored by argparse (because it has the 'version' action)
 
     if verbose:
@@ -44,11 +47,17 @@ def run():
     logging.captureWarnings(True)
     setup_introspection_signal_handler()
 
+    startup_profiler.mark("cli_started")
     args = parser.parse_args()
     task = args.pop("func")
     task_args = _process_global_args(args)
+    startup_profiler.mark("arguments_parsed")
 
-    return task(task_args)
+    try:
+        return task(task_args)
+    finally:
+        # in case the task didn't get to running plugins
+        startup_profiler.finish()
 
 
 if __name__ == '__main__':
@@ -11,7 +11,8 @@ from typing import Optional, Sequence
 
 import pkg_resources
 
-from atomic_reactor.constants import PROG, DESCRIPTION, REACTOR_CONFIG_FULL_PATH
+from atomic_reactor.constants import (PROG, DESCRIPTION, REACTOR_CONFIG_FULL_PATH,
+                                      PROFILE_STARTUP_OPTION)
 from atomic_reactor.cli import task, job
 
 
@@ -177,6 +178,13 @@ def _add_global_args(parser: argparse.ArgumentParser) -> None:
         action="store_true",
         help="be more verbose, include debug messages in output",
     )
+    # the option is looked for in sys.argv already when atomic_reactor is imported,
+    # see atomic_reactor.profiling
+    parser.add_argument(
+        PROFILE_STARTUP_OPTION,
+        action="store_true",
+        help="log how long the startup took, including the time spent on imports",
+    )
 
 
 def _add_common_task_args(task_parser: argparse.ArgumentParser) -> None:
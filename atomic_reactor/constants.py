@@ -72,6 +72,10 @@ TOOLS_USED = (
 )
 
 DEFAULT_DOWNLOAD_BLOCK_SIZE = 10 * 1024 * 1024  # 10Mb
+# max number of files downloaded at the same time by DownloadManager
+DOWNLOAD_MAX_WORKERS = 8
+# max number of concurrent downloads from a single host
+DOWNLOAD_MAX_CONNECTIONS_PER_HOST = 4
 
 IMAGE_TYPE_DOCKER_ARCHIVE = 'docker-archive'
 IMAGE_TYPE_OCI = 'oci'
@@ -157,9 +161,55 @@ KOJI_RESERVE_RETRY_DELAY = 2
 KOJI_MAX_RETRIES = 120
 KOJI_RETRY_INTERVAL = 60
 KOJI_OFFLINE_RETRY_INTERVAL = 120
+# max attempts to upload a file to koji, failed uploads are resumed (see upload_file_resumable)
+KOJI_UPLOAD_ATTEMPTS = 3
+# max number of calls sent in a single koji multicall request
+KOJI_MULTICALL_BATCH_SIZE = 500
+# max number of concurrent HEAD requests when looking up SRPM URLs
+SRPM_URL_CHECK_MAX_WORKERS = 10
 # max retries for locking remote host slots
 REMOTE_HOST_MAX_RETRIES = 10
 REMOTE_HOST_RETRY_INTERVAL = 5
+# max number of images inspected at the same time by ImageUtil.get_inspect_for_images
+IMAGE_INSPECT_MAX_WORKERS = 8
+# max number of independent plugins run at the same time by PluginsRunner
+PLUGINS_MAX_WORKERS = 4
+# max seconds PluginsRunner waits for running plugins before it handles pending signals
+PLUGINS_WAIT_INTERVAL = 1
+# seconds between filesystem usage samples taken by FSWatcher
+FS_WATCHER_INTERVAL = 0.1
+# max number of filesystem usage samples kept by FSWatcher (only changes are kept)
+FS_WATCHER_HISTORY_SIZE = 2000
+# max number of filesystem usage samples in the report exported to annotations
+FS_WATCHER_REPORT_SAMPLES = 50
+# size (in bytes) of the buffer used to read files when computing checksums
+CHECKSUM_READ_SIZE = 1024 * 1024
+# max number of files checksummed at the same time by get_checksums_for_files
+CHECKSUM_MAX_WORKERS = 4
+# max number of files with checksums kept in the checksum cache
+CHECKSUM_CACHE_MAX_ENTRIES = 1024
+# size (in bytes) of the blocks compressed in parallel by ParallelGzipWriter
+PARALLEL_GZIP_BLOCK_SIZE = 1024 * 1024
+# max number of blocks compressed at the same time by ParallelGzipWriter
+PARALLEL_GZIP_MAX_WORKERS = 4
+# max number of pullspecs resolved at the same time by pin_operator_digest
+PIN_OPERATOR_DIGEST_MAX_WORKERS = 8
+# number of texts with pullspecs found by default_pullspec_heuristic kept in its cache
+PULLSPEC_SCAN_CACHE_SIZE = 4096
+
+# environment variable and CLI option turning on startup profiling
+PROFILE_STARTUP_ENV = 'ATOMIC_REACTOR_PROFILE_STARTUP'
+PROFILE_STARTUP_OPTION = '--profile-startup'
+# max seconds a task may spend on imports before running (see cli/benchmark.py)
+STARTUP_IMPORT_BUDGET = 5.0
+# max total size (in bytes) of registry responses kept in the registry cache
+REGISTRY_CACHE_MAX_SIZE = 64 * 1024 * 1024
+# how many seconds a registry response for a tag reference is kept in the registry cache
+REGISTRY_CACHE_TAG_TTL = 60
+# max number of bytes read from the build process output at once
+BUILD_OUTPUT_READ_SIZE = 64 * 1024
+# number of build output lines written to the platform build log at once
+BUILD_LOG_BATCH_SIZE = 200
 # max retries for subprocesses (see utils.retries.run_cmd())
 SUBPROCESS_MAX_RETRIES = 5
 # the factor for the exponential backoff series - 5, 10, 20, 40, 80 seconds of waiting
@@ -215,6 +265,8 @@ HERMETO_FOR_OUTPUT_DIR_OPT_FILE = "hermeto_for_output_dir_opt.txt"
 HERMETO_INCLUDE_GIT_DIR_FILE = "hermeto_include_git_dir.txt"
 HERMETO_SINGLE_REMOTE_SOURCE_NAME = "remote-source"
 HERMETO_SBOM_JSON = "bom.json"
+# max number of threads scanning the cloned repository for unsafe symlinks
+HERMETO_SANDBOX_SCAN_WORKERS = 4
 
 # koji osbs_build metadata
 KOJI_KIND_IMAGE_BUILD = 'container_build'
@@ -6,8 +6,11 @@ This software may be modified and distributed under the terms
 of the BSD license. See the LICENSE file for details.
 """
 import logging
+import os
 import reflink
 
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 import shutil
 from shutil import copytree
@@ -34,10 +37,50 @@ def reflink_copy(src, dst, *, follow_symlinks=True):
         reflink.reflink(str(src), str(dst))
 
 
+def hardlink_copy(src, dst, *, follow_symlinks=True):
+    """Hardlink src to dst, fall back to a regular copy if that is not possible.
+
+    Only suitable for files which are never modified after being copied, since the
+    source and the destination share the content.
+    """
+    try:
+        os.link(src, dst, follow_symlinks=follow_symlinks)
+    except OSError:
+        # e.g. cross-device link, or too many links to the source file
+        shutil.copy2(src, dst, follow_symlinks=follow_symlinks)
+    return dst
+
+
+@dataclass
+class CopyStats:
+    """Number of files and bytes copied into a platform-specific directory."""
+    files: int = 0
+    bytes: int = 0
+
+
+def _counting_copy(copy_method: Callable, stats: CopyStats) -> Callable:
+    def copy(src, dst, *, follow_symlinks=True):
+        result = copy_method(src, dst, follow_symlinks=follow_symlinks)
+        stats.files += 1
+        stats.bytes += os.stat(src, follow_symlinks=follow_symlinks).st_size
+        return result
+
+    return copy
+
+
 class DockerfileNotExist(Exception):
     """Dockerfile does not exist."""
 
 
+class PlatformActionError(Exception):
+    """An action applied in parallel failed for one or more platforms."""
+
+    def __init__(self, errors: Dict[str, Exception]):
+        self.errors = errors
+        details = "; ".join(f"{platform}: {error!r}" for platform, error in errors.items())
+        super().__init__(f"Action failed for platforms {', '.join(errors)}: {details}")
+
+
 class BuildDirIsNotInitialized(Exception):
     """Build directories are not initialized."""
 
@@ -218,7 +261,9 @@ class RootBuildDir(object):
         """Get the build directory for the specified platform."""
         return BuildDir(self.path / platform, platform)
 
-    def for_each_platform(self, action: Callable[[BuildDir], T]) -> Dict[str, T]:
+    def for_each_platform(
+        self, action: Callable[[BuildDir], T], *, parallel: bool = False
+    ) -> Dict[str, T]:
         """Apply an action on every platform-specific directory.
 
         The action callable will be applied to the platform-specific
@@ -231,22 +276,48 @@ class RootBuildDir(object):
         to the caller. As a result, the action will not be applied to the rest
         of the platforms.
 
+        In parallel mode, the action is applied to all platforms at the same
+        time in separate threads, so it must be safe to run concurrently. The
+        action is always applied to every platform; if it fails for any of them,
+        PlatformActionError holding the error for each failed platform is raised.
+
         :param action: a callable object that will be applied on every
             platform-specific directory. This callable must accept one single
             argument in BuildDir type, and it can return data in any type.
         :type action: Callable
+        :param bool parallel: apply the action to all platforms concurrently.
         :return: a mapping from platform to the value returned from the
             function which is called for that platform.
         :rtype: dict[str, any]
+        :raise PlatformActionError: if the action fails in parallel mode.
         """
         if not self.has_sources:
             raise BuildDirIsNotInitialized()
         results: Dict[str, T] = {}
-        for platform in self.platforms:
-            results[platform] = action(self.platform_dir(platform))
+        if not parallel or len(self.platforms) < 2:
+            for platform in self.platforms:
+                results[platform] = action(self.platform_dir(platform))
+            return results
+
+        errors: Dict[str, Exception] = {}
+        with ThreadPoolExecutor(max_workers=len(self.platforms)) as executor:
+            futures = {
+                platform: executor.submit(action, self.platform_dir(platform))
+                for platform in self.platforms
+            }
+            for platform, future in futures.items():
+                try:
+                    results[platform] = future.result()
+                except Exception as e:  # pylint: disable=broad-except
+                    logger.error("Action failed for platform %s: %r", platform, e)
+                    errors[platform] = e
+        if errors:
+            raise PlatformActionError(errors) from next(iter(errors.values()))
         return results
 
-    def for_all_platforms_copy(self, action: FileCreationFunc) -> List[Path]:
+    def for_all_platforms_copy(
+        self, action: FileCreationFunc, *, immutable: bool = False
+    ) -> List[Path]:
         """Ensure created files are present in all platform-specific directories.
 
         ``for_all_copy`` accepts either absolute or relative path returned from
@@ -259,6 +330,10 @@ class RootBuildDir(object):
             argument in type BuildDir, and returns an iterable object that
             yields paths of the created files.
         :type action: callable
+        :param bool immutable: the created files are never modified afterwards.
+            If the filesystem does not support reflinks, such files are
+            hardlinked to the other platform-specific directories instead of
+            being copied.
         :return: the list of absolute paths of the created files.
         :rtype: list[pathlib.Path]
         """
@@ -291,20 +366,40 @@ class RootBuildDir(object):
                 )
             the_new_files.append(file_path)
 
+        # a file inside a created directory is copied together with the directory
+        created = set(the_new_files)
+        files_to_copy = [
+            file_path for file_path in dict.fromkeys(the_new_files)
+            if created.isdisjoint(file_path.parents)
+        ]
+
         copy_method = shutil.copy2
         if reflink.supported_at(self.path):
             copy_method = reflink_copy
+        elif immutable:
+            copy_method = hardlink_copy
         logger.debug("copy method used for all platforms copy: %s", copy_method.__name__)
 
-        for platform in self.platforms[1:]:
-            for src_file in the_new_files:
+        def copy_to_platform(platform: str) -> CopyStats:
+            stats = CopyStats()
+            counting_copy = _counting_copy(copy_method, stats)
+            for src_file in files_to_copy:
                 dest = self.path / platform / src_file.relative_to(build_dir.path)
 
                 if src_file.is_dir():
-                    copytree(src_file, dest, symlinks=True, copy_function=copy_method)
+                    copytree(src_file, dest, symlinks=True, copy_function=counting_copy)
                 else:
                     dest.parent.mkdir(parents=True, exist_ok=True)
-                    copy_method(src_file, dest, follow_symlinks=False)
+                    counting_copy(src_file, dest, follow_symlinks=False)
+            return stats
+
+        target_platforms = self.platforms[1:]
+        if target_platforms:
+            with ThreadPoolExecutor(max_workers=len(target_platforms)) as executor:
+                all_stats = executor.map(copy_to_platform, target_platforms)
+                for platform, stats in zip(target_platforms, all_stats):
+                    logger.debug("copied %d files (%d bytes) to the %s build directory",
+                                 stats.files, stats.bytes, platform)
 
         return the_new_files
 
@@ -319,6 +414,11 @@ class ContextDir:
         self._path = path
         self.workflow_json = path / "workflow.json"
 
+    @property
+    def path(self) -> Path:
+        """The context directory itself."""
+        return self._path
+
     def get_platform_dir(self, platform: str) -> Path:
         """Get the directory specific to the specified platform.
 
@@ -334,6 +434,15 @@ class ContextDir:
         platform_dir.mkdir(exist_ok=True)
         return platform_dir
 
+    def get_workflow_field_json(self, name: str) -> Path:
+        """Get the file holding a workflow data field saved apart from workflow.json."""
+        return self._path / f"workflow.{name}.json"
+
     def get_platform_build_log(self, platform: str) -> Path:
         """Get platform-specific build log file."""
         return self._path / f"{platform}-build.log"
+
+    @property
+    def registry_cache_dir(self) -> Path:
+        """The directory holding registry responses cached by previous tasks."""
+        return self._path / "registry-cache"
@@ -6,16 +6,23 @@ This software may be modified and distributed under the terms
 of the BSD license. See the LICENSE file for details.
 """
 import base64
+import contextvars
 import hashlib
 import logging
 import os
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List
+
 import requests
 from urllib.parse import urlparse
 
 from atomic_reactor.util import get_retrying_requests_session
 from atomic_reactor.constants import (
     DEFAULT_DOWNLOAD_BLOCK_SIZE,
+    DOWNLOAD_MAX_CONNECTIONS_PER_HOST,
+    DOWNLOAD_MAX_WORKERS,
     HTTP_BACKOFF_FACTOR,
     HTTP_MAX_RETRIES,
     CACHITO_HASH_ALG,
@@ -33,6 +40,12 @@ def download_url(url, dest_dir, insecure=False, session=None, dest_filename=None
     To download to a temporary directory, use:
       f = download_url(url, tempfile.mkdtemp())
 
+    When streaming of the content fails, the download is retried. If the server
+    supports range requests, the retry resumes from the already downloaded part
+    of the file, otherwise the file is downloaded again from the beginning.
+    The content is requested without any content encoding, so that the size of
+    the downloaded part is also the offset into the file on the server.
+
     :param url: URL to download from
     :param dest_dir: existing directory to create file in
     :param insecure: bool, whether to perform TLS checks
@@ -57,14 +70,40 @@ def download_url(url, dest_dir, insecure=False, session=None, dest_filename=None
 
     checksums = {algo: hashlib.new(algo) for algo in expected_checksums}
     cachito_hasher = hashlib.new(CACHITO_HASH_ALG)
+    cachito_digest = None
+    downloaded = 0
+    resumable = True
 
     for attempt in range(HTTP_MAX_RETRIES + 1):
-        response = session.get(url, stream=True, verify=not insecure)
+        headers = {'Accept-Encoding': 'identity'}
+        if downloaded and resumable:
+            headers['Range'] = 'bytes={}-'.format(downloaded)
+
+        response = session.get(url, stream=True, verify=not insecure, headers=headers)
+
+        if downloaded and not _resumes_at(response, downloaded):
+            logger.debug('resuming download of %s is not supported, starting over', url)
+            downloaded = 0
+            checksums = {algo: hashlib.new(algo) for algo in expected_checksums}
+            cachito_hasher = hashlib.new(CACHITO_HASH_ALG)
+
+            if 'Range' in headers and response.status_code != requests.codes.ok:
+                # partial or 416 response, request the whole file instead
+                response.close()
+                del headers['Range']
+                response = session.get(url, stream=True, verify=not insecure,
+                                       headers=headers)
+
         response.raise_for_status()
+
+        if verify_cachito_digest and not downloaded:
+            cachito_digest = response.headers.get('Digest')
+
         try:
-            with open(dest_path, 'wb') as f:
+            with open(dest_path, 'ab' if downloaded else 'wb') as f:
                 for chunk in response.iter_content(chunk_size=DEFAULT_DOWNLOAD_BLOCK_SIZE):
                     f.write(chunk)
+                    downloaded += len(chunk)
                     for checksum in checksums.values():
                         checksum.update(chunk)
 
@@ -79,20 +118,24 @@ def download_url(url, dest_dir, insecure=False, session=None, dest_filename=None
 
             if verify_cachito_digest:
                 logger.info('will verify cachito digest')
-                if 'Digest' in response.headers:
+                if cachito_digest:
                     logger.info('digest is in cachito response header')
 
                     digest = base64.b64encode(cachito_hasher.digest()).decode("utf-8")
                     digest_str = f'{CACHITO_ALG_STR}={digest}'
-                    if digest_str != response.headers['Digest']:
+                    if digest_str != cachito_digest:
                         raise ValueError(
                             'Cachito archive digest "{}" does not match expected digest "{}"'
-                            .format(digest_str, response.headers['Digest']))
+                            .format(digest_str, cachito_digest))
                     else:
                         logger.info('digest for cachito archive is correct')
 
             break
         except requests.exceptions.RequestException:
+            # the server may still encode the content, then the size of the
+            # decoded part doesn't tell where to resume
+            encoding = response.headers.get('Content-Encoding', 'identity')
+            resumable = encoding == 'identity'
             if attempt < HTTP_MAX_RETRIES:
                 time.sleep(HTTP_BACKOFF_FACTOR * (2 ** attempt))
             else:
@@ -100,3 +143,105 @@ def download_url(url, dest_dir, insecure=False, session=None, dest_filename=None
 
     logger.debug('download finished: %s', dest_path)
     return dest_path
+
+
+def _resumes_at(response, offset):
+    """Check whether the response is the content of the file starting at offset
+
+    :param response: requests.Response, response to a range request
+    :param offset: int, expected start of the returned range
+    :return: bool
+    """
+    if response.status_code != requests.codes.partial_content:
+        return False
+    # Content-Range: bytes <start>-<end>/<size>
+    content_range = response.headers.get('Content-Range', '')
+    unit, _, byte_range = content_range.partition(' ')
+    start, _, _ = byte_range.partition('-')
+    return unit == 'bytes' and start == str(offset)
+
+
+class DownloadManager(object):
+    """Download files concurrently
+
+    Downloads are spread over a pool of worker threads, and the number of
+    concurrent downloads from a single host is limited. Every file is downloaded
+    by download_url, so retries, resuming and checksum verification behave the
+    same way as for a single download.
+
+    Use as a context manager to make sure all worker threads are finished:
+
+      with DownloadManager(insecure=insecure) as manager:
+          paths = manager.download_all([{'url': url, 'dest_dir': dest_dir}])
+    """
+
+    def __init__(self, session=None, insecure=False, max_workers=DOWNLOAD_MAX_WORKERS,
+                 max_connections_per_host=DOWNLOAD_MAX_CONNECTIONS_PER_HOST):
+        """
+        :param session: optional existing requests session to use
+        :param insecure: bool, whether to perform TLS checks
+        :param max_workers: int, max number of files downloaded at the same time
+        :param max_connections_per_host: int, max number of concurrent downloads
+                                         from a single host
+        """
+        self.session = session or get_retrying_requests_session()
+        self.insecure = insecure
+        self.max_connections_per_host = max_connections_per_host
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Wait for scheduled downloads and release worker threads"""
+        self._executor.shutdown(wait=True)
+
+    def _host_semaphore(self, url) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.BoundedSemaphore(
+                    self.max_connections_per_host)
+            return self._host_semaphores[host]
+
+    def _download(self, url, dest_dir, **kwargs) -> str:
+        with self._host_semaphore(url):
+            return download_url(url, dest_dir, insecure=self.insecure, session=self.session,
+                                **kwargs)
+
+    def submit(self, url, dest_dir, dest_filename=None, expected_checksums=None,
+               verify_cachito_digest=False) -> Future:
+        """Schedule download of a file
+
+        Parameters have the same meaning as for download_url.
+
+        :return: Future, with path of downloaded file as result
+        """
+        # in a copy of the current context, to count the requests for the running plugin
+        return self._executor.submit(contextvars.copy_context().run, self._download,
+                                     url, dest_dir,
+                                     dest_filename=dest_filename,
+                                     expected_checksums=expected_checksums,
+                                     verify_cachito_digest=verify_cachito_digest)
+
+    def download_all(self, downloads: Iterable[Dict[str, Any]]) -> List[str]:
+        """Download all files at once
+
+        When any download fails, the remaining pending downloads are cancelled
+        and the error is raised.
+
+        :param downloads: iterable of dicts, keyword arguments for submit
+        :return: list, paths of downloaded files in the order of downloads
+        """
+        futures = [self.submit(**download) for download in downloads]
+        try:
+            return [future.result() for future in futures]
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
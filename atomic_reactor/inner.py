@@ -16,9 +16,13 @@ import threading
 import os
 import time
 import re
+import tempfile
+from collections import deque
 from dataclasses import dataclass, field, fields
+from pathlib import Path
 from textwrap import dedent
-from typing import Any, Callable, Dict, Final, List, Optional, Union, Tuple
+from typing import (Any, Callable, ClassVar, Deque, Dict, Final, FrozenSet, List, Optional,
+                    Set, Union, Tuple)
 
 from dockerfile_parse import DockerfileParser
 
@@ -28,16 +32,21 @@ from atomic_reactor.constants import (
     DOCKER_STORAGE_TRANSPORT_NAME,
     REACTOR_CONFIG_FULL_PATH,
     DOCKERFILE_FILENAME,
+    FS_WATCHER_HISTORY_SIZE,
+    FS_WATCHER_REPORT_SAMPLES,
+    FS_WATCHER_INTERVAL,
 )
 from atomic_reactor.types import ISerializer, RpmComponent
 from atomic_reactor.util import (DockerfileImages,
-                                 base_image_is_custom, print_version_of_tools, validate_with_schema)
+                                 base_image_is_custom, print_version_of_tools)
 from atomic_reactor.config import Configuration, get_openshift_session
 from atomic_reactor.source import Source, DummySource
 from atomic_reactor.utils import imageutil
 # from atomic_reactor import get_logging_encoding
 from osbs.api import OSBS
+from osbs.exceptions import OsbsValidationException
 from osbs.utils import ImageName
+from osbs.utils import yaml as osbs_yaml
 
 
 logger = logging.getLogger(__name__)
@@ -212,24 +221,52 @@ class TagConf(ISerializer):
 
 class FSWatcher(threading.Thread):
     """
-    Poll the filesystem every second in the background and keep a record of highest usage.
+    Poll the filesystems used by the build in the background.
+
+    Keeps a record of highest usage of the root filesystem, highest usage of
+    every watched filesystem while each plugin was running, lowest, highest
+    and last usage of every watched filesystem and a time series of usage
+    changes in a ring buffer.
     """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, mounts: Optional[Dict[str, str]] = None,
+                 interval: float = FS_WATCHER_INTERVAL,
+                 history_size: int = FS_WATCHER_HISTORY_SIZE, **kwargs):
+        """
+        :param mounts: dict, label -> path on the filesystem to watch, the root
+            filesystem is always watched (with label "root")
+        :param interval: float, seconds between samples
+        :param history_size: int, max number of samples kept in the time series
+        """
         super(FSWatcher, self).__init__(*args, **kwargs)
         self.daemon = True  # exits whenever the process exits
+        self.mounts = {"root": "/", **(mounts or {})}
+        self.interval = interval
         self._lock = threading.Lock()
-        self._done = False
+        self._done = threading.Event()
         self._data = {}
+        self._start_time = time.monotonic()
+        # labels of the watched mounts, only one for each filesystem
+        self._watched: Optional[List[str]] = None
+        # label -> label of the watched mount on the same filesystem
+        self._same_as: Dict[str, str] = {}
+        self._totals: Dict[str, Dict[str, int]] = {}
+        # plugin name -> usage of each watched mount when the plugin started
+        self._running: Dict[str, Dict[str, Dict[str, int]]] = {}
+        # plugin name -> label -> highest usage while the plugin was running
+        self._plugin_peaks: Dict[str, Dict[str, Dict[str, int]]] = {}
+        # label -> "mb_used"/"inodes_used" -> lowest, highest and last usage
+        self._summary: Dict[str, Dict[str, Dict[str, int]]] = {}
+        self._series: Deque[Tuple] = deque(maxlen=history_size)
+        self._last_values: Optional[Tuple] = None
 
     def run(self):
         """ Overrides parent method to implement thread's functionality. """
         while True:  # make sure to run at least once before exiting
-            with self._lock:
-                self._update(self._data)
-            if self._done:
+            self._sample()
+            if self._done.is_set():
                 break
-            time.sleep(1)
+            self._done.wait(self.interval)
 
     def get_usage_data(self):
         """ Safely retrieve the most up to date results. """
@@ -237,20 +274,181 @@ class FSWatcher(threading.Thread):
             data_copy = self._data.copy()
         return data_copy
 
+    def get_usage_report(self, max_samples: int = FS_WATCHER_REPORT_SAMPLES) -> Dict[str, Any]:
+        """ Safely retrieve usage of all the watched filesystems.
+
+        The size of the report is bounded, the recorded changes of usage are
+        downsampled to at most max_samples samples.
+
+        :param max_samples: int, max number of samples in the series
+        :return: dict, with keys:
+            "mounts": label -> paths on the filesystem and its total size,
+            "plugins": plugin name -> label -> highest usage while the plugin
+                was running and how much it grew since the plugin started,
+            "summary": label -> lowest, highest and last usage,
+            "series": changes of usage, each sample starts with seconds since
+                the watcher was created; when there are more recorded changes
+                than max_samples, each sample holds the highest usage of a
+                period of consecutive changes and the time of the last one
+        """
+        with self._lock:
+            watched = list(self._watched or [])
+            mounts = {
+                label: {
+                    "paths": {
+                        other: path for other, path in self.mounts.items()
+                        if self._same_as.get(other) == label
+                    },
+                    **self._totals.get(label, {}),
+                }
+                for label in watched
+            }
+            plugins = {
+                name: {label: peak.copy() for label, peak in peaks.items()}
+                for name, peaks in self._plugin_peaks.items()
+            }
+            summary = {
+                label: {key: extremes.copy() for key, extremes in usage.items()}
+                for label, usage in self._summary.items()
+            }
+            samples = list(self._series)
+
+        fields = ["seconds"]
+        for label in watched:
+            fields += [f"{label}.mb_used", f"{label}.inodes_used"]
+        return {
+            "mounts": mounts,
+            "plugins": plugins,
+            "summary": summary,
+            "series": {
+                "interval": self.interval,
+                "fields": fields,
+                "recorded": len(samples),
+                "samples": self._downsample(samples, max_samples),
+            },
+        }
+
+    @staticmethod
+    def _downsample(samples: List[Tuple], max_samples: int) -> List[List]:
+        """
+        Merge consecutive samples, keep the highest values and the last time of each period
+
+        :param samples: list of samples, (seconds, value, ...)
+        :param max_samples: int, max number of samples to return
+        :return: list of samples, as lists
+        """
+        if len(samples) <= max_samples:
+            return [list(sample) for sample in samples]
+        downsampled = []
+        for i in range(max_samples):
+            period = samples[i * len(samples) // max_samples:(i + 1) * len(samples) // max_samples]
+            merged = [period[-1][0]]
+            for values in list(zip(*period))[1:]:
+                known = [value for value in values if value is not None]
+                merged.append(max(known) if known else None)
+            downsampled.append(merged)
+        return downsampled
+
+    @classmethod
+    def get_current_usage(cls) -> Optional[Dict[str, int]]:
+        """ Get the current usage, without updating the record of highest usage. """
+        usage = cls._update({})
+        return None if isinstance(usage, Exception) else usage
+
+    def plugin_started(self, name: str) -> None:
+        """ Attribute usage of the filesystems to the plugin from now on. """
+        usage = self._sample()
+        with self._lock:
+            self._running[name] = usage
+            self._record_plugin_peaks(name, usage)
+
+    def plugin_finished(self, name: str) -> None:
+        """ Stop attributing usage of the filesystems to the plugin. """
+        self._sample()
+        with self._lock:
+            self._running.pop(name, None)
+
     def finish(self):
         """ Signal background thread to exit next time it wakes up. """
-        with self._lock:  # just to be tidy; lock not really needed to set a boolean
-            self._done = True
+        self._done.set()
+
+    def _resolve_mounts(self) -> None:
+        watched = []
+        devices: Dict[int, str] = {}
+        for label, path in self.mounts.items():
+            try:
+                device = os.stat(path).st_dev
+            except OSError as e:
+                logger.debug("not watching filesystem usage of %s: %s", path, e)
+                continue
+            if device not in devices:
+                devices[device] = label
+                watched.append(label)
+            self._same_as[label] = devices[device]
+        self._watched = watched
 
-    @staticmethod
-    def _update(data):
-        try:
-            st = os.statvfs("/")
-        except Exception as e:
-            return e  # just for tests; we don't really need return value
+    def _sample(self) -> Dict[str, Dict[str, int]]:
+        """
+        Take a sample of usage of the watched filesystems and record it.
 
+        :return: dict, label -> current usage of the filesystem
+        """
+        with self._lock:
+            if self._watched is None:
+                self._resolve_mounts()
+            watched = list(self._watched)
+
+        usage = {}
+        for label in watched:
+            try:
+                usage[label] = self._get_usage(self.mounts[label])
+            except OSError as e:
+                logger.debug("failed to get filesystem usage of %s: %s", self.mounts[label], e)
+
+        with self._lock:
+            if "root" in usage:
+                self._merge_extremes(self._data, usage["root"])
+            for label, current in usage.items():
+                self._totals[label] = {
+                    "mb_total": current["mb_total"],
+                    "inodes_total": current["inodes_total"],
+                }
+            for name in self._running:
+                self._record_plugin_peaks(name, usage)
+            for label, current in usage.items():
+                summary = self._summary.setdefault(label, {})
+                for key in ("mb_used", "inodes_used"):
+                    extremes = summary.setdefault(key, {"min": current[key], "max": current[key]})
+                    extremes["min"] = min(extremes["min"], current[key])
+                    extremes["max"] = max(extremes["max"], current[key])
+                    extremes["last"] = current[key]
+
+            values = tuple(
+                usage.get(label, {}).get(key)
+                for label in watched for key in ("mb_used", "inodes_used")
+            )
+            # keep only changes, a filesystem which isn't used costs nothing
+            if values != self._last_values:
+                self._series.append((round(time.monotonic() - self._start_time, 3), *values))
+                self._last_values = values
+
+        return usage
+
+    def _record_plugin_peaks(self, name: str, usage: Dict[str, Dict[str, int]]) -> None:
+        peaks = self._plugin_peaks.setdefault(name, {})
+        for label, current in usage.items():
+            peak = peaks.setdefault(label, {})
+            start = self._running.get(name, {}).get(label, current)
+            for key in ("mb_used", "inodes_used"):
+                peak[key] = max(current[key], peak.get(key, 0))
+                added_key = key.replace("_used", "_added")
+                peak[added_key] = max(current[key] - start[key], peak.get(added_key, 0))
+
+    @staticmethod
+    def _get_usage(path: str) -> Dict[str, int]:
+        st = os.statvfs(path)
         mb = 1000 ** 2  # sadly storage is generally expressed in decimal units
-        new_data = dict(
+        return dict(
             mb_free=st.f_bfree * st.f_frsize // mb,
             mb_total=st.f_blocks * st.f_frsize // mb,
             mb_used=(st.f_blocks - st.f_bfree) * st.f_frsize // mb,
@@ -258,11 +456,22 @@ class FSWatcher(threading.Thread):
             inodes_total=st.f_files,
             inodes_used=st.f_files - st.f_ffree,
         )
+
+    @staticmethod
+    def _merge_extremes(data, new_data):
         for key in ["mb_total", "mb_used", "inodes_total", "inodes_used"]:
             data[key] = max(new_data[key], data.get(key, 0))
         for key in ["mb_free", "inodes_free"]:
             data[key] = min(new_data[key], data.get(key, float("inf")))
 
+    @classmethod
+    def _update(cls, data):
+        try:
+            new_data = cls._get_usage("/")
+        except Exception as e:
+            return e  # just for tests; we don't really need return value
+
+        cls._merge_extremes(data, new_data)
         return new_data
 
 
@@ -287,6 +496,9 @@ class ImageBuildWorkflowData(ISerializer):
     plugins_timestamps: Dict[str, str] = field(default_factory=dict)
     # Plugin name -> seconds
     plugins_durations: Dict[str, float] = field(default_factory=dict)
+    # Plugin name -> resources used while the plugin ran, see ResourceUsage.since,
+    # process-wide values include the usage of the plugins listed in concurrent_with
+    plugins_resources: Dict[str, Dict[str, Any]] = field(default_factory=dict)
     # Plugin name -> a string containing error message
     plugins_errors: Dict[str, str] = field(default_factory=dict)
     task_canceled: bool = False
@@ -323,6 +535,11 @@ class ImageBuildWorkflowData(ISerializer):
     # ]
     koji_upload_files: List[Dict[str, str]] = field(default_factory=list)
 
+    # Fields which may be large, load_from_dir loads them on first access
+    lazy_fields: ClassVar[FrozenSet[str]] = frozenset(
+        {"plugins_results", "image_components", "koji_upload_files"}
+    )
+
     @classmethod
     def load(cls, data: Dict[str, Any]):
         """Load workflow data from given input."""
@@ -351,6 +568,11 @@ class ImageBuildWorkflowData(ISerializer):
     def load_from_dir(cls, context_dir: ContextDir) -> "ImageBuildWorkflowData":
         """Load workflow data from the data directory.
 
+        Every field is parsed only once and validated by JSON schema before
+        the objects in it are restored. The fields listed in ``lazy_fields``
+        are saved in separate files, they are parsed and validated when they
+        are accessed for the first time.
+
         :param context_dir: a directory holding the files containing the serialized
             workflow data.
         :type context_dir: ContextDir
@@ -361,30 +583,128 @@ class ImageBuildWorkflowData(ISerializer):
             return cls()
 
         with open(context_dir.workflow_json, "r") as f:
-            file_content = f.read()
-
-        raw_data = json.loads(file_content)
-        validate_with_schema(raw_data, "schemas/workflow_data.json")
+            parsed: Dict[str, Any] = json.load(f)
 
-        # NOTE: json.loads twice since the data is validated at the first time.
-        workflow_data = json.loads(file_content, object_hook=WorkflowDataDecoder())
-
-        loaded_data = cls(**workflow_data)
+        # lazy fields saved by older versions are in workflow.json as well
+        lazy = {
+            name for name in cls.lazy_fields
+            if name not in parsed and context_dir.get_workflow_field_json(name).exists()
+        }
+        schema = _get_workflow_data_schema()
+        missing = set(schema["required"]) - parsed.keys() - lazy
+        if missing:
+            raise OsbsValidationException(
+                f"workflow data misses required fields: {', '.join(sorted(missing))}"
+            )
+        _validate_fields(parsed)
+
+        saved = {name: json.dumps(value) for name, value in parsed.items()}
+        decoder = WorkflowDataDecoder()
+        for name, value in parsed.items():
+            # walk through the data only if there is anything to restore
+            if '"__type__"' in saved[name]:
+                parsed[name] = decoder.restore(value)
+        loaded_data = cls(**parsed)
+        # fields which aren't loaded yet are not set at all, see __getattr__
+        loaded_data._lazy = lazy
+        loaded_data._context_dir = context_dir
+        for name in lazy:
+            delattr(loaded_data, name)
+        if not cls.lazy_fields & parsed.keys():
+            loaded_data._saved = saved
+        # else saved by older versions, the next save rewrites everything
         return loaded_data
 
+    def __post_init__(self):
+        # names of fields which are not loaded from the saved data yet
+        self._lazy: Set[str] = set()
+        # the directory the lazy fields are loaded from
+        self._context_dir: Optional[ContextDir] = None
+        # field name -> the field as JSON in the saved data
+        self._saved: Dict[str, str] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        # only called when the attribute is not set, i.e. for the lazy fields
+        lazy = self.__dict__.get("_lazy", ())
+        if name not in lazy:
+            raise AttributeError(f"{self.__class__.__name__!r} object has no attribute {name!r}")
+        saved = self._context_dir.get_workflow_field_json(name).read_text()
+        value = json.loads(saved)
+        _validate_fields({name: value})
+        if '"__type__"' in saved:
+            value = WorkflowDataDecoder().restore(value)
+        setattr(self, name, value)
+        self._saved[name] = saved
+        lazy.discard(name)
+        return value
+
     def as_dict(self) -> Dict[str, Any]:
         return {field.name: getattr(self, field.name) for field in fields(self)}
 
     def save(self, context_dir: ContextDir) -> None:
         """Save workflow data into the files under a specific directory.
 
+        workflow.json holds a single JSON object with all the fields except
+        the ones listed in ``lazy_fields``, each of them is saved in its own
+        file, see ContextDir.get_workflow_field_json. Files are written only
+        if the fields in them changed since the data was loaded or saved.
+
         :param context_dir: a directory holding the files containing the serialized
             workflow data.
         :type context_dir: ContextDir
         """
-        logger.info("Writing workflow data into %s", context_dir.workflow_json)
-        with open(context_dir.workflow_json, "w+") as f:
-            json.dump(self.as_dict(), f, cls=WorkflowDataEncoder)
+        if self._context_dir is None or context_dir.path != self._context_dir.path:
+            # saving somewhere else, nothing is saved there yet
+            for name in list(self._lazy):
+                getattr(self, name)
+            self._saved = {}
+            self._context_dir = context_dir
+
+        main_fields: Dict[str, str] = {}
+        main_changed = not context_dir.workflow_json.exists()
+        for field_ in fields(self):
+            name = field_.name
+            if name in self._lazy:
+                continue  # never accessed, can't be changed
+            saved = json.dumps(getattr(self, name), cls=WorkflowDataEncoder)
+            changed = saved != self._saved.get(name)
+            self._saved[name] = saved
+            if name not in self.lazy_fields:
+                main_fields[name] = saved
+                main_changed = main_changed or changed
+            elif changed:
+                path = context_dir.get_workflow_field_json(name)
+                logger.debug("Writing workflow data field %s into %s", name, path)
+                _write_file_atomically(path, saved)
+
+        if main_changed:
+            logger.info("Writing workflow data into %s", context_dir.workflow_json)
+            content = ", ".join(f"{json.dumps(name)}: {saved}"
+                                for name, saved in main_fields.items())
+            _write_file_atomically(context_dir.workflow_json, "{" + content + "}")
+
+
+def _write_file_atomically(path: Path, content: str) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_workflow_data_schema() -> Dict[str, Any]:
+    return osbs_yaml.load_schema("atomic_reactor", "schemas/workflow_data.json")
+
+
+def _validate_fields(data: Dict[str, Any]) -> None:
+    """Validate some of the workflow data fields by JSON schema
+
+    :param data: dict, field name -> value as loaded from JSON
+    :raises osbs.OsbsValidationException: if any of the fields is not valid
+    """
+    schema = _get_workflow_data_schema()
+    # required fields are checked when the data is loaded
+    osbs_yaml.validate_with_schema(data, {**schema, "required": []})
 
 
 class WorkflowDataEncoder(json.JSONEncoder):
@@ -411,6 +731,18 @@ class WorkflowDataDecoder:
         """Factor to create an ImageName object."""
         return ImageName.parse(data["str"])
 
+    def restore(self, data: Any) -> Any:
+        """Restore custom serializable objects in data loaded from JSON.
+
+        Does the same as using the decoder as the object_hook, for data which
+        is already loaded.
+        """
+        if isinstance(data, dict):
+            return self({key: self.restore(value) for key, value in data.items()})
+        if isinstance(data, list):
+            return [self.restore(item) for item in data]
+        return data
+
     def __call__(self, data: Dict[str, Any]) -> Any:
         """Restore custom serializable objects."""
         loader_meths: Final[Dict[str, Callable]] = {
@@ -650,6 +982,11 @@ class DockerBuildWorkflow(object):
         """
         print_version_of_tools()
         try:
+            self.fs_watcher.mounts.update({
+                "build_dir": str(self.build_dir.path),
+                "context_dir": str(self.context_dir.path),
+                "tmp": tempfile.gettempdir(),
+            })
             self.fs_watcher.start()
             runner = PluginsRunner(self,
                                    self.plugins_conf,
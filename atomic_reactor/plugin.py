@@ -10,27 +10,38 @@ definition of plugin system
 
 plugins are supposed to be run when image is built and we need to extract some information
 """
+import contextvars
 import copy
 import logging
 import os
 import sys
+import threading
 import traceback
 import imp  # pylint: disable=deprecated-module
 import inspect
 import time
 from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Dict, Generator, TYPE_CHECKING, List, Optional
+from typing import Any, Dict, Generator, TYPE_CHECKING, List, Optional, Sequence, Set
 
+from opentelemetry import trace
+
+from atomic_reactor.constants import PLUGINS_MAX_WORKERS, PLUGINS_WAIT_INTERVAL
+from atomic_reactor.plugins import PLUGIN_MODULES
+from atomic_reactor.profiling import startup_profiler
 from atomic_reactor.util import exception_message
+from atomic_reactor.utils.resources import ResourceUsage
+from atomic_reactor.utils.retries import http_stats_scope
 
 if TYPE_CHECKING:
     from atomic_reactor.inner import DockerBuildWorkflow
 
 MODULE_EXTENSIONS = ('.py', '.pyc', '.pyo')
 logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
 
 
 @dataclass
@@ -40,6 +51,19 @@ class PluginExecutionInfo:
     conf: Dict[str, Any]
     is_allowed_to_fail: bool
 
+    @property
+    def reads(self) -> Optional[Set[str]]:
+        reads = getattr(self.plugin_class, "reads", None)
+        return None if reads is None else set(reads)
+
+    @property
+    def writes(self) -> Optional[Set[str]]:
+        writes = getattr(self.plugin_class, "writes", None)
+        if writes is None:
+            return None
+        # plugin result is always stored by the runner
+        return set(writes) | {f"plugins_results.{self.plugin_class.key}"}
+
 
 class PluginFailedException(Exception):
     """ There was an error during plugin execution """
@@ -54,6 +78,16 @@ class Plugin(ABC):
 
     # by default, if plugin fails (raises exc), execution continues
     is_allowed_to_fail = True
+    # whether the platform-specific actions of the plugin are safe to run for all
+    # platforms at the same time (see RootBuildDir.for_each_platform)
+    parallel_platforms = False
+    # names of the data the plugin reads and writes, which allows PluginsRunner
+    # to run it at the same time as other plugins it doesn't conflict with.
+    # Names are workflow.data fields, optionally followed by a key, e.g.
+    # "plugins_results.koji_parent", plus "build_dir" for the content of build
+    # directories. None means unknown, such plugin never runs concurrently.
+    reads: Optional[Sequence[str]] = None
+    writes: Optional[Sequence[str]] = None
 
     def __init__(self, workflow: "DockerBuildWorkflow", *args, **kwargs):
         """
@@ -161,49 +195,73 @@ class PluginsRunner(object):
         self.plugin_classes = self.load_plugins()
         self.available_plugins = self.get_available_plugins()
         self.keep_going = keep_going
+        # running plugin key -> keys of plugins which ran at the same time
+        self._overlapping_plugins: Dict[str, Set[str]] = {}
+        self._overlapping_lock = threading.Lock()
 
     def load_plugins(self) -> Dict[str, Plugin]:
         """
-        load all available plugins
+        load requested plugins
+
+        Only modules of the plugins in plugins_conf are loaded from the plugins
+        dir, according to PLUGIN_MODULES. Plugins not found there and in the
+        additional plugin files are searched for in the rest of the plugins dir.
 
         :return: dict, bindings for plugins of the plugin_class_name class
         """
         # imp.findmodule('atomic_reactor') doesn't work
         plugins_dir = os.path.join(os.path.dirname(__file__), 'plugins')
-        logger.debug("loading plugins from dir '%s'", plugins_dir)
-        files = [os.path.join(plugins_dir, f)
-                 for f in os.listdir(plugins_dir)
-                 if f.endswith(".py")]
+        requested = {plugin_request['name'] for plugin_request in self.plugins_conf}
+        module_names = sorted({PLUGIN_MODULES[name] for name in requested
+                               if name in PLUGIN_MODULES})
+        files = [os.path.join(plugins_dir, module_name + '.py') for module_name in module_names]
+        logger.debug("loading plugins %s from dir '%s'", module_names, plugins_dir)
         if self.plugin_files:
             logger.debug("loading additional plugins from files '%s'", self.plugin_files)
             files += self.plugin_files
         plugin_classes = {}
         for f in files:
-            module_name = os.path.basename(f).rsplit('.', 1)[0]
-            # Do not reload plugins
-            if module_name in sys.modules:
-                f_module = sys.modules[module_name]
-            else:
-                try:
-                    f_module = imp.load_source(module_name, f)
-                except (IOError, OSError, ImportError, SyntaxError) as ex:
-                    logger.warning("can't load module '%s': %s", f, ex)
-                    continue
-            for name in dir(f_module):
-                binding = getattr(f_module, name)
-                try:
-                    # if you try to compare binding and Plugin, python won't match them
-                    # if you call this script directly b/c:
-                    # ! <class 'plugins.plugin_rpmqa.PostBuildRPMqaPlugin'> <= <class
-                    # '__main__.Plugin'>
-                    # but
-                    # <class 'plugins.plugin_rpmqa.PostBuildRPMqaPlugin'> <= <class
-                    # 'atomic_reactor.plugin.Plugin'>
-                    is_sub = issubclass(binding, Plugin)
-                except TypeError:
-                    is_sub = False
-                if binding and is_sub and Plugin.__name__ != binding.__name__:
-                    plugin_classes[binding.key] = binding
+            plugin_classes.update(self._load_plugins_from_file(f))
+
+        missing = requested - plugin_classes.keys()
+        if missing:
+            logger.debug("plugins %s not indexed, loading all plugins from dir '%s'",
+                         sorted(missing), plugins_dir)
+            for f in os.listdir(plugins_dir):
+                path = os.path.join(plugins_dir, f)
+                if f.endswith(".py") and path not in files:
+                    for key, binding in self._load_plugins_from_file(path).items():
+                        plugin_classes.setdefault(key, binding)
+        return plugin_classes
+
+    @staticmethod
+    def _load_plugins_from_file(f: str) -> Dict[str, Plugin]:
+        module_name = os.path.basename(f).rsplit('.', 1)[0]
+        # Do not reload plugins
+        if module_name in sys.modules:
+            f_module = sys.modules[module_name]
+        else:
+            try:
+                f_module = imp.load_source(module_name, f)
+            except (IOError, OSError, ImportError, SyntaxError) as ex:
+                logger.warning("can't load module '%s': %s", f, ex)
+                return {}
+        plugin_classes = {}
+        for name in dir(f_module):
+            binding = getattr(f_module, name)
+            try:
+                # if you try to compare binding and Plugin, python won't match them
+                # if you call this script directly b/c:
+                # ! <class 'plugins.plugin_rpmqa.PostBuildRPMqaPlugin'> <= <class
+                # '__main__.Plugin'>
+                # but
+                # <class 'plugins.plugin_rpmqa.PostBuildRPMqaPlugin'> <= <class
+                # 'atomic_reactor.plugin.Plugin'>
+                is_sub = issubclass(binding, Plugin)
+            except TypeError:
+                is_sub = False
+            if binding and is_sub and Plugin.__name__ != binding.__name__:
+                plugin_classes[binding.key] = binding
         return plugin_classes
 
     def get_available_plugins(self):
@@ -260,6 +318,9 @@ class PluginsRunner(object):
     def save_plugin_duration(self, name: str, duration: float) -> None:
         self.workflow.data.plugins_durations[name] = duration
 
+    def save_plugin_resources(self, name: str, resources: Dict[str, Any]) -> None:
+        self.workflow.data.plugins_resources[name] = resources
+
     def _translate_special_values(self, obj_to_translate):
         """
         you may want to write plugins for values which are not known before build:
@@ -313,51 +374,202 @@ class PluginsRunner(object):
         plugin_instance = plugin_class(self.workflow, **plugin_conf)
         return plugin_instance
 
+    @property
+    def _fs_watcher(self):
+        return getattr(self.workflow, "fs_watcher", None)
+
+    def _get_resource_usage(self) -> ResourceUsage:
+        fs_watcher = self._fs_watcher
+        disk_usage = fs_watcher.get_current_usage() if fs_watcher else None
+        return ResourceUsage.current(disk_usage)
+
+    def _plugin_started(self, plugin_key: str) -> None:
+        with self._overlapping_lock:
+            for overlapping in self._overlapping_plugins.values():
+                overlapping.add(plugin_key)
+            self._overlapping_plugins[plugin_key] = set(self._overlapping_plugins)
+
+    def _plugin_finished(self, plugin_key: str) -> List[str]:
+        """Get keys of plugins which ran at the same time as the finished one"""
+        with self._overlapping_lock:
+            return sorted(self._overlapping_plugins.pop(plugin_key))
+
     @contextmanager
     def _execution_timer(self, exec_info: PluginExecutionInfo) -> Generator:
         logger.debug("running plugin '%s'", exec_info.plugin_name)
         start_time = datetime.now()
         plugin_key = exec_info.plugin_class.key
         self.save_plugin_timestamp(plugin_key, start_time)
-        try:
-            yield
-        finally:
+        if self._fs_watcher:
+            self._fs_watcher.plugin_started(plugin_key)
+        self._plugin_started(plugin_key)
+        with http_stats_scope(), tracer.start_as_current_span(plugin_key) as span:
+            usage_before = self._get_resource_usage()
             try:
-                finish_time = datetime.now()
-                duration = finish_time - start_time
-                seconds = duration.total_seconds()
-                logger.debug("plugin '%s' finished in %ds", exec_info.plugin_name, seconds)
-                self.save_plugin_duration(plugin_key, seconds)
-            except Exception:
-                logger.exception("failed to save plugin duration")
+                yield
+            finally:
+                try:
+                    finish_time = datetime.now()
+                    duration = finish_time - start_time
+                    seconds = duration.total_seconds()
+                    logger.debug("plugin '%s' finished in %ds", exec_info.plugin_name, seconds)
+                    self.save_plugin_duration(plugin_key, seconds)
+                    span.set_attribute("duration_seconds", seconds)
+                except Exception:
+                    logger.exception("failed to save plugin duration")
+                if self._fs_watcher:
+                    self._fs_watcher.plugin_finished(plugin_key)
+                concurrent_with = self._plugin_finished(plugin_key)
+                try:
+                    resources: Dict[str, Any] = self._get_resource_usage().since(usage_before)
+                    # except for HTTP requests, the usage of these plugins is included too
+                    resources["concurrent_with"] = concurrent_with
+                    logger.debug("plugin '%s' used resources: %s", exec_info.plugin_name,
+                                 resources)
+                    self.save_plugin_resources(plugin_key, resources)
+                    for name, value in resources.items():
+                        span.set_attribute(name, value)
+                except Exception:
+                    logger.exception("failed to save plugin resource usage")
+
+    @staticmethod
+    def _names_overlap(first: str, second: str) -> bool:
+        return (first == second or
+                first.startswith(second + ".") or
+                second.startswith(first + "."))
+
+    @classmethod
+    def _plugins_conflict(cls, earlier: PluginExecutionInfo, later: PluginExecutionInfo) -> bool:
+        """Check whether the later plugin has to wait for the earlier one to finish"""
+        if None in (earlier.reads, earlier.writes, later.reads, later.writes):
+            return True
+        later_used = later.reads | later.writes
+        return (
+            any(cls._names_overlap(w, n) for w in earlier.writes for n in later_used) or
+            any(cls._names_overlap(w, n) for w in later.writes for n in earlier.reads)
+        )
+
+    def _get_dependencies(self, plugins: List[PluginExecutionInfo]) -> List[Set[int]]:
+        """Get indexes of preceding plugins each plugin has to wait for"""
+        return [
+            {i for i in range(index) if self._plugins_conflict(plugins[i], plugin)}
+            for index, plugin in enumerate(plugins)
+        ]
+
+    def _run_plugin(self, plugin: PluginExecutionInfo) -> Optional[Exception]:
+        """Run a single plugin and store its result
+
+        :return: exception raised by the plugin, None on success
+        """
+        try:
+            plugin_instance = self.create_instance_from_plugin(
+                plugin.plugin_class, plugin.conf
+            )
+            with self._execution_timer(plugin):
+                self.plugins_results[plugin.plugin_class.key] = plugin_instance.run()
+        except Exception as ex:
+            logger.debug(traceback.format_exc())
+            return ex
+        return None
+
+    def _handle_failure(
+            self, plugin: PluginExecutionInfo, ex: Exception, failed_msgs: List[str]
+    ) -> Optional[PluginFailedException]:
+        """Record failure of a plugin
+
+        :return: PluginFailedException if the failure is fatal, None otherwise
+        """
+        plugin_key = plugin.plugin_class.key
+        if not plugin.is_allowed_to_fail:
+            self.on_plugin_failed(plugin_key, ex)
+
+        msg = f"plugin '{plugin_key}' raised an exception: {exception_message(ex)}"
+        if plugin.is_allowed_to_fail or self.keep_going:
+            logger.warning(msg)
+            logger.info("error is not fatal, continuing...")
+            if not plugin.is_allowed_to_fail:
+                failed_msgs.append(msg)
+            return None
+
+        logger.error(msg)
+        exc = PluginFailedException(msg)
+        exc.__cause__ = ex
+        return exc
 
     def run(self):
-        """Run all requested plugins."""
+        """Run all requested plugins.
+
+        Plugins run in the configured order, except that a plugin which
+        doesn't conflict with any pending or running plugin (see Plugin.reads
+        and Plugin.writes) is started right away, in parallel with the others.
+
+        After a fatal failure, no other plugin is started; the running ones
+        are allowed to finish before the failure is raised. When the runner
+        itself is interrupted, e.g. by TaskCanceledException raised by the
+        SIGTERM handler, plugins which haven't started yet are canceled and
+        the exception is raised right away, without waiting for the running
+        plugins.
+        """
+        startup_profiler.mark("first_plugin")
+        startup_profiler.finish()
+
         failed_msgs: List[str] = []
-        available_plugins = self.available_plugins
-        for plugin in available_plugins:
-            plugin_key = plugin.plugin_class.key
-            try:
-                plugin_instance = self.create_instance_from_plugin(
-                    plugin.plugin_class, plugin.conf
-                )
-                with self._execution_timer(plugin):
-                    self.plugins_results[plugin_key] = plugin_instance.run()
-            except Exception as ex:
-                logger.debug(traceback.format_exc())
-
-                if not plugin.is_allowed_to_fail:
-                    self.on_plugin_failed(plugin.plugin_class.key, ex)
-
-                msg = f"plugin '{plugin_key}' raised an exception: {exception_message(ex)}"
-                if plugin.is_allowed_to_fail or self.keep_going:
-                    logger.warning(msg)
-                    logger.info("error is not fatal, continuing...")
-                    if not plugin.is_allowed_to_fail:
-                        failed_msgs.append(msg)
+        plugins = self.available_plugins
+        dependencies = self._get_dependencies(plugins)
+        pending = list(range(len(plugins)))
+        finished: Set[int] = set()
+        running: Dict[Future, int] = {}
+        fatal_error: Optional[PluginFailedException] = None
+
+        def finish(index: int, ex: Optional[Exception]) -> None:
+            nonlocal fatal_error
+            finished.add(index)
+            if ex is not None:
+                error = self._handle_failure(plugins[index], ex, failed_msgs)
+                if fatal_error is None:
+                    fatal_error = error
+
+        executor = ThreadPoolExecutor(max_workers=PLUGINS_MAX_WORKERS)
+        try:
+            while pending or running:
+                ready = []
+                if fatal_error is None:
+                    ready = [i for i in pending if dependencies[i] <= finished]
                 else:
-                    logger.error(msg)
-                    raise PluginFailedException(msg) from ex
+                    pending = []
+                pending = [i for i in pending if i not in ready]
+
+                if len(ready) == 1 and not running:
+                    # nothing to run along with, keep the plugin in the main thread
+                    finish(ready[0], self._run_plugin(plugins[ready[0]]))
+                    continue
+
+                if ready:
+                    logger.debug("running plugins %s concurrently",
+                                 ", ".join(plugins[i].plugin_name for i in ready))
+                for index in ready:
+                    # run in the current context, to keep the tracing span of the task
+                    context = contextvars.copy_context()
+                    future = executor.submit(context.run, self._run_plugin, plugins[index])
+                    running[future] = index
+
+                if running:
+                    # a signal delivered to a plugin thread doesn't interrupt the wait,
+                    # wake up regularly to let its handler run in the main thread
+                    done, _ = wait(running, timeout=PLUGINS_WAIT_INTERVAL,
+                                   return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finish(running.pop(future), future.result())
+        except BaseException:
+            # don't wait for the running plugins, they can't be interrupted
+            for future in running:
+                future.cancel()
+            executor.shutdown(wait=False)
+            raise
+        executor.shutdown(wait=True)
+
+        if fatal_error is not None:
+            raise fatal_error
 
         if len(failed_msgs) == 1:
             raise PluginFailedException(failed_msgs[0])
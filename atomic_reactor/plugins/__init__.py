@@ -5,3 +5,56 @@ All rights reserved.
 This software may be modified and distributed under the terms
 of the BSD license. See the LICENSE file for details.
 """
+
+# Index of the built-in plugins: plugin key -> module in this package.
+# PluginsRunner uses it to import only the modules of the requested plugins,
+# keep it up to date when adding, removing or renaming plugins.
+PLUGIN_MODULES = {
+    'add_buildargs_in_dockerfile': 'add_buildargs_in_df',
+    'add_dockerfile': 'add_dockerfile',
+    'add_filesystem': 'add_filesystem',
+    'add_flatpak_labels': 'add_flatpak_labels',
+    'add_help': 'add_help',
+    'add_image_content_manifest': 'add_image_content_manifest',
+    'add_labels_in_dockerfile': 'add_labels_in_df',
+    'all_rpm_packages': 'rpmqa',
+    'bump_release': 'bump_release',
+    'cancel_build_reservation': 'cancel_build_reservation',
+    'change_from_in_dockerfile': 'change_from_in_df',
+    'check_and_set_platforms': 'check_and_set_platforms',
+    'check_base_image': 'check_base_image',
+    'check_user_settings': 'check_user_settings',
+    'compare_components': 'compare_components',
+    'distgit_fetch_artefacts': 'pyrpkg_fetch_artefacts',
+    'distribution_scope': 'distribution_scope',
+    'export_operator_manifests': 'export_operator_manifests',
+    'fetch_docker_archive': 'fetch_docker_archive',
+    'fetch_maven_artifacts': 'fetch_maven_artifacts',
+    'fetch_sources': 'fetch_sources',
+    'flatpak_create_dockerfile': 'flatpak_create_dockerfile',
+    'flatpak_create_oci': 'flatpak_create_oci',
+    'flatpak_update_dockerfile': 'flatpak_update_dockerfile',
+    'gather_builds_metadata': 'gather_builds_metadata',
+    'generate_sbom': 'generate_sbom',
+    'group_manifests': 'group_manifests',
+    'hermeto_init': 'hermeto_init',
+    'hermeto_postprocess': 'hermeto_postprocess',
+    'hide_files': 'hide_files',
+    'inject_parent_image': 'inject_parent_image',
+    'inject_yum_repos': 'inject_yum_repos',
+    'koji_import': 'koji_import',
+    'koji_import_source_container': 'koji_import',
+    'koji_parent': 'koji_parent',
+    'koji_tag_build': 'koji_tag_build',
+    'maven_url_sources_metadata': 'maven_url_sources_metadata',
+    'pin_operator_digest': 'pin_operator_digest',
+    'push_floating_tags': 'push_floating_tags',
+    'resolve_composes': 'resolve_composes',
+    'resolve_remote_source': 'resolve_remote_source',
+    'sendmail': 'sendmail',
+    'source_container': 'build_source_container',
+    'store_metadata': 'store_metadata',
+    'tag_and_push': 'tag_and_push',
+    'tag_from_config': 'tag_from_config',
+    'verify_media': 'verify_media_types',
+}
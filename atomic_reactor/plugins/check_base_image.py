@@ -26,6 +26,9 @@ from atomic_reactor.util import (get_platforms, base_image_is_custom, base_image
 class CheckBaseImagePlugin(Plugin):
     key = "check_base_image"
     is_allowed_to_fail = False
+    reads = ("dockerfile_images", "parent_images_digests",
+             "plugins_results.check_and_set_platforms")
+    writes = ("dockerfile_images", "parent_images_digests")
 
     def __init__(self, workflow):
         """
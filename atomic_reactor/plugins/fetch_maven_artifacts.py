@@ -20,7 +20,7 @@ from atomic_reactor.constants import (PLUGIN_FETCH_MAVEN_KEY,
                                       REPO_FETCH_ARTIFACTS_KOJI)
 from atomic_reactor.config import get_koji_session
 from atomic_reactor.dirs import BuildDir
-from atomic_reactor.download import download_url
+from atomic_reactor.download import DownloadManager
 from atomic_reactor.plugin import Plugin
 from atomic_reactor.utils.koji import NvrRequest
 from atomic_reactor.utils.pnc import PNCUtil
@@ -41,6 +41,8 @@ class DownloadRequest:
 class FetchMavenArtifactsPlugin(Plugin):
     key = PLUGIN_FETCH_MAVEN_KEY
     is_allowed_to_fail = False
+    reads = ()
+    writes = ("build_dir",)
 
     DOWNLOAD_DIR = 'artifacts'
 
@@ -210,8 +212,9 @@ class FetchMavenArtifactsPlugin(Plugin):
         insecure = koji_config.get('insecure_download', False)
 
         self.log.debug('%d files to download', len(downloads))
-        session = util.get_retrying_requests_session()
 
+        scheduled = []
+        dest_paths = []
         for index, download in enumerate(downloads):
             dest_path = artifacts_path / download.dest
             dest_dir = dest_path.parent
@@ -220,12 +223,18 @@ class FetchMavenArtifactsPlugin(Plugin):
             if not dest_dir.exists():
                 dest_dir.mkdir(parents=True)
 
-            self.log.debug('%d/%d downloading %s', index + 1, len(downloads),
+            self.log.debug('%d/%d scheduling download of %s', index + 1, len(downloads),
                            download.url)
 
-            download_url(url=download.url, dest_dir=dest_dir, insecure=insecure, session=session,
-                         dest_filename=dest_filename, expected_checksums=download.checksums)
-            yield dest_path
+            scheduled.append({'url': download.url, 'dest_dir': dest_dir,
+                              'dest_filename': dest_filename,
+                              'expected_checksums': download.checksums})
+            dest_paths.append(dest_path)
+
+        with DownloadManager(insecure=insecure) as download_manager:
+            download_manager.download_all(scheduled)
+
+        yield from dest_paths
 
     def generate_sbom_components_for_pnc(self, pnc_artifact_ids: List[int]):
         purl_specs = self.pnc_util.get_artifact_purl_specs(pnc_artifact_ids)
@@ -258,7 +267,7 @@ class FetchMavenArtifactsPlugin(Plugin):
         download_queue = pnc_download_queue + nvr_download_queue + url_download_queue
 
         download_to_build_dir = functools.partial(self.download_files, download_queue)
-        self.workflow.build_dir.for_all_platforms_copy(download_to_build_dir)
+        self.workflow.build_dir.for_all_platforms_copy(download_to_build_dir, immutable=True)
 
         if pnc_artifact_ids:
             self.generate_sbom_components_for_pnc(pnc_artifact_ids)
@@ -5,26 +5,28 @@ All rights reserved.
 This software may be modified and distributed under the terms
 of the BSD license. See the LICENSE file for details.
 """
+import contextvars
 import os
-import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import re
 
 import koji
-import tarfile
 import yaml
 from typing import List, Dict, Any
 
 from atomic_reactor.constants import (PLUGIN_FETCH_SOURCES_KEY, PNC_SYSTEM_USER,
                                       REMOTE_SOURCE_JSON_FILENAME, REMOTE_SOURCE_TARBALL_FILENAME,
-                                      KOJI_BTYPE_REMOTE_SOURCES)
+                                      KOJI_BTYPE_REMOTE_SOURCES, KOJI_MULTICALL_BATCH_SIZE,
+                                      SRPM_URL_CHECK_MAX_WORKERS)
 from atomic_reactor.config import get_koji_session
 from atomic_reactor.plugin import Plugin
 from atomic_reactor.source import GitSource
 from atomic_reactor.util import (get_retrying_requests_session,
-                                 map_to_user_params,
-                                 safe_extractall)
-from atomic_reactor.download import download_url
+                                 map_to_user_params)
+from atomic_reactor.download import DownloadManager
+from atomic_reactor.utils.archive import filter_tar_archive_in_place, split_member_path
+from atomic_reactor.utils.denylist import SourcesDenylistMatcher
 from atomic_reactor.utils.pnc import PNCUtil
 
 try:
@@ -145,14 +147,17 @@ class FetchSourcesPlugin(Plugin):
         dest_dir: Path = self.workflow.build_dir.source_container_sources_dir / download_dir
         dest_dir.mkdir(parents=True, exist_ok=True)
 
-        req_session = get_retrying_requests_session()
+        downloads = []
         for source in sources:
             subdir: Path = dest_dir / source.get('subdir', '')
             subdir.mkdir(parents=True, exist_ok=True)
-            checksums = source.get('checksums', {})
-            download_url(source['url'], subdir, insecure=insecure,
-                         session=req_session, dest_filename=source.get('dest'),
-                         expected_checksums=checksums)
+            downloads.append({'url': source['url'],
+                              'dest_dir': subdir,
+                              'dest_filename': source.get('dest'),
+                              'expected_checksums': source.get('checksums', {})})
+
+        with DownloadManager(insecure=insecure) as download_manager:
+            download_manager.download_all(downloads)
 
         return str(dest_dir)
 
@@ -641,12 +646,66 @@ class FetchSourcesPlugin(Plugin):
 
         return final_go_rpms
 
+    def _multicall(self, call, items):
+        """Run a koji API call for each item, batched using multicall
+
+        :param call: callable, takes the multicall session and an item,
+                     and performs the koji API call for the item
+        :param items: list, items to perform the API call for
+        :return: list, results of the calls in the same order as items
+        """
+        if not items:
+            return []
+
+        with self.session.multicall(strict=True, batch=KOJI_MULTICALL_BATCH_SIZE) as m:
+            virtual_calls = [call(m, item) for item in items]
+
+        return [virtual_call.result for virtual_call in virtual_calls]
+
+    def _find_srpm_url(self, req_session, srpm_filename, base_dict, sigkeys, insecure):
+        """Find the first available URL for the SRPM
+
+        Candidate URLs are checked in the signing intent preference order.
+
+        :return: str, URL of the SRPM or None when no candidate is available
+        """
+        # golang dependencies for golang rpms from buildroot, most likely won't be signed
+        # so don't check for signing key
+        if base_dict['ignore_signing_intent']:
+            self.log.debug('%s is used only in buildroot ignoring signing keys', srpm_filename)
+            url_candidate = self.assemble_srpm_url(base_dict['base_url'], srpm_filename)
+
+            request = req_session.head(url_candidate, verify=not insecure, allow_redirects=True)
+            if request.ok:
+                self.log.debug('%s is available', srpm_filename)
+                return url_candidate
+
+            self.log.error('%s not found"', srpm_filename)
+            return None
+
+        for sigkey in sigkeys:
+            # koji uses lowercase for paths. We make sure the sigkey is in lower case
+            url_candidate = self.assemble_srpm_url(base_dict['base_url'],
+                                                   srpm_filename, sigkey.lower())
+            # allow redirects, head call doesn't do it by default
+            request = req_session.head(url_candidate, verify=not insecure, allow_redirects=True)
+            if request.ok:
+                self.log.debug('%s is available for signing key "%s"', srpm_filename, sigkey)
+                return url_candidate
+
+        self.log.error('%s not found for the given signing intent: %s"', srpm_filename,
+                       self.signing_intent)
+        return None
+
     def get_srpm_urls(self, sigkeys=None, insecure=False):
         """Fetch SRPM download URLs for each image generated by a build
 
         Build each possible SRPM URL and check if the URL is available,
         respecting the signing intent preference order.
 
+        Koji queries are batched with multicall and SRPMs are checked
+        concurrently, candidate URLs of a single SRPM are checked in order.
+
         :param sigkeys: list, strings for keys which signed the srpms to be fetched
         :return: list, strings with URLs pointing to SRPM files
         """
@@ -657,14 +716,17 @@ class FetchSourcesPlugin(Plugin):
         archives = self.session.listArchives(self.koji_build_id, type='image')
         self.log.debug('archives: %s', archives)
 
+        archives_rpms = self._multicall(lambda m, archive: m.listRPMs(imageID=archive['id']),
+                                        archives)
+
         # use just required fields, some fields can be different even for the same rpm,
         # because noarch rpms are in the list for each arch
         all_rpms = [{'id': rpm['id'],
                      'build_id': rpm['build_id'],
                      'arch': rpm['arch'],
                      'external_repo_name': rpm['external_repo_name'],
-                     'nvr': rpm['nvr']} for archive in archives
-                    for rpm in self.session.listRPMs(imageID=archive['id'])]
+                     'nvr': rpm['nvr']} for archive_rpms in archives_rpms
+                    for rpm in archive_rpms]
 
         all_rpms.extend(self._get_go_rpms(all_rpms))
 
@@ -677,19 +739,24 @@ class FetchSourcesPlugin(Plugin):
 
         denylist_srpms = self.get_denylisted_srpms()
 
-        srpm_build_paths = {}
+        internal_rpms = []
         for rpm in rpms:
-            rpm_id = rpm['id']
-            self.log.debug('Resolving SRPM for RPM ID: %s', rpm_id)
-
             if rpm['external_repo_name'] != 'INTERNAL':
                 msg = ('RPM comes from an external repo (RPM ID: {}; NVR: {}). '
                        'External RPMs are currently not supported, '
-                       'skipping').format(rpm_id, rpm['nvr'])
+                       'skipping').format(rpm['id'], rpm['nvr'])
                 self.log.warning(msg)
                 continue
+            internal_rpms.append(rpm)
+
+        rpm_hdrs = self._multicall(
+            lambda m, rpm: m.getRPMHeaders(rpm['id'], headers=['SOURCERPM']), internal_rpms)
+
+        srpm_rpms = {}
+        for rpm, rpm_hdr in zip(internal_rpms, rpm_hdrs):
+            rpm_id = rpm['id']
+            self.log.debug('Resolving SRPM for RPM ID: %s', rpm_id)
 
-            rpm_hdr = self.session.getRPMHeaders(rpm_id, headers=['SOURCERPM'])
             if 'SOURCERPM' not in rpm_hdr:
                 raise RuntimeError('Missing SOURCERPM header (RPM ID: {})'.format(rpm_id))
 
@@ -699,49 +766,36 @@ class FetchSourcesPlugin(Plugin):
                 self.log.debug('skipping denylisted srpm %s', rpm_hdr['SOURCERPM'])
                 continue
 
-            srpm_filename = rpm_hdr['SOURCERPM']
-            if srpm_filename in srpm_build_paths:
-                continue
-            rpm_build = self.session.getBuild(rpm['build_id'], strict=True)
-            base_url = self.pathinfo.build(rpm_build)
+            srpm_rpms.setdefault(rpm_hdr['SOURCERPM'], rpm)
+
+        build_ids = list({rpm['build_id'] for rpm in srpm_rpms.values()})
+        rpm_builds = dict(zip(build_ids, self._multicall(
+            lambda m, build_id: m.getBuild(build_id, strict=True), build_ids)))
+
+        srpm_build_paths = {}
+        for srpm_filename, rpm in srpm_rpms.items():
+            base_url = self.pathinfo.build(rpm_builds[rpm['build_id']])
 
             ignore_signing_intent = rpm.get('ignore_signing_intent', False)
             srpm_build_paths[srpm_filename] = {'base_url': base_url,
                                                'ignore_signing_intent': ignore_signing_intent}
 
-        srpm_urls = []
-        missing_srpms = []
         req_session = get_retrying_requests_session()
-        for srpm_filename, base_dict in srpm_build_paths.items():
-            # golang dependencies for golang rpms from buildroot, most likely won't be signed
-            # so don't check for signing key
-            if base_dict['ignore_signing_intent']:
-                self.log.debug('%s is used only in buildroot ignoring signing keys', srpm_filename)
-                url_candidate = self.assemble_srpm_url(base_dict['base_url'], srpm_filename)
-
-                request = req_session.head(url_candidate, verify=not insecure, allow_redirects=True)
-                if request.ok:
-                    srpm_urls.append({'url': url_candidate})
-                    self.log.debug('%s is available', srpm_filename)
-                else:
-                    self.log.error('%s not found"', srpm_filename)
-                    missing_srpms.append(srpm_filename)
-                continue
-
-            for sigkey in sigkeys:
-                # koji uses lowercase for paths. We make sure the sigkey is in lower case
-                url_candidate = self.assemble_srpm_url(base_dict['base_url'],
-                                                       srpm_filename, sigkey.lower())
-                # allow redirects, head call doesn't do it by default
-                request = req_session.head(url_candidate, verify=not insecure, allow_redirects=True)
-                if request.ok:
-                    srpm_urls.append({'url': url_candidate})
-                    self.log.debug('%s is available for signing key "%s"', srpm_filename, sigkey)
-                    break
+        with ThreadPoolExecutor(max_workers=SRPM_URL_CHECK_MAX_WORKERS) as executor:
+            # in copies of the current context, to count the requests for the plugin
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._find_srpm_url,
+                                req_session, srpm_filename, build_path, sigkeys, insecure)
+                for srpm_filename, build_path in srpm_build_paths.items()
+            ]
+            found_urls = [future.result() for future in futures]
 
+        srpm_urls = []
+        missing_srpms = []
+        for srpm_filename, url in zip(srpm_build_paths, found_urls):
+            if url:
+                srpm_urls.append({'url': url})
             else:
-                self.log.error('%s not found for the given signing intent: %s"', srpm_filename,
-                               self.signing_intent)
                 missing_srpms.append(srpm_filename)
 
         if missing_srpms:
@@ -795,77 +849,78 @@ class FetchSourcesPlugin(Plugin):
             full_remote_sources_map[remote_source_archive] = response_json
         return full_remote_sources_map
 
-    def _check_if_package_excluded(self, packages, denylist_sources, remote_archive):
+    def _check_if_package_excluded(self, packages, denylist, remote_archive):
         # check if any package in cachito json matches excluded entry
-        # strip leading os.sep as package names can include git path with '/' before package name
+        # package names can include git path with '/' before package name
         # or just package name, or package name with leading '@' depending on package type
-        denylist_packages = {k.lstrip(os.sep) for k in denylist_sources}
-
         for package in packages:
-            for exclude_path in denylist_packages:
-                if package.get('name').endswith(exclude_path):
-                    self.log.debug('Package excluded: "%s" from "%s"', package.get('name'),
-                                   remote_archive)
-                    return True
+            if denylist.matches_name(package.get('name')):
+                self.log.debug('Package excluded: "%s" from "%s"', package.get('name'),
+                               remote_archive)
+                return True
         return False
 
-    def _check_if_repo_excluded(self, repo, denylist_sources, remote_archive):
+    def _check_if_repo_excluded(self, repo, denylist, remote_archive):
         """if repo matches denylisted source returns True"""
         if repo.endswith('.git'):
             repo = repo[:-4]
 
-        denylist_packages = {k.lstrip(os.sep) for k in denylist_sources}
-
-        for exclude_path in denylist_packages:
-            if repo.endswith(exclude_path):
-                self.log.debug('Repo excluded: "%s" from "%s"', repo,
-                               remote_archive)
-                return True
+        if denylist.matches_name(repo):
+            self.log.debug('Repo excluded: "%s" from "%s"', repo,
+                           remote_archive)
+            return True
         return False
 
-    def _delete_app_directory(self, remote_source_dir, unpack_dir, remote_archive):
-        vendor_dir = os.path.join(unpack_dir, 'app', 'vendor')
+    def _get_member_filter(self, denylist, delete_app, remote_archive):
+        """
+        Get a function deciding which members of a remote source archive are kept
 
-        if os.path.exists(vendor_dir):
-            shutil.move(vendor_dir, remote_source_dir)
-            self.log.debug('Removing app from "%s"', remote_archive)
-            shutil.rmtree(os.path.join(unpack_dir, 'app'))
-            # shutil.move will create missing parent directory
-            shutil.move(os.path.join(remote_source_dir, 'vendor'), vendor_dir)
-            self.log.debug('Keeping vendor in app from "%s"', remote_archive)
-        else:
-            self.log.debug('Removing app from "%s"', remote_archive)
-            shutil.rmtree(os.path.join(unpack_dir, 'app'))
-
-    def _get_excluded_matches(self, unpack_dir, denylist_sources):
-        matches = []
-        # py2 glob.glob doesn't support recursive, hence os.walk & fnmatch
-        # py3 can use: glob.glob(os.path.join(unpack_dir, '**', exclude), recursive=True)
-        for root, dirnames, filenames in os.walk(unpack_dir):
-
-            # Hermeto saves dependencies without nested dir, it's only archive name-version.ext
-            # add this heuristic to match only package name
-            filenames_modified = {filename.rsplit('-', 1)[0] for filename in filenames}
-            filenames_modified.update(filenames)  # add original and deduplicate
-
-            for entry in dirnames + list(filenames_modified):
-                full_path = os.path.join(root, entry)
-
-                for exclude in denylist_sources:
-                    if full_path.endswith(exclude):
-                        matches.append(full_path)
-                        break
-        return matches
-
-    def _remove_excluded_matches(self, matches):
-        for entry in matches:
-            if os.path.exists(entry):
-                if os.path.isdir(entry):
-                    self.log.debug("Removing excluded directory %s", entry)
-                    shutil.rmtree(entry)
+        :param denylist: SourcesDenylistMatcher, excluded sources
+        :param delete_app: bool, remove 'app' from sources, except 'app/vendor'
+        :param remote_archive: str, path to the remote source archive
+        :return: callable, called with each archive member, returns whether to keep it
+        """
+        # path components of a directory -> whether it's excluded, with all its content
+        excluded_dirs = {(): False}
+        logged = set()
+
+        def log_once(msg):
+            if msg not in logged:
+                logged.add(msg)
+                self.log.debug(msg, remote_archive)
+
+        def is_excluded_dir(parts):
+            if parts not in excluded_dirs:
+                excluded = is_excluded_dir(parts[:-1])
+                if not excluded and denylist.matches_dir(parts):
+                    self.log.debug("Removing excluded directory %s", '/'.join(parts))
+                    excluded = True
+                excluded_dirs[parts] = excluded
+            return excluded_dirs[parts]
+
+        def keep(member):
+            parts = split_member_path(member.name)
+            if not parts:
+                return True
+
+            if delete_app and parts[0] == 'app':
+                if len(parts) > 1 and parts[1] == 'vendor':
+                    log_once('Keeping vendor in app from "%s"')
                 else:
-                    self.log.debug("Removing excluded file %s", entry)
-                    os.unlink(entry)
+                    log_once('Removing app from "%s"')
+                    return False
+
+            if member.isdir():
+                return not is_excluded_dir(parts)
+            if is_excluded_dir(parts[:-1]):
+                return False
+
+            if denylist.matches_file(parts):
+                self.log.debug("Removing excluded file %s", member.name)
+                return False
+            return True
+
+        return keep
 
     def exclude_files_from_remote_sources(self, remote_sources_map, remote_sources_dir):
         """
@@ -889,39 +944,24 @@ class FetchSourcesPlugin(Plugin):
         full_remote_sources_map = self._create_full_remote_sources_map(request_session,
                                                                        remote_sources_map,
                                                                        remote_sources_dir)
+        # built once, shared by all the remote sources and by both package and path checks
+        denylist = SourcesDenylistMatcher(denylist_sources)
         for remote_archive, remote_json in full_remote_sources_map.items():
-            unpack_dir = remote_archive + '_unpacked'
-
-            with tarfile.open(remote_archive) as tar:
-                safe_extractall(tar, unpack_dir)
-
             # Cachito provides packages, Hermeto doesn't
             # with Hermeto we can detect application only
             # from repo name
             delete_app = (
                 self._check_if_package_excluded(
-                    remote_json['packages'], denylist_sources, remote_archive)
+                    remote_json['packages'], denylist, remote_archive)
                 or self._check_if_repo_excluded(
-                    remote_json['repo'], denylist_sources, remote_archive)
+                    remote_json['repo'], denylist, remote_archive)
             )
 
             # if any package in cachito json matched excluded entry,
-            # remove 'app' from sources, except 'app/vendor' when exists
-            if delete_app and os.path.exists(os.path.join(unpack_dir, 'app')):
-                self._delete_app_directory(remote_sources_dir, unpack_dir, remote_archive)
-
-            # search for excluded matches
-            matches = self._get_excluded_matches(unpack_dir, denylist_sources)
-
-            self._remove_excluded_matches(matches)
-
-            # delete former archive
-            os.unlink(remote_archive)
-
-            # re-create new archive without excluded content
-            with tarfile.open(remote_archive, "w:gz") as tar:
-                for add_file in os.listdir(unpack_dir):
-                    tar.add(os.path.join(unpack_dir, add_file), arcname=add_file)
-
-            # cleanup unpacked dir
-            shutil.rmtree(unpack_dir)
+            # remove 'app' from sources, except 'app/vendor' when exists;
+            # the archive is filtered while it's read, without unpacking it
+            keep = self._get_member_filter(denylist, delete_app, remote_archive)
+            result = filter_tar_archive_in_place(remote_archive, keep)
+            self.log.debug('Removed %d of %d entries (%d bytes of files) from "%s"',
+                           result.removed, result.kept + result.removed, result.removed_bytes,
+                           remote_archive)
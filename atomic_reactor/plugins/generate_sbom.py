@@ -218,13 +218,21 @@ class GenerateSbomPlugin(Plugin):
         return sbom_urls
 
     def get_parent_images_nvr(self) -> List[Optional[str]]:
+        # inspect all parent images at once instead of one by one in the loop below
+        parent_inspects = self.workflow.imageutil.get_inspect_for_images(
+            (local_tag, None) for img, local_tag in self.df_images.items()
+            if local_tag and not base_image_is_custom(img.to_str())
+        )
+
         parent_images_nvr = []
         for img, local_tag in self.df_images.items():
             img_str = img.to_str()
             if base_image_is_custom(img_str):
                 continue
 
-            nvr = self.detect_parent_image_nvr(local_tag) if local_tag else None
+            nvr = self.detect_parent_image_nvr(
+                local_tag, inspect_data=parent_inspects[(str(local_tag), None)]
+            ) if local_tag else None
             parent_images_nvr.append(nvr)
         return parent_images_nvr
 
@@ -262,7 +262,7 @@ class HermetoPostprocessPlugin(Plugin):
     def inject_remote_sources(self, remote_sources: List[HermetoRemoteSource]) -> None:
         """Inject processed remote sources into build dirs and add build args to workflow."""
         inject_sources = functools.partial(self.inject_into_build_dir, remote_sources)
-        self.workflow.build_dir.for_all_platforms_copy(inject_sources)
+        self.workflow.build_dir.for_all_platforms_copy(inject_sources, immutable=True)
 
         # For single remote_source workflow, inject all build args directly
         if self.single_remote_source_params:
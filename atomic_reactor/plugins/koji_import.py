@@ -12,9 +12,12 @@ from itertools import chain
 
 import koji
 import os
+import queue
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from tempfile import NamedTemporaryFile
-from typing import Any, Dict, Iterator, List, Optional, Tuple, Iterable
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple, Iterable
 
 import koji_cli.lib
 
@@ -23,15 +26,17 @@ from atomic_reactor.plugin import Plugin
 from atomic_reactor.plugins.add_help import AddHelpPlugin
 from atomic_reactor.source import GitSource
 from atomic_reactor.plugins.add_filesystem import AddFilesystemPlugin
-from atomic_reactor.util import (OSBSLogs, get_parent_image_koji_data, get_pipeline_run_start_time,
-                                 get_manifest_media_version, get_platforms, is_flatpak_build,
-                                 is_manifest_list, map_to_user_params)
+from atomic_reactor.util import (OSBSLogs, get_checksums_for_files, get_parent_image_koji_data,
+                                 get_pipeline_run_start_time, get_manifest_media_version,
+                                 get_platforms, is_flatpak_build, is_manifest_list,
+                                 map_to_user_params)
 from atomic_reactor.utils.flatpak_util import FlatpakUtil
 from atomic_reactor.utils.koji import (
     add_type_info,
     get_buildroot as koji_get_buildroot,
     get_output as koji_get_output,
     get_output_metadata,
+    upload_file_resumable,
 )
 from atomic_reactor.plugins.fetch_sources import PLUGIN_FETCH_SOURCES_KEY
 
@@ -85,25 +90,92 @@ ArtifactOutputInfo = Tuple[
 ]
 
 
+# non-printable chars, except for \n, \t and \r, are replaced by their escape sequences
+NON_PRINTABLE_CHARS_TRANSLATION = {
+    i: chr(i).encode("unicode-escape").decode("utf-8")
+    for i in range(32)
+    if chr(i) not in ["\n", "\t", "\r"]
+}
+
+
 def escape_non_printable_chars(koji_metadata: Dict[str, Any]) -> Dict[str, Any]:
     """
     Escapes non-printable chars in dictionary, except for \n, \t and \r.
     """
-    translation_table = {
-        i: chr(i).encode("unicode-escape").decode("utf-8")
-        for i in range(32)
-        if chr(i) not in ["\n", "\t", "\r"]
-    }
-
     def callback(value):
         if isinstance(value, str):
-            value = value.translate(translation_table)
+            value = value.translate(NON_PRINTABLE_CHARS_TRANSLATION)
         return value
 
     walker = koji.util.DataWalker(koji_metadata, callback)
     return walker.walk()
 
 
+def _encode_escaped_string(value: str) -> str:
+    return json.dumps(value.translate(NON_PRINTABLE_CHARS_TRANSLATION))
+
+
+def iter_escaped_json(data: Any, indent: Optional[int] = 2) -> Iterator[str]:
+    """
+    Encode data as JSON piece by piece, escaping non-printable chars on the way
+
+    The result is the same as of json.dumps(escape_non_printable_chars(data),
+    indent=indent), but neither the escaped copy of data nor the whole
+    document is kept in memory.
+
+    :param data: JSON serializable data
+    :param indent: int, indentation of nested items, None for compact output
+    """
+    key_separator = ':' if indent is None else ': '
+
+    def encode(value, level):
+        if isinstance(value, str):
+            yield _encode_escaped_string(value)
+        elif isinstance(value, dict):
+            yield from encode_container('{', '}', value.items(), level, is_dict=True)
+        elif isinstance(value, (list, tuple)):
+            yield from encode_container('[', ']', value, level, is_dict=False)
+        else:
+            # numbers, booleans and None
+            yield json.dumps(value)
+
+    def encode_container(opening, closing, items, level, is_dict):
+        if not items:
+            yield opening + closing
+            return
+        if indent is None:
+            newline, closing_newline = '', ''
+        else:
+            newline = '\n' + ' ' * (indent * (level + 1))
+            closing_newline = '\n' + ' ' * (indent * level)
+        separator = opening
+        for item in items:
+            yield separator + newline
+            separator = ','
+            if is_dict:
+                key, item = item
+                if not isinstance(key, str):
+                    # keys are converted the same way as json.dumps does it
+                    key = json.dumps(key)
+                yield _encode_escaped_string(key) + key_separator
+            yield from encode(item, level + 1)
+        yield closing_newline + closing
+
+    yield from encode(data, 0)
+
+
+def dump_escaped_json(data: Any, fp: IO[str], compact: bool = False) -> None:
+    """
+    Write data as JSON to a file, escaping non-printable chars on the way
+
+    :param data: JSON serializable data
+    :param fp: file object opened for writing text
+    :param compact: bool, write without indentation and whitespace
+    """
+    for chunk in iter_escaped_json(data, indent=None if compact else 2):
+        fp.write(chunk)
+
+
 @annotation('koji-build-id')
 class KojiImportBase(Plugin):
     """
@@ -531,13 +603,16 @@ class KojiImportBase(Plugin):
             'output': output,
         }
 
-    def upload_file(self, local_filename: str, dest_filename: str, serverdir: str) -> str:
+    def upload_file(self, local_filename: str, dest_filename: str, serverdir: str,
+                    session=None) -> str:
         """
-        Upload a file to koji
+        Upload a file to koji, failed uploads are resumed, see upload_file_resumable
 
+        :param session: koji session to upload the file with, the plugin's session by default
         :return: str, pathname on server
         """
         self.log.debug("uploading %r to %r as %r", local_filename, serverdir, dest_filename)
+        session = session or self.session
 
         kwargs = {}
         if self.blocksize is not None:
@@ -545,22 +620,27 @@ class KojiImportBase(Plugin):
             self.log.debug("using blocksize %d", self.blocksize)
 
         callback = KojiUploadLogger(self.log).callback
-        self.session.uploadWrapper(
-            local_filename, serverdir, name=dest_filename, callback=callback, **kwargs
+        start = time.monotonic()
+        upload_file_resumable(
+            session, local_filename, serverdir, name=dest_filename, callback=callback, **kwargs
         )
         # In case dest_filename includes path. uploadWrapper can handle this by itself.
         path = os.path.join(serverdir, os.path.basename(dest_filename))
-        self.log.debug("uploaded %r", path)
+        self._log_throughput(f"uploaded {path!r}", os.path.getsize(local_filename),
+                             time.monotonic() - start)
         return path
 
-    def upload_metadata(self, koji_metadata, koji_upload_dir, scratch=False):
-        metadata_file = NamedTemporaryFile(
-            prefix="metadata", suffix=".json", mode='wb', delete=False
-        )
+    def _log_throughput(self, what: str, size: int, seconds: float) -> None:
+        mib = size / 1024 / 1024
+        self.log.info("%s (%.1f MiB) in %.1fs, %.1f MiB/sec",
+                      what, mib, seconds, mib / max(seconds, 0.001))
 
-        koji_metadata = escape_non_printable_chars(koji_metadata)
-        metadata_file.write(json.dumps(koji_metadata, indent=2).encode('utf-8'))
-        metadata_file.close()
+    def upload_metadata(self, koji_metadata, koji_upload_dir, scratch=False):
+        compact = self.workflow.conf.koji.get('compact_metadata', False)
+        with NamedTemporaryFile(
+            prefix="metadata", suffix=".json", mode='w', encoding='utf-8', delete=False
+        ) as metadata_file:
+            dump_escaped_json(koji_metadata, metadata_file, compact=compact)
 
         local_filename = metadata_file.name
         try:
@@ -574,11 +654,72 @@ class KojiImportBase(Plugin):
         return koji_cli.lib.unique_path('koji-upload')
 
     def _upload_output_files(self, server_dir: str) -> None:
-        """Helper method to upload collected output files."""
-        for upload_info in self.workflow.data.koji_upload_files:
-            self.upload_file(upload_info["local_filename"],
-                             upload_info["dest_filename"],
-                             server_dir)
+        """Helper method to upload collected output files.
+
+        When upload_workers is set in the koji configuration, the files are
+        uploaded by that many koji sessions at the same time.
+        """
+        upload_files = [
+            (upload_info["local_filename"], upload_info["dest_filename"])
+            for upload_info in self.workflow.data.koji_upload_files
+        ]
+        if not upload_files:
+            return
+
+        workers = min(self.workflow.conf.koji.get('upload_workers', 1), len(upload_files))
+        start = time.monotonic()
+        if workers > 1:
+            self._upload_files_concurrently(upload_files, server_dir, workers)
+        else:
+            for local_filename, dest_filename in upload_files:
+                self.upload_file(local_filename, dest_filename, server_dir)
+
+        total_size = sum(os.path.getsize(local_filename) for local_filename, _ in upload_files)
+        self._log_throughput(f"uploaded {len(upload_files)} output files", total_size,
+                             time.monotonic() - start)
+
+    def _upload_files_concurrently(self, upload_files: List[Tuple[str, str]], server_dir: str,
+                                   workers: int) -> None:
+        """Upload files by multiple koji sessions, the largest files first
+
+        Each session takes the largest file which is not uploaded yet, so the
+        small files fill the gaps at the end. No more files are uploaded once
+        any upload fails.
+        """
+        pending: queue.SimpleQueue = queue.SimpleQueue()
+        for upload_file in sorted(upload_files, key=lambda item: os.path.getsize(item[0]),
+                                  reverse=True):
+            pending.put(upload_file)
+        failed = threading.Event()
+
+        def upload_pending(session) -> None:
+            while not failed.is_set():
+                try:
+                    local_filename, dest_filename = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    self.upload_file(local_filename, dest_filename, server_dir,
+                                     session=session)
+                except Exception:
+                    failed.set()
+                    raise
+
+        self.log.info("uploading %d output files by %d koji sessions",
+                      len(upload_files), workers)
+        sessions = [self.session]
+        try:
+            sessions.extend(self.session.subsession() for _ in range(workers - 1))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(upload_pending, session) for session in sessions]
+                for future in futures:
+                    future.result()
+        finally:
+            for session in sessions[1:]:
+                try:
+                    session.logout()
+                except Exception:
+                    self.log.warning("failed to log out of koji subsession", exc_info=True)
 
     def run(self):
         """
@@ -740,12 +881,20 @@ class KojiImportPlugin(KojiImportBase):
 
         buildroot_id = outputs[0]['buildroot_id']
 
-        for local_filename, dest_filename, type_info, metadata in chain(
+        collected_files = list(chain(
             self._collect_exported_operator_manifests(),
             self._collect_remote_sources(),
             self._collect_maven_metadata(),
             self._collect_sbom_metadata(),
-        ):
+        ))
+        # checksum the files at the same time, get_output_metadata gets them from the cache
+        get_checksums_for_files(
+            [local_filename for local_filename, _, _, metadata in collected_files
+             if metadata is None],
+            ['md5'],
+        )
+
+        for local_filename, dest_filename, type_info, metadata in collected_files:
             # Maven metadata has been generated already, use it directly.
             if metadata is None:
                 metadata = get_output_metadata(local_filename, dest_filename)
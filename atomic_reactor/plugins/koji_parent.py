@@ -49,6 +49,9 @@ class KojiParentPlugin(Plugin):
 
     key = PLUGIN_KOJI_PARENT_KEY
     is_allowed_to_fail = False
+    reads = ("dockerfile_images", "parent_images_digests",
+             "plugins_results.check_and_set_platforms")
+    writes = ()
 
     def __init__(self, workflow, poll_interval=DEFAULT_POLL_INTERVAL,
                  poll_timeout=DEFAULT_POLL_TIMEOUT):
@@ -86,13 +89,21 @@ class KojiParentPlugin(Plugin):
                 inspect_data=self.workflow.imageutil.base_image_inspect(),
             )
 
+        # inspect all parent images at once instead of one by one in the loop below
+        parent_inspects = self.workflow.imageutil.get_inspect_for_images(
+            (local_tag, None) for img, local_tag in df_images.items()
+            if local_tag and not base_image_is_custom(img.to_str())
+        )
+
         manifest_mismatches = []
         for img, local_tag in df_images.items():
             img_str = img.to_str()
             if base_image_is_custom(img_str):
                 continue
 
-            nvr = self.detect_parent_image_nvr(local_tag) if local_tag else None
+            nvr = self.detect_parent_image_nvr(
+                local_tag, inspect_data=parent_inspects[(str(local_tag), None)]
+            ) if local_tag else None
             parent_build_info = self.wait_for_parent_image_build(nvr) if nvr else None
             self._parent_builds[img_str] = parent_build_info
 
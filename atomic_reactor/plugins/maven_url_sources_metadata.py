@@ -12,7 +12,7 @@ from typing import Any, Dict, List, Sequence
 from atomic_reactor import util
 from atomic_reactor.constants import (KOJI_BTYPE_REMOTE_SOURCE_FILE, PLUGIN_FETCH_MAVEN_KEY,
                                       PLUGIN_MAVEN_URL_SOURCES_METADATA_KEY)
-from atomic_reactor.download import download_url
+from atomic_reactor.download import DownloadManager
 from atomic_reactor.plugin import Plugin
 from atomic_reactor.plugins.fetch_maven_artifacts import DownloadRequest
 
@@ -46,6 +46,7 @@ class MavenURLSourcesMetadataPlugin(Plugin):
         koji_config = self.workflow.conf.koji
         insecure = koji_config.get('insecure_download', False)
 
+        scheduled = []
         for index, download in enumerate(download_queue):
             dest_filename = download.dest
             if not re.fullmatch(r'^[\w\-.]+$', dest_filename):
@@ -58,13 +59,19 @@ class MavenURLSourcesMetadataPlugin(Plugin):
             if not os.path.exists(dest_dir):
                 os.makedirs(dest_dir)
 
-            self.log.debug('%d/%d downloading %s', index + 1, len(download_queue),
+            self.log.debug('%d/%d scheduling download of %s', index + 1, len(download_queue),
                            download.url)
 
-            download_url(url=download.url, dest_dir=dest_dir, insecure=insecure,
-                         session=session, dest_filename=dest_filename,
-                         expected_checksums=download.checksums)
+            scheduled.append((download, dest_path, dest_filename))
 
+        with DownloadManager(session=session, insecure=insecure) as download_manager:
+            download_manager.download_all(
+                {'url': download.url, 'dest_dir': os.path.dirname(dest_path),
+                 'dest_filename': dest_filename, 'expected_checksums': download.checksums}
+                for download, dest_path, dest_filename in scheduled
+            )
+
+        for download, dest_path, dest_filename in scheduled:
             checksum_type = list(download.checksums.keys())[0]
 
             remote_source_files.append({
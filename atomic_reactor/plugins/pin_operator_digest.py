@@ -6,8 +6,11 @@ This software may be modified and distributed under the terms
 of the BSD license. See the LICENSE file for details.
 """
 
+import contextvars
 import logging
 import os.path
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from osbs.utils import Labels, ImageName
@@ -15,6 +18,7 @@ from osbs.utils import Labels, ImageName
 from atomic_reactor.plugin import Plugin
 from atomic_reactor.constants import (
     PLUGIN_PIN_OPERATOR_DIGESTS_KEY,
+    PIN_OPERATOR_DIGEST_MAX_WORKERS,
     INSPECT_CONFIG,
     REPO_CONTAINER_CONFIG,
 )
@@ -52,6 +56,10 @@ class PinOperatorDigestsPlugin(Plugin):
 
     key = PLUGIN_PIN_OPERATOR_DIGESTS_KEY
     is_allowed_to_fail = False
+    reads = ("dockerfile_images", "build_dir")
+    writes = ("build_dir",)
+    # max number of pullspecs resolved at the same time
+    max_workers = PIN_OPERATOR_DIGEST_MAX_WORKERS
 
     args_from_user_params = map_to_user_params(
         "operator_csv_modifications_url",
@@ -458,10 +466,15 @@ class PinOperatorDigestsPlugin(Plugin):
         Replace components of pullspecs according to operator manifest
         replacement config
 
+        Each distinct pullspec is resolved once, up to max_workers pullspecs
+        are resolved at the same time. Registry clients and package mapping
+        files are shared by all of them, see PullspecReplacer.
+
         :param pullspecs: a list of pullspecs.
         :type pullspecs: list[ImageName]
-        :return: a list of replacement result. Each of the replacement result
-            is a mapping containing key/value pairs:
+        :return: a list of replacement result, in the order of pullspecs.
+            Each of the replacement result is a mapping containing key/value
+            pairs:
 
             * ``original``: ImageName, the original pullspec.
             * ``new``: ImageName, the replaced/non-replaced pullspec.
@@ -477,8 +490,6 @@ class PinOperatorDigestsPlugin(Plugin):
         """
         self.log.info("Computing replacement pullspecs")
 
-        replacements = []
-
         pin_digest, replace_repo, replace_registry = self._are_features_enabled()
         if not any([pin_digest, replace_repo, replace_registry]):
             self.log.warning("All replacement features disabled")
@@ -489,35 +500,76 @@ class PinOperatorDigestsPlugin(Plugin):
             if not replacer.registry_is_allowed(p):
                 raise RuntimeError("Registry not allowed: {} (in {})".format(p.registry, p))
 
-        for original in pullspecs:
-            self.log.info("Computing replacement for %s", original)
-            replaced = original
-            pinned = False
-
-            if pin_digest:
-                self.log.debug("Making sure tag is manifest list digest")
-                replaced = replacer.pin_digest(original)
-                if replaced != original:
-                    pinned = True
-
-            if replace_repo:
-                self.log.debug("Replacing namespace/repo")
-                replaced = replacer.replace_repo(replaced)
-
-            if replace_registry:
-                self.log.debug("Replacing registry")
-                replaced = replacer.replace_registry(replaced)
-
-            self.log.info("Final pullspec: %s", replaced)
+        # the same pullspec may be listed more than once, resolve it only once
+        unique_pullspecs = list(dict.fromkeys(pullspecs))
+        features = (pin_digest, replace_repo, replace_registry)
+        workers = min(self.max_workers, len(unique_pullspecs))
+
+        if workers > 1:
+            self.log.debug("Resolving %d pullspecs in %d threads",
+                           len(unique_pullspecs), workers)
+            with ThreadPoolExecutor(max_workers=workers,
+                                    thread_name_prefix="pin-digest") as executor:
+                # in copies of the current context, to count the requests for the plugin
+                futures = [
+                    executor.submit(contextvars.copy_context().run, self._get_replacement,
+                                    replacer, original, *features)
+                    for original in unique_pullspecs
+                ]
+                try:
+                    # results are collected in the order of the pullspecs
+                    resolved = [future.result() for future in futures]
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+        else:
+            resolved = [
+                self._get_replacement(replacer, original, *features)
+                for original in unique_pullspecs
+            ]
 
-            replacements.append({
-                'original': original,
-                'new': replaced,
-                'pinned': pinned,
-                'replaced': replaced != original
-            })
+        replacements_by_original = dict(zip(unique_pullspecs, resolved))
+        return [dict(replacements_by_original[original]) for original in pullspecs]
 
-        return replacements
+    def _get_replacement(self, replacer, original, pin_digest, replace_repo, replace_registry):
+        """
+        Compute the replacement for one pullspec, see
+        _get_replacement_pullspecs_OSBS_resolution
+
+        :param replacer: PullspecReplacer
+        :param original: ImageName, the original pullspec
+        :param pin_digest: bool, replace tag with manifest list digest
+        :param replace_repo: bool, replace namespace/repo
+        :param replace_registry: bool, replace registry
+        :return: dict, the replacement result
+        """
+        self.log.info("Computing replacement for %s", original)
+        replaced = original
+        pinned = False
+
+        if pin_digest:
+            self.log.debug("Making sure tag is manifest list digest")
+            replaced = replacer.pin_digest(original)
+            if replaced != original:
+                pinned = True
+
+        if replace_repo:
+            self.log.debug("Replacing namespace/repo")
+            replaced = replacer.replace_repo(replaced)
+
+        if replace_registry:
+            self.log.debug("Replacing registry")
+            replaced = replacer.replace_registry(replaced)
+
+        self.log.info("Final pullspec for %s: %s", original, replaced)
+
+        return {
+            'original': original,
+            'new': replaced,
+            'pinned': pinned,
+            'replaced': replaced != original
+        }
 
     def _are_features_enabled(self):
         pin_digest = self.user_config.get("enable_digest_pinning", True)
@@ -540,6 +592,9 @@ _KEEP = object()
 class PullspecReplacer(object):
     """
     Helper that takes care of replacing parts of image pullspecs
+
+    A replacer may be used by several threads at the same time, registry
+    clients and package mappings are created only once and shared by them.
     """
 
     def __init__(self, user_config, workflow):
@@ -583,6 +638,10 @@ class PullspecReplacer(object):
         # RegistryClient instances cached by registry name
         self.registry_clients = {}
 
+        self._clients_lock = threading.Lock()
+        # reentrant, _get_final_mapping gets the site mapping while holding it
+        self._mappings_lock = threading.RLock()
+
     def registry_is_allowed(self, image):
         """
         Is image registry allowed in OSBS config?
@@ -668,13 +727,15 @@ class PullspecReplacer(object):
 
         if mapping_url is None:
             return None
-        elif mapping_url in self.url_package_mappings:
-            return self.url_package_mappings[mapping_url]
 
-        self.log.debug("Downloading mapping file for %s from %s", registry, mapping_url)
-        mapping = read_yaml_from_url(mapping_url, "schemas/package_mapping.json")
-        self.url_package_mappings[mapping_url] = mapping
-        return mapping
+        with self._mappings_lock:
+            if mapping_url in self.url_package_mappings:
+                return self.url_package_mappings[mapping_url]
+
+            self.log.debug("Downloading mapping file for %s from %s", registry, mapping_url)
+            mapping = read_yaml_from_url(mapping_url, "schemas/package_mapping.json")
+            self.url_package_mappings[mapping_url] = mapping
+            return mapping
 
     def _get_component_name(self, image):
         """
@@ -701,39 +762,42 @@ class PullspecReplacer(object):
         replacement for a package incorrectly, build should only fail when
         replacing repos for that specific package, not before.
         """
-        mapping = self.final_package_mappings.setdefault(registry, {})
-        if package in mapping:
-            return mapping
-
-        site_mapping = self._get_site_mapping(registry) or {}
-        user_mapping = self.user_package_mappings.get(registry, {})
+        with self._mappings_lock:
+            mapping = self.final_package_mappings.setdefault(registry, {})
+            if package in mapping:
+                return mapping
+
+            site_mapping = self._get_site_mapping(registry) or {}
+            user_mapping = self.user_package_mappings.get(registry, {})
+
+            if package in user_mapping:
+                replacement = user_mapping[package]
+                if package not in site_mapping or replacement in site_mapping[package]:
+                    self.log.debug("User set replacement for package %s: %s", package, replacement)
+                    # Mapping file is [package => list of repos], user mapping is [package => repo]
+                    # Stick to [package => list of repos]
+                    mapping[package] = [replacement]
+                else:
+                    choices = ", ".join(site_mapping[package])
+                    raise RuntimeError("Invalid replacement for package {}: {} (choices: {})"
+                                       .format(package, replacement, choices))
+            elif package in site_mapping:
+                mapping[package] = site_mapping[package]
 
-        if package in user_mapping:
-            replacement = user_mapping[package]
-            if package not in site_mapping or replacement in site_mapping[package]:
-                self.log.debug("User set replacement for package %s: %s", package, replacement)
-                # Mapping file is [package => list of repos], user mapping is [package => repo]
-                # Stick to [package => list of repos]
-                mapping[package] = [replacement]
-            else:
-                choices = ", ".join(site_mapping[package])
-                raise RuntimeError("Invalid replacement for package {}: {} (choices: {})"
-                                   .format(package, replacement, choices))
-        elif package in site_mapping:
-            mapping[package] = site_mapping[package]
-
-        return mapping
+            return mapping
 
     def _get_registry_client(self, registry):
         """
         Get registry client for specified registry, cached by registry name
         """
-        client = self.registry_clients.get(registry)
-        if client is None:
-            session = RegistrySession.create_from_config(self.workflow.conf, registry=registry)
-            client = RegistryClient(session)
-            self.registry_clients[registry] = client
-        return client
+        with self._clients_lock:
+            client = self.registry_clients.get(registry)
+            if client is None:
+                session = RegistrySession.create_from_config(self.workflow.conf,
+                                                             registry=registry)
+                client = RegistryClient(session)
+                self.registry_clients[registry] = client
+            return client
 
     def _replace(self, image, registry=_KEEP, namespace=_KEEP, repo=_KEEP, tag=_KEEP):
         """
@@ -48,6 +48,9 @@ class ResolveComposesPlugin(Plugin):
 
     key = PLUGIN_RESOLVE_COMPOSES_KEY
     is_allowed_to_fail = False
+    reads = ("dockerfile_images", "plugins_results.koji_parent",
+             "plugins_results.check_and_set_platforms")
+    writes = ("all_yum_repourls",)
 
     args_from_user_params = util.map_to_user_params(
         "koji_target",
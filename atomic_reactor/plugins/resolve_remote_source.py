@@ -219,7 +219,7 @@ class ResolveRemoteSourcePlugin(Plugin):
     def inject_remote_sources(self, remote_sources: List[RemoteSource]) -> None:
         """Inject processed remote sources into build dirs and add build args to workflow."""
         inject_sources = functools.partial(self.inject_into_build_dir, remote_sources)
-        self.workflow.build_dir.for_all_platforms_copy(inject_sources)
+        self.workflow.build_dir.for_all_platforms_copy(inject_sources, immutable=True)
 
         # For single remote_source workflow, inject all build args directly
         if self.single_remote_source_params:
@@ -251,8 +251,11 @@ class ResolveRemoteSourcePlugin(Plugin):
             dest_dir.mkdir(parents=True)
             created_dirs.append(dest_dir)
 
-            with tarfile.open(remote_source.tarball_path) as tar:
-                safe_extractall(tar, str(dest_dir))
+            # the tarball is read once, members are checked while they are extracted
+            with tarfile.open(remote_source.tarball_path, mode='r|*') as tar:
+                extracted = safe_extractall(tar, str(dest_dir))
+            self.log.debug("Extracted %d entries (%d bytes) of remote source to %s",
+                           extracted.entries, extracted.bytes, dest_dir)
 
             self.generate_cachito_config_files(dest_dir, remote_source.json_config_data)
 
@@ -27,6 +27,8 @@ __all__ = ('RPMqaPlugin',)
 class RPMqaPlugin(Plugin):
     key = PLUGIN_RPMQA
     is_allowed_to_fail = False
+    # extracting the rpmdb from the images of different platforms is independent
+    parallel_platforms = True
     sep = ';'
 
     def __init__(self, workflow, ignore_autogenerated_gpg_keys=True):
@@ -46,7 +48,7 @@ class RPMqaPlugin(Plugin):
             self.log.info('Another plugin has already filled in the image component list, skip')
             return None
         self.workflow.data.image_components = self.workflow.build_dir.for_each_platform(
-            self.gather_output)
+            self.gather_output, parallel=self.parallel_platforms)
 
         return self.sbom_components
 
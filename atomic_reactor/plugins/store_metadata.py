@@ -78,6 +78,8 @@ class StoreMetadataPlugin(Plugin):
         try:
             data = self.workflow.fs_watcher.get_usage_data()
             self.log.debug("filesystem metadata: %s", data)
+            # the mounts used by the build, per-plugin peaks and a bounded summary of usage
+            data.update(self.workflow.fs_watcher.get_usage_report())
         except Exception:
             self.log.exception("Error getting filesystem stats")
 
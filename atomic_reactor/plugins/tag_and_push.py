@@ -28,7 +28,7 @@ from atomic_reactor.util import (Dockercfg, get_all_manifests,
                                  get_manifest_digests,
                                  get_platforms,
                                  is_flatpak_build,
-                                 map_to_user_params)
+                                 map_to_user_params, registry_cache)
 from atomic_reactor.utils import retries
 from osbs.utils import ImageName
 import osbs.utils
@@ -93,6 +93,9 @@ class TagAndPushPlugin(Plugin):
         except subprocess.CalledProcessError as e:
             self.log.error("push failed with output:\n%s", e.output)
             raise
+        finally:
+            # the tag may now point to a different manifest
+            registry_cache.invalidate()
 
     def source_get_unique_image(self) -> ImageName:
         source_result = self.workflow.data.plugins_results[PLUGIN_FETCH_SOURCES_KEY]
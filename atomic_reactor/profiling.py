@@ -0,0 +1,194 @@
+"""
+Copyright (c) 2026 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+
+
+Startup profiling
+
+The profiler records how long it takes to import each module and when
+the important points of the startup are reached, e.g. when the first
+plugin starts. It is enabled by the ATOMIC_REACTOR_PROFILE_STARTUP
+environment variable or by the --profile-startup CLI option. Both are
+checked as soon as the atomic_reactor package is imported, so imports
+done before the CLI arguments are parsed are recorded as well.
+
+This module is imported by atomic_reactor/__init__.py, keep its imports
+to the standard library.
+"""
+import importlib.abc
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from atomic_reactor.constants import PROFILE_STARTUP_ENV, PROFILE_STARTUP_OPTION
+
+logger = logging.getLogger(__name__)
+
+
+class _TimingLoader(importlib.abc.Loader):
+    """Loader wrapper measuring how long the module takes to execute"""
+
+    def __init__(self, loader, profiler: "StartupProfiler"):
+        self._loader = loader
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        # the module must not see the wrapper, e.g. pkg_resources looks up
+        # resource providers by the type of module.__loader__
+        module.__loader__ = self._loader
+        module.__spec__.loader = self._loader
+        self._profiler.exec_module(self._loader, module)
+
+
+class _TimingFinder(importlib.abc.MetaPathFinder):
+    """Meta path finder which wraps loaders found by the other finders"""
+
+    def __init__(self, profiler: "StartupProfiler"):
+        self._profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimingLoader(spec.loader, self._profiler)
+        return spec
+
+
+class StartupProfiler(object):
+    """Record import times and startup milestones
+
+    Import times are kept separately for each module: self time excludes
+    imports done by the module, cumulative time includes them.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.start_time = time.perf_counter()
+        # module name -> (self time, cumulative time)
+        self.imports: Dict[str, Tuple[float, float]] = {}
+        # milestone name -> seconds since start
+        self.milestones: Dict[str, float] = {}
+        self._finder: Optional[_TimingFinder] = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start recording imports"""
+        if self._finder is not None:
+            return
+        self.enabled = True
+        self.start_time = time.perf_counter()
+        self._finder = _TimingFinder(self)
+        sys.meta_path.insert(0, self._finder)
+
+    def stop(self) -> None:
+        """Stop recording imports"""
+        if self._finder is None:
+            return
+        try:
+            sys.meta_path.remove(self._finder)
+        except ValueError:
+            pass
+        self._finder = None
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start_time
+
+    def exec_module(self, loader, module) -> None:
+        """Execute module by loader and record how long it took"""
+        stack: List[float] = self._local.__dict__.setdefault("stack", [])
+        # time spent importing other modules from this one
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            loader.exec_module(module)
+        finally:
+            cumulative = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += cumulative
+            with self._lock:
+                self.imports[module.__name__] = (cumulative - nested, cumulative)
+
+    def mark(self, name: str) -> None:
+        """Record that a milestone was reached, only the first time counts
+
+        :param name: str, name of the milestone
+        """
+        if self.enabled and name not in self.milestones:
+            self.milestones[name] = self.elapsed()
+
+    def summary(self, top: int = 20) -> Dict[str, Any]:
+        """Summarize the recorded data
+
+        :param top: int, number of the slowest modules to include
+        :return: dict with total import time, import time of top-level
+            packages, the slowest modules (by self time) and milestones
+        """
+        with self._lock:
+            imports = dict(self.imports)
+
+        packages: Dict[str, float] = defaultdict(float)
+        for name, (self_time, _) in imports.items():
+            packages[name.split(".", 1)[0]] += self_time
+
+        slowest = sorted(imports.items(), key=lambda item: item[1][0], reverse=True)[:top]
+        return {
+            "modules": len(imports),
+            "import_time": sum(self_time for self_time, _ in imports.values()),
+            "packages": dict(sorted(packages.items(), key=lambda item: item[1], reverse=True)),
+            "slowest_modules": [
+                {"module": name, "self": self_time, "cumulative": cumulative}
+                for name, (self_time, cumulative) in slowest
+            ],
+            "milestones": dict(self.milestones),
+        }
+
+    def finish(self, top: int = 10) -> None:
+        """Stop recording and log the summary, only the first call does anything
+
+        :param top: int, number of the slowest packages to log
+        """
+        if self._finder is None:
+            return
+        self.mark("profile_finished")
+        self.stop()
+
+        summary = self.summary()
+        logger.info("startup profile: %d modules imported in %.3fs",
+                    summary["modules"], summary["import_time"])
+        for package, import_time in list(summary["packages"].items())[:top]:
+            logger.info("startup profile: importing %s took %.3fs", package, import_time)
+        for milestone, at in summary["milestones"].items():
+            logger.info("startup profile: %s at %.3fs", milestone, at)
+
+
+def profiling_requested() -> bool:
+    """Check whether startup profiling is turned on by env var or CLI option"""
+    env_value = os.environ.get(PROFILE_STARTUP_ENV, "")
+    return env_value not in ("", "0") or PROFILE_STARTUP_OPTION in getattr(sys, "argv", [])
+
+
+startup_profiler = StartupProfiler()
+if profiling_requested():
+    startup_profiler.start()
@@ -5,15 +5,20 @@ All rights reserved.
 This software may be modified and distributed under the terms
 of the BSD license. See the LICENSE file for details.
 """
+import codecs
 import contextlib
 import functools
+import io
 import json
 import logging
+import os
+import re
+import selectors
 import shutil
 import subprocess
 import time
 from dataclasses import dataclass
-from typing import Any, Dict, Iterator, List, Optional
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, TextIO
 from json import JSONDecodeError
 
 from osbs.utils import ImageName
@@ -22,7 +27,8 @@ from otel_extensions import instrumented, get_tracer
 from atomic_reactor import dirs
 from atomic_reactor import util
 from atomic_reactor.constants import (REMOTE_HOST_MAX_RETRIES, REMOTE_HOST_RETRY_INTERVAL,
-                                      OTEL_SERVICE_NAME)
+                                      OTEL_SERVICE_NAME, BUILD_OUTPUT_READ_SIZE,
+                                      BUILD_LOG_BATCH_SIZE)
 from atomic_reactor.tasks.common import Task, TaskParams
 from atomic_reactor.utils import retries
 from atomic_reactor.utils import remote_host
@@ -30,6 +36,10 @@ from atomic_reactor.utils import remote_host
 
 logger = logging.getLogger(__name__)
 
+# podman marks the start of each Dockerfile instruction with "STEP 1/5: FROM ...",
+#   older versions do not print the total number of steps ("STEP 1: FROM ...")
+BUILD_STEP_RE = re.compile(r"STEP (\d+)(?:/(\d+))?: (.*)")
+
 
 class BuildTaskError(Exception):
     """The build task failed."""
@@ -51,6 +61,116 @@ class InspectError(BuildTaskError):
     """Failed to inspect the built image."""
 
 
+@dataclass
+class BuildStep:
+    """A single step (Dockerfile instruction) of the build."""
+    number: int
+    instruction: str
+    started: float
+    duration: Optional[float] = None
+
+
+class BuildStepParser:
+    """Pick out the build steps from the build output and measure how long they took."""
+
+    def __init__(self):
+        self.steps: List[BuildStep] = []
+        self.total_steps: Optional[int] = None
+
+    def _finish_current_step(self, now: float) -> None:
+        if self.steps and self.steps[-1].duration is None:
+            self.steps[-1].duration = now - self.steps[-1].started
+
+    def feed(self, line: str) -> Optional[BuildStep]:
+        """Process a line of the build output, return the build step it starts (if any)."""
+        # cheap check first, the vast majority of lines is not a step marker
+        if not line.startswith("STEP "):
+            return None
+        if not (match := BUILD_STEP_RE.match(line.rstrip())):
+            return None
+
+        now = time.monotonic()
+        self._finish_current_step(now)
+        number, total, instruction = match.groups()
+        if total:
+            self.total_steps = int(total)
+        step = BuildStep(number=int(number), instruction=instruction, started=now)
+        self.steps.append(step)
+        return step
+
+    def finish(self) -> None:
+        """Mark the end of the build output, the last step ends here."""
+        self._finish_current_step(time.monotonic())
+
+    def format_timings(self) -> str:
+        """Return a human-readable summary of the duration of each build step."""
+        total = f"/{self.total_steps}" if self.total_steps else ""
+        return "\n".join(
+            f"STEP {step.number}{total} ({step.duration or 0:.1f}s): {step.instruction}"
+            for step in self.steps
+        )
+
+
+def write_build_log(
+    output_lines: Iterable[str],
+    build_log_file: TextIO,
+    batch_size: int = BUILD_LOG_BATCH_SIZE,
+) -> BuildStepParser:
+    """Log the build output and write it to the build log file in batches.
+
+    The lines collected so far are written out even if reading the output fails.
+
+    :param output_lines: iterable of build output lines (including line endings)
+    :param build_log_file: the platform build log file
+    :param batch_size: int, number of lines written to the build log at once
+    :return: BuildStepParser, the build steps found in the output
+    """
+    step_parser = BuildStepParser()
+    batch: List[str] = []
+    try:
+        for line in output_lines:
+            logger.info(line.rstrip())
+            step_parser.feed(line)
+            batch.append(line)
+            if len(batch) >= batch_size:
+                build_log_file.writelines(batch)
+                build_log_file.flush()
+                batch.clear()
+    finally:
+        step_parser.finish()
+        build_log_file.writelines(batch)
+        build_log_file.flush()
+    return step_parser
+
+
+def _read_output(stream: IO[bytes]) -> Iterator[List[str]]:
+    """Read the output of a process as it becomes available, yield batches of lines.
+
+    Waits for the pipe to become readable instead of polling the process, then takes
+    everything that is available at once. Decoding matches universal_newlines=True.
+    """
+    decoder = io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder("utf-8")(errors="replace"), translate=True
+    )
+    fd = stream.fileno()
+    partial_line = ""
+
+    with selectors.DefaultSelector() as selector:
+        selector.register(fd, selectors.EVENT_READ)
+        while True:
+            selector.select()
+            chunk = os.read(fd, BUILD_OUTPUT_READ_SIZE)
+            text = partial_line + decoder.decode(chunk, final=not chunk)
+            *lines, partial_line = text.split("\n")
+            if lines:
+                yield [line + "\n" for line in lines]
+            if not chunk:
+                break
+
+    if partial_line:
+        yield [partial_line]
+
+
 @dataclass(frozen=True)
 class BinaryBuildTaskParams(TaskParams):
     """Binary container build task parameters"""
@@ -125,11 +245,11 @@ class BinaryBuildTask(Task[BinaryBuildTaskParams]):
                     memory_limit=config.remote_hosts.get("memory_limit"),
                     podman_capabilities=config.remote_hosts.get("podman_capabilities")
                 )
-                for line in output_lines:
-                    logger.info(line.rstrip())
-                    build_log_file.write(line)
+                step_parser = write_build_log(output_lines, build_log_file)
 
                 logger.info("Build finished successfully! Pushing image to %s", dest_tag)
+                if step_parser.steps:
+                    logger.info("Build step timings:\n%s", step_parser.format_timings())
 
             image_size_limit = config.image_size_limit['binary_image']
             image_size = podman_remote.get_image_size(dest_tag)
@@ -151,11 +271,14 @@ class BinaryBuildTask(Task[BinaryBuildTaskParams]):
         logger.info("Acquiring a build slot on a remote host")
         pool = remote_host.RemoteHostsPool.from_config(remote_hosts_config, self._params.platform)
         resource = None
-        for _ in range(REMOTE_HOST_MAX_RETRIES + 1):
-            resource = pool.lock_resource(prid=self._params.pipeline_run_name)
-            if resource:
-                break
-            time.sleep(REMOTE_HOST_RETRY_INTERVAL)
+        try:
+            for _ in range(REMOTE_HOST_MAX_RETRIES + 1):
+                resource = pool.lock_resource(prid=self._params.pipeline_run_name)
+                if resource:
+                    break
+                time.sleep(REMOTE_HOST_RETRY_INTERVAL)
+        finally:
+            pool.close()
         if not resource:
             raise BuildTaskError(
                 "Failed to acquire a build slot on any remote host! See the logs for more details."
@@ -241,7 +364,7 @@ class PodmanRemote:
         flatpak: bool,
         memory_limit: Optional[str],
         podman_capabilities: Optional[List[str]],
-    ) -> Iterator[Optional[str]]:
+    ) -> Iterator[str]:
         """Build a container image from the specified build directory.
 
         Pass the specified build arguments as ARG values using --build-arg.
@@ -251,7 +374,9 @@ class PodmanRemote:
         (nor does the format really matter), but podman will typically default to 'oci'.
 
         This method returns an iterator which yields individual lines from the stdout
-        and stderr of the build process as they become available.
+        and stderr of the build process as they become available. The last non-empty
+        line is held back until the build finishes; if the build fails, it becomes
+        the error message instead.
         """
         options = [
             f"--tag={dest_tag}",
@@ -288,40 +413,42 @@ class PodmanRemote:
             build_cmd,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
-            universal_newlines=True,
-            encoding="utf-8",
-            errors="replace",
         )
 
         # passing stdout=PIPE guarantees that stdout is not None, but the type hints for the
         #   subprocess module do not express that (TL;DR - this is just for type checkers)
         assert build_process.stdout is not None
 
+        # keep the last non-empty, non-whitespace line for an eventual error message
         last_line = None
-        buffer: List[str] = []
-
-        while True:
-            if line := build_process.stdout.readline():
-                if buffer and buffer[0] != last_line:
-                    yield buffer.pop(0)
-                buffer.append(line)
-                if line.rstrip():
-                    # keep the last non-empty, non-whitespace line for an eventual error message
+        # whitespace-only lines which came after last_line, they are held back with it
+        pending: List[str] = []
+
+        with build_process.stdout:
+            for lines in _read_output(build_process.stdout):
+                for line in lines:
+                    if not line.rstrip():
+                        if last_line is None:
+                            yield line
+                        else:
+                            pending.append(line)
+                        continue
+                    if last_line is not None:
+                        yield last_line
+                        yield from pending
+                        pending.clear()
                     last_line = line
 
-            if (rc := build_process.poll()) is not None:
-                break
-
-        for line in buffer:
-            if line != last_line:
-                yield line
+        rc = build_process.wait()
 
         if rc != 0:
             logger.error(last_line)
+            yield from pending
             error = last_line if last_line else "<no output!>"
             raise BuildProcessError(f"Build failed (rc={rc}): {error}")
-        else:
+        elif last_line is not None:
             yield last_line
+            yield from pending
 
     @instrumented
     def get_image_size(self, dest_tag: ImageName) -> int:
@@ -365,3 +492,6 @@ class PodmanRemote:
             raise PushError(
                 f"Push failed (rc={e.returncode}). Check the logs for more details."
             ) from e
+        finally:
+            # the tag may now point to a different manifest
+            util.registry_cache.invalidate()
@@ -26,6 +26,7 @@ from atomic_reactor import source
 from atomic_reactor import util
 from atomic_reactor.constants import OTEL_SERVICE_NAME
 from atomic_reactor.plugin import TaskCanceledException
+from atomic_reactor.profiling import startup_profiler
 
 logger = logging.getLogger(__name__)
 
@@ -154,10 +155,14 @@ class Task(abc.ABC, Generic[ParamsT]):
 
             RequestsInstrumentor().instrument()
 
+            # reuse registry responses cached by the previous tasks of this build
+            util.registry_cache.persistent_dir = self.get_context_dir().registry_cache_dir
+
             span_name = self.task_name
             if hasattr(self._params, 'platform'):
                 span_name += '_' + self._params.platform
             tracer = get_tracer(module_name=span_name, service_name=OTEL_SERVICE_NAME)
+            startup_profiler.mark("task_started")
             with tracer.start_as_current_span(span_name):
                 result = self.execute(*args, **kwargs)
             if self._params.task_result:
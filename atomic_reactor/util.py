@@ -17,18 +17,24 @@ import io
 import os
 import re
 import requests
+import shutil
 from requests.exceptions import SSLError, HTTPError, RetryError
+from requests.structures import CaseInsensitiveDict
 import tempfile
-from typing import Any, Final, Iterator, Sequence, Dict, Union, List, BinaryIO, Tuple, Optional
+from typing import (Any, Final, Iterator, Sequence, Dict, Union, List, BinaryIO, Tuple, Optional,
+                    Set)
 import logging
 import uuid
 import yaml
 import string
 import signal
 import tarfile
-from collections import namedtuple
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
-from base64 import b64decode
+from base64 import b64decode, b64encode
 from pathlib import Path
 from typing import Callable
 
@@ -52,7 +58,10 @@ from atomic_reactor.constants import (DOCKERFILE_FILENAME, REPO_CONTAINER_CONFIG
                                       REPO_CONTENT_SETS_CONFIG,
                                       REPO_FETCH_ARTIFACTS_URL,
                                       REPO_FETCH_ARTIFACTS_PNC,
-                                      USER_CONFIG_FILES, REPO_FETCH_ARTIFACTS_KOJI)
+                                      USER_CONFIG_FILES, REPO_FETCH_ARTIFACTS_KOJI,
+                                      REGISTRY_CACHE_MAX_SIZE, REGISTRY_CACHE_TAG_TTL,
+                                      CHECKSUM_READ_SIZE, CHECKSUM_MAX_WORKERS,
+                                      CHECKSUM_CACHE_MAX_ENTRIES)
 from atomic_reactor.auth import HTTPRegistryAuth
 from atomic_reactor.types import ISerializer, ImageInspectionData
 
@@ -306,26 +315,108 @@ def _process_plugin_substitution(mapping, key_parts, value):
 
 
 def _compute_checksums(
-    fd: BinaryIO, hash_objs: List[_hashlib.HASH], blocksize: int = 65536
+    fd: BinaryIO, hash_objs: List[_hashlib.HASH], blocksize: int = CHECKSUM_READ_SIZE
 ) -> None:
     """
     Compute file checksums in given hash objects.
 
+    All the hash objects are updated from a single pass over the file.
+
     :param fd: file-like object
     :param hash_objs: list, hashlib hash objects for each algorithm to be calculated
     :param blocksize: block size used to read fd
     """
-    buf = fd.read(blocksize)
-    while len(buf) > 0:
-        for hash_object in hash_objs:
-            hash_object.update(buf)
+    if not hasattr(fd, 'readinto'):
         buf = fd.read(blocksize)
+        while len(buf) > 0:
+            for hash_object in hash_objs:
+                hash_object.update(buf)
+            buf = fd.read(blocksize)
+        return
+
+    # reuse a single buffer, hashlib releases the GIL while hashing large blocks
+    buf = bytearray(blocksize)
+    view = memoryview(buf)
+    size = fd.readinto(buf)
+    while size:
+        for hash_object in hash_objs:
+            hash_object.update(view[:size])
+        size = fd.readinto(buf)
+
+
+def _check_algorithms(algorithms: List[str]) -> None:
+    allowed_algorithms = ['md5', 'sha256']
+    if not all(elem in allowed_algorithms for elem in algorithms):
+        raise ValueError('Algorithms supported {}. Found {}'.format(allowed_algorithms, algorithms))
+
+
+class ChecksumCache(object):
+    """
+    Cache of checksums of files
+
+    A file is identified by its path, inode, size and modification and
+    change times, so a file which is rewritten gets new checksums.
+    """
+
+    def __init__(self, max_entries: int = CHECKSUM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # file key -> {'md5sum': ..., 'sha256sum': ...}
+        self._entries: typing.OrderedDict[Tuple, Dict[str, str]] = OrderedDict()
+
+    @staticmethod
+    def _get_key(path: str) -> Tuple:
+        st = os.stat(path)
+        return (os.path.realpath(path), st.st_dev, st.st_ino, st.st_size,
+                st.st_mtime_ns, st.st_ctime_ns)
+
+    def get_checksums(self, path: str, algorithms: List[str]) -> Dict[str, str]:
+        """
+        Get checksums of a file, compute those which are not cached yet
+
+        :param path: str, path to the file
+        :param algorithms: list of cryptographic hash functions
+        :return: dict, e.g. {'md5sum': ...}
+        """
+        key = self._get_key(path)
+        with self._lock:
+            cached = dict(self._entries.get(key, {}))
+        missing = [algorithm for algorithm in algorithms if f'{algorithm}sum' not in cached]
+
+        if missing:
+            hash_objs = [getattr(hashlib, algorithm)() for algorithm in missing]
+            # unbuffered, data is read right into the buffer of _compute_checksums
+            with open(path, mode='rb', buffering=0) as f:
+                _compute_checksums(f, hash_objs)
+            computed = {f'{hash_obj.name}sum': hash_obj.hexdigest() for hash_obj in hash_objs}
+            cached.update(computed)
+
+            # don't cache checksums of a file which changed while it was read
+            if self._get_key(path) == key:
+                with self._lock:
+                    self._entries.setdefault(key, {}).update(computed)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        else:
+            logger.debug('using cached checksums of %s', path)
+
+        return {f'{algorithm}sum': cached[f'{algorithm}sum'] for algorithm in algorithms}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+checksum_cache = ChecksumCache()
 
 
 def get_checksums(filename: Union[str, BinaryIO], algorithms: List[str]) -> Dict[str, str]:
     """
     Compute a checksum(s) of given file using specified algorithms.
 
+    Checksums of files given by path are cached, see ChecksumCache.
+
     :param filename: path to file or file-like object
     :param algorithms: list of cryptographic hash functions, currently supported: md5, sha256
     :return: dictionary
@@ -333,26 +424,40 @@ def get_checksums(filename: Union[str, BinaryIO], algorithms: List[str]) -> Dict
     if not algorithms:
         return {}
 
-    allowed_algorithms = ['md5', 'sha256']
-    if not all(elem in allowed_algorithms for elem in algorithms):
-        raise ValueError('Algorithms supported {}. Found {}'.format(allowed_algorithms, algorithms))
-
-    hash_objs = [getattr(hashlib, algorithm)() for algorithm in algorithms]
+    _check_algorithms(algorithms)
 
     if isinstance(filename, str):
-        with open(filename, mode='rb') as f:
-            _compute_checksums(f, hash_objs)
+        checksums = checksum_cache.get_checksums(filename, algorithms)
     else:
+        hash_objs = [getattr(hashlib, algorithm)() for algorithm in algorithms]
         _compute_checksums(filename, hash_objs)
+        checksums = {f'{hash_obj.name}sum': hash_obj.hexdigest() for hash_obj in hash_objs}
 
-    checksums = {}
-    for hash_obj in hash_objs:
-        sum_name = '{}sum'.format(hash_obj.name)
-        checksums[sum_name] = hash_obj.hexdigest()
-        logger.debug('%s: %s', sum_name, checksums[sum_name])
+    for sum_name, checksum in checksums.items():
+        logger.debug('%s: %s', sum_name, checksum)
     return checksums
 
 
+def get_checksums_for_files(
+    paths: Sequence[str], algorithms: List[str]
+) -> Dict[str, Dict[str, str]]:
+    """
+    Compute checksums of multiple files at the same time.
+
+    :param paths: paths to the files
+    :param algorithms: list of cryptographic hash functions, see get_checksums
+    :return: dict, path -> checksums of the file
+    """
+    _check_algorithms(algorithms)
+    paths = list(dict.fromkeys(paths))
+    if len(paths) <= 1:
+        return {path: get_checksums(path, algorithms) for path in paths}
+
+    with ThreadPoolExecutor(max_workers=min(CHECKSUM_MAX_WORKERS, len(paths))) as executor:
+        results = executor.map(lambda path: get_checksums(path, algorithms), paths)
+        return dict(zip(paths, results))
+
+
 def get_exported_image_metadata(path, image_type) -> Dict[str, Union[str, int]]:
     logger.info('getting metadata for exported image %s (%s)', path, image_type)
     metadata = {'path': path, 'type': image_type}
@@ -531,6 +636,162 @@ class Dockercfg(object):
                 raise ValueError("Failed to parse 'auth' in '%s'" % self.json_secret_path)
 
 
+class RegistryCache(object):
+    """
+    Cache of successful registry responses for manifests and blobs
+
+    Responses for digest references never change, they are kept until the cache
+    needs room for newer entries. Responses for tag references expire after
+    tag_ttl seconds, and when anything is pushed to a registry.
+
+    A single instance (registry_cache) is shared by all RegistryClients in the
+    process, see query_registry.
+
+    If persistent_dir is set, responses for digest references are also stored
+    there, so that other processes (later tasks of the same build) can use them
+    without querying the registry.
+    """
+
+    def __init__(self, max_size=REGISTRY_CACHE_MAX_SIZE, tag_ttl=REGISTRY_CACHE_TAG_TTL):
+        """
+        :param max_size: int, max total size (in bytes) of the cached response content
+        :param tag_ttl: float, seconds to keep responses for tag references
+        """
+        self.max_size = max_size
+        self.tag_ttl = tag_ttl
+        self.persistent_dir: Optional[Path] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._size = 0
+        # key -> (response, expiration time or None); ordered from least recently used
+        self._entries: 'OrderedDict[tuple, Tuple[requests.Response, Optional[float]]]' = \
+            OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple, immutable: bool = False) -> Optional[requests.Response]:
+        """
+        Return the cached response for key, or None
+
+        :param key: tuple, identifies the request
+        :param immutable: bool, key is for a digest reference, look in persistent_dir too
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                response, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return response
+                self._remove(key)
+
+        response = self._load(key) if immutable and self.persistent_dir else None
+        with self._lock:
+            if response is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._store(key, response, expires=None)
+        return response
+
+    def put(self, key: tuple, response: requests.Response, immutable: bool) -> None:
+        """
+        Cache the response for key
+
+        :param key: tuple, identifies the request
+        :param response: requests.Response, successful response with the content loaded
+        :param immutable: bool, response is for a digest reference and never changes
+        """
+        if immutable and self.persistent_dir:
+            self._save(key, response)
+        expires = None if immutable else time.monotonic() + self.tag_ttl
+        self._store(key, response, expires)
+
+    def _store(self, key: tuple, response: requests.Response, expires: Optional[float]) -> None:
+        size = len(response.content)
+        if size > self.max_size:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (response, expires)
+            self._size += size
+            while self._size > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def _persistent_path(self, key: tuple) -> Path:
+        assert self.persistent_dir
+        name = hashlib.sha256(json.dumps(key).encode()).hexdigest()
+        return self.persistent_dir / f'{name}.json'
+
+    def _load(self, key: tuple) -> Optional[requests.Response]:
+        path = self._persistent_path(key)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            response = requests.Response()
+            response.url = data['url']
+            response.status_code = data['status_code']
+            response.headers = CaseInsensitiveDict(data['headers'])
+            response._content = b64decode(data['content'])  # pylint: disable=protected-access
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as exc:
+            logger.debug('ignoring unreadable registry cache file %s: %s', path, exc)
+            return None
+        return response
+
+    def _save(self, key: tuple, response: requests.Response) -> None:
+        path = self._persistent_path(key)
+        data = {
+            'url': response.url,
+            'status_code': response.status_code,
+            'headers': dict(response.headers),
+            'content': b64encode(response.content).decode(),
+        }
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # concurrent tasks may share the directory, never leave a partial file behind
+            with NamedTemporaryFile('w', dir=path.parent, suffix='.tmp', delete=False) as f:
+                try:
+                    json.dump(data, f)
+                except Exception:
+                    os.unlink(f.name)
+                    raise
+            os.replace(f.name, path)
+        except OSError as exc:
+            logger.debug('failed to write registry cache file %s: %s', path, exc)
+
+    def _remove(self, key: tuple) -> None:
+        response, _ = self._entries.pop(key)
+        self._size -= len(response.content)
+
+    def invalidate(self) -> None:
+        """Drop all responses for tag references, e.g. after pushing to a registry"""
+        with self._lock:
+            for key in [key for key, (_, expires) in self._entries.items() if expires is not None]:
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Drop all responses cached in memory and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = 0
+            self.disk_hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return the cache counters"""
+        with self._lock:
+            return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                    'entries': len(self._entries), 'size': self._size}
+
+
+registry_cache = RegistryCache()
+
+
 class RegistrySession(object):
     def __init__(self, registry, insecure=False, dockercfg_path=None, access=None):
         self.registry = registry
@@ -548,6 +809,11 @@ class RegistrySession(object):
             password = dockercfg.get('password')
             auth_b64 = dockercfg.get('auth')
         self.auth = HTTPRegistryAuth(username, password, access=access, auth_b64=auth_b64)
+        # identifies the credentials, registry responses are cached per credentials
+        self.auth_identity = None
+        if any((username, password, auth_b64)):
+            credentials = json.dumps([username, password, auth_b64]).encode()
+            self.auth_identity = hashlib.sha256(credentials).hexdigest()
 
         self._fallback = None
         if re.match('http(s)?://', self.registry):
@@ -626,14 +892,26 @@ class RegistrySession(object):
     def head(self, relative_url, data=None, **kwargs):
         return self._do(self.session.head, relative_url, **kwargs)
 
+    # Responses for tags cached while the write is in progress may be outdated
+    # already, drop them only when the write is done
+
     def post(self, relative_url, data=None, **kwargs):
-        return self._do(self.session.post, relative_url, data=data, **kwargs)
+        try:
+            return self._do(self.session.post, relative_url, data=data, **kwargs)
+        finally:
+            registry_cache.invalidate()
 
     def put(self, relative_url, data=None, **kwargs):
-        return self._do(self.session.put, relative_url, data=data, **kwargs)
+        try:
+            return self._do(self.session.put, relative_url, data=data, **kwargs)
+        finally:
+            registry_cache.invalidate()
 
     def delete(self, relative_url, **kwargs):
-        return self._do(self.session.delete, relative_url, **kwargs)
+        try:
+            return self._do(self.session.delete, relative_url, **kwargs)
+        finally:
+            registry_cache.invalidate()
 
 
 class RegistryClient(object):
@@ -1026,6 +1304,9 @@ def query_registry(
 ) -> requests.Response:
     """Return manifest digest for image.
 
+    Successful responses are kept in registry_cache, shared by all sessions
+    for the same registry with the same credentials.
+
     :param registry_session: RegistrySession
     :param image: ImageName, the remote image to inspect
     :param digest: str, digest of the image manifest
@@ -1043,6 +1324,17 @@ def query_registry(
 
     headers = {'Accept': (get_manifest_media_type(version))}
     url = '/v2/{}/{}/{}'.format(context, object_type, reference)
+
+    # the registry may not give the same response to sessions with other credentials
+    cache_key = (registry_session.registry, registry_session.auth_identity, url,
+                 headers['Accept'])
+    # tags cannot contain ':', digests always do (algorithm:hex)
+    immutable = ':' in str(reference)
+    response = registry_cache.get(cache_key, immutable=immutable)
+    if response is not None:
+        logger.debug("query_registry: cached response for %s, headers: %s", url, headers)
+        return response
+
     logger.debug("query_registry: querying %s, headers: %s", url, headers)
 
     response = registry_session.get(url, headers=headers)
@@ -1052,6 +1344,8 @@ def query_registry(
     logger.debug("query_registry: response headers: %s", response.headers)
     response.raise_for_status()
 
+    registry_cache.put(cache_key, response, immutable=immutable)
+
     return response
 
 
@@ -1461,6 +1755,11 @@ class OSBSLogs(object):
             if remote_sources_log:
                 remote_sources_log.flush()
 
+        # No need to keep files open. After close, the temp log files still exist.
+        for logfile in logfiles.values():
+            logfile.close()
+        get_checksums_for_files([logfile.name for logfile in logfiles.values()], ['md5'])
+
         for platform, logfile in logfiles.items():
             if platform == 'noarch':
                 log_filename = filename
@@ -1469,8 +1768,6 @@ class OSBSLogs(object):
             else:
                 log_filename = platform
             metadata = self.get_log_metadata(logfile.name, f'{log_filename}.log')
-            # No need to keep file open. After close, this temp log file still exists.
-            logfile.close()
             outputs.append(Output(filename=logfile.name, metadata=metadata))
 
         return outputs
@@ -2010,43 +2307,126 @@ def create_tar_gz_archive(file_name: str, file_content: str) -> str:
     return f.name
 
 
+@dataclass
+class ExtractResult:
+    """Numbers of entries and bytes extracted by safe_extractall"""
+
+    entries: int = 0
+    # size of the extracted regular files
+    bytes: int = 0
+
+
 def safe_extractall(tar: tarfile.TarFile, path: str = '.',
                     members: List[tarfile.TarInfo] = None,
-                    *, numeric_owner: bool = False):
+                    *, numeric_owner: bool = False,
+                    check_links: bool = False) -> ExtractResult:
     """
     CVE-2007-4559 replacement for extract() or extractall().
     By using extract() or extractall() on a tarfile object without sanitizing input,
     a maliciously crafted .tar file could perform a directory path traversal attack.
-    The patch essentially checks to see if all tarfile members will be
-    extracted safely and throws an exception otherwise.
+
+    Members are checked and extracted one by one in a single pass over the
+    archive, so the archive may also be opened in stream mode ('r|*').
+    A member is unsafe when its path leads outside of the destination, either
+    lexically or through a symlink extracted before. Links pointing outside
+    of the destination are extracted, unless check_links is set. When an
+    unsafe member is found, the files and directories created by the
+    extraction so far are removed before the exception is raised.
+
     :param tarfile tar: the tarfile to be extracted.
     :param str path: specifies a different directory to extract to.
+    :param members: list of members to extract, all by default
     :param numeric_owner: if True, only the numbers for user/group names are used and not the names.
+    :param check_links: if True, targets of links have to be inside the destination too
+    :return: ExtractResult, numbers of extracted entries and bytes
     :raise ExtractError: if there is a Traversal Path Attempt in the Tar File.
     """
-    abs_path = Path(path).resolve()
-    tar_members = tar.getmembers()
-    if members:
-        tar_members = members
-
-    # https://github.com/python/cpython/blob/3.9/Lib/pathlib.py
-    def is_relative_to(this_path, *other_path):
-        """Return True if the path is relative to another path else False.
-        """
-        try:
-            this_path.relative_to(*other_path)
-            return True
-        except ValueError:
-            return False
+    abs_path = os.path.realpath(path)
+    abs_prefix = os.path.join(abs_path, '')
+    # extracted symlinks, paths leading through them have to be resolved
+    symlinks: Set[str] = set()
+    # paths which didn't exist before the extraction, for cleanup
+    created: List[str] = []
+    directories = []
+    result = ExtractResult()
+
+    def is_inside(target):
+        return target == abs_path or target.startswith(abs_prefix)
+
+    def through_symlink(target):
+        while is_inside(target) and target != abs_path:
+            if target in symlinks:
+                return True
+            target = os.path.dirname(target)
+        return False
 
     def check_path(member):
-        member_path = Path(path).joinpath(member.name)
-        abs_member_path = member_path.resolve()
-
-        if not is_relative_to(abs_member_path, abs_path):
+        target = os.path.normpath(os.path.join(abs_path, member.name))
+        if symlinks and through_symlink(target):
+            target = os.path.realpath(target)
+        if not is_inside(target):
             raise tarfile.ExtractError('Attempted path traversal in tar file')
 
-    for member in tar_members:
-        check_path(member)
+        if not check_links:
+            return target
+        if member.issym():
+            link_target = os.path.normpath(
+                os.path.join(os.path.dirname(target), member.linkname))
+        elif member.islnk():
+            link_target = os.path.normpath(os.path.join(abs_path, member.linkname))
+        else:
+            return target
+        if symlinks and through_symlink(link_target):
+            link_target = os.path.realpath(link_target)
+        if not is_inside(link_target):
+            raise tarfile.ExtractError('Attempted link to path outside of tar file')
+        return target
+
+    def first_missing(target):
+        missing = None
+        while target != abs_path and not os.path.lexists(target):
+            missing = target
+            target = os.path.dirname(target)
+        return missing
+
+    def remove_created():
+        for created_path in reversed(created):
+            if os.path.isdir(created_path) and not os.path.islink(created_path):
+                shutil.rmtree(created_path, ignore_errors=True)
+            elif os.path.lexists(created_path):
+                os.unlink(created_path)
+
+    for member in members or tar:
+        try:
+            target = check_path(member)
+        except tarfile.ExtractError:
+            remove_created()
+            raise
+        missing = first_missing(target)
+        if missing:
+            created.append(missing)
+        if member.isdir():
+            # like extractall, set attributes of directories when their content is extracted,
+            # read-only directories would not allow it
+            directories.append(member)
+            tar.extract(member, path, set_attrs=False, numeric_owner=numeric_owner)
+        else:
+            tar.extract(member, path, numeric_owner=numeric_owner)
+        if member.issym():
+            symlinks.add(target)
+        result.entries += 1
+        if member.isreg():
+            result.bytes += member.size
+
+    for member in sorted(directories, key=lambda directory: directory.name, reverse=True):
+        dirpath = os.path.join(path, member.name)
+        try:
+            tar.chown(member, dirpath, numeric_owner=numeric_owner)
+            tar.utime(member, dirpath)
+            tar.chmod(member, dirpath)
+        except tarfile.ExtractError as e:
+            if tar.errorlevel > 1:
+                raise
+            logger.debug("tarfile: %s", e)
 
-    tar.extractall(path, members=tar_members, numeric_owner=numeric_owner)
+    return result
@@ -0,0 +1,208 @@
+"""
+Copyright (c) 2026 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+
+
+Streaming tar archive processing
+
+Archives are filtered member by member, straight from the original
+archive to the new one, without unpacking them to disk. The new archive
+is compressed by ParallelGzipWriter, which compresses blocks of data in
+several threads (as pigz does) but still writes a single gzip stream,
+so that it can be read by tarfile in stream mode as well.
+"""
+
+import logging
+import os
+import struct
+import tarfile
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, Deque, Tuple
+
+from atomic_reactor.constants import PARALLEL_GZIP_BLOCK_SIZE, PARALLEL_GZIP_MAX_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# gzip header: magic, deflate, no flags, no mtime, max compression, unknown OS
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x02\xff"
+# deflate window size, the end of the previous block is used as dictionary for the next one
+DEFLATE_WINDOW_SIZE = 32 * 1024
+
+
+def split_member_path(name: str) -> Tuple[str, ...]:
+    """Split the name of an archive member to path components
+
+    Leading '/' and './' are ignored, as are empty and '.' components.
+
+    :param name: str, name of the member
+    :return: tuple of path components
+    """
+    return tuple(part for part in name.split("/") if part and part != ".")
+
+
+class ParallelGzipWriter(object):
+    """Write-only file object compressing data to gzip in several threads
+
+    Data is split into blocks which are compressed independently, each
+    with the end of the previous block as the dictionary. The compressed
+    blocks are written in order as one deflate stream.
+    """
+
+    def __init__(self, fileobj: BinaryIO, compresslevel: int = 9,
+                 block_size: int = PARALLEL_GZIP_BLOCK_SIZE,
+                 max_workers: int = PARALLEL_GZIP_MAX_WORKERS):
+        """
+        :param fileobj: file object opened for writing binary data
+        :param compresslevel: int, compression level, 0-9
+        :param block_size: int, size of the blocks compressed in parallel
+        :param max_workers: int, max number of blocks compressed at the same time
+        """
+        self._fileobj = fileobj
+        self._compresslevel = compresslevel
+        self._block_size = block_size
+        self._max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="gzip")
+        self._buffer = bytearray()
+        self._dictionary = b""
+        self._pending: Deque[Future] = deque()
+        self._crc = 0
+        self._size = 0
+        self.closed = False
+        self._fileobj.write(GZIP_HEADER)
+
+    def _compress(self, block: bytes, dictionary: bytes, last: bool) -> bytes:
+        if dictionary:
+            compressor = zlib.compressobj(self._compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS,
+                                          zdict=dictionary)
+        else:
+            compressor = zlib.compressobj(self._compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS)
+        # sync flush ends the block on a byte boundary, the next one can be appended to it
+        return compressor.compress(block) + compressor.flush(
+            zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+        )
+
+    def _submit(self, block: bytes, last: bool = False) -> None:
+        self._crc = zlib.crc32(block, self._crc)
+        self._size += len(block)
+        self._pending.append(self._executor.submit(self._compress, block, self._dictionary, last))
+        self._dictionary = block[-DEFLATE_WINDOW_SIZE:]
+        # keep the workers busy, but don't keep too many blocks in memory
+        while len(self._pending) > 2 * self._max_workers:
+            self._fileobj.write(self._pending.popleft().result())
+
+    def write(self, data: bytes) -> int:
+        if self.closed:
+            raise ValueError("write to closed file")
+        self._buffer += data
+        while len(self._buffer) >= self._block_size:
+            self._submit(bytes(self._buffer[:self._block_size]))
+            del self._buffer[:self._block_size]
+        return len(data)
+
+    def close(self) -> None:
+        """Finish the gzip stream, the underlying file object is not closed"""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._submit(bytes(self._buffer), last=True)
+            self._buffer.clear()
+            while self._pending:
+                self._fileobj.write(self._pending.popleft().result())
+            self._fileobj.write(struct.pack("<LL", self._crc, self._size & 0xFFFFFFFF))
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "ParallelGzipWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.closed = True
+            for future in self._pending:
+                future.cancel()
+            self._executor.shutdown(wait=True)
+
+
+@dataclass
+class TarFilterResult:
+    """Numbers of members kept in and removed from a filtered archive"""
+
+    kept: int = 0
+    removed: int = 0
+    # size (in bytes) of the removed regular files
+    removed_bytes: int = 0
+
+
+def filter_tar_archive(src: str, dest: str,
+                       keep: Callable[[tarfile.TarInfo], bool]) -> TarFilterResult:
+    """Copy a tar archive, leaving out members which are not to be kept
+
+    The source archive may be compressed by any method supported by
+    tarfile, the new archive is compressed by gzip. Members are copied
+    one by one in a single pass over the source archive, nothing is
+    unpacked to disk. Hard links to removed files are removed as well.
+
+    :param src: str, path to the source archive
+    :param dest: str, path to the new archive, must differ from src
+    :param keep: callable, called with each member, returns whether to keep it
+    :return: TarFilterResult
+    """
+    result = TarFilterResult()
+    removed_files: set = set()
+
+    with open(src, "rb") as src_file, open(dest, "wb") as dest_file, \
+            tarfile.open(fileobj=src_file, mode="r|*") as src_tar, \
+            ParallelGzipWriter(dest_file) as gzip_writer, \
+            tarfile.open(fileobj=gzip_writer, mode="w|", format=tarfile.PAX_FORMAT) as dest_tar:
+        for member in src_tar:
+            removed = not keep(member)
+            if not removed and member.islnk() and member.linkname in removed_files:
+                logger.debug("Removing hard link %s to removed file %s",
+                             member.name, member.linkname)
+                removed = True
+
+            if removed:
+                result.removed += 1
+                if member.isfile():
+                    removed_files.add(member.name)
+                    result.removed_bytes += member.size
+                continue
+
+            result.kept += 1
+            if member.isfile():
+                dest_tar.addfile(member, src_tar.extractfile(member))
+            else:
+                dest_tar.addfile(member)
+
+    return result
+
+
+def filter_tar_archive_in_place(path: str,
+                                keep: Callable[[tarfile.TarInfo], bool]) -> TarFilterResult:
+    """Filter a tar archive, see filter_tar_archive
+
+    The new archive replaces the original one only when it's complete.
+
+    :param path: str, path to the archive
+    :param keep: callable, called with each member, returns whether to keep it
+    :return: TarFilterResult
+    """
+    tmp_path = path + ".filtered"
+    try:
+        result = filter_tar_archive(path, tmp_path, keep)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return result
@@ -0,0 +1,93 @@
+"""
+Copyright (c) 2026 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, Sequence, Set
+
+
+class _SuffixSet(object):
+    """Strings for finding out whether a string ends with any of them
+
+    The strings are indexed by their length, so a lookup checks one
+    suffix of the string for each distinct length.
+    """
+
+    def __init__(self, strings: Iterable[str]):
+        # length of a string -> strings of that length
+        self._strings: Dict[int, Set[str]] = defaultdict(set)
+        for string in strings:
+            self._strings[len(string)].add(string)
+        # longest suffixes first, they are the least likely to match
+        self._lengths = sorted(self._strings, reverse=True)
+
+    def matches(self, text: str) -> bool:
+        text_length = len(text)
+        for length in self._lengths:
+            if length > text_length:
+                continue
+            if text[text_length - length:] in self._strings[length]:
+                return True
+        return False
+
+
+def _join_path(parts: Sequence[str]) -> str:
+    return "/" + "/".join(parts)
+
+
+class SourcesDenylistMatcher(object):
+    """Matcher of sources excluded from source containers
+
+    The matcher is built once from the denylist_sources entries and is
+    used for all the lookups. Matching is done on plain strings, as
+    str.endswith does, but a lookup costs one set lookup per distinct
+    length of the entries rather than one check per entry:
+
+    - package and repository names match an entry when they end with it
+      (the leading os.sep of the entry is ignored), e.g. both
+      'github.com/foo/bar' and '@foo/bar' match '/foo/bar'
+    - paths in remote sources, relative to the root of the archive and
+      prefixed with '/', match an entry when they end with it; entries
+      start with '/', so e.g. '/npm/lodash' matches 'deps/npm/lodash'
+      but not 'deps/xnpm/lodash'
+    """
+
+    def __init__(self, entries: Iterable[str]):
+        """
+        :param entries: iterable of excluded sources, '/<type>/<name>' paths
+        """
+        entries = list(entries)
+        self._paths = _SuffixSet(entries)
+        self._names = _SuffixSet(entry.lstrip("/") for entry in entries)
+
+    def matches_name(self, name: str) -> bool:
+        """Check whether a package or repository name is excluded
+
+        :param name: str, name of the package or repository
+        """
+        return self._names.matches(name)
+
+    def matches_dir(self, parts: Sequence[str]) -> bool:
+        """Check whether a directory in remote sources is excluded
+
+        :param parts: sequence of path components, see split_member_path
+        """
+        return self._paths.matches(_join_path(parts))
+
+    def matches_file(self, parts: Sequence[str]) -> bool:
+        """Check whether a file in remote sources is excluded
+
+        Hermeto saves dependencies without nested dir, it's only archive
+        name-version.ext, so the file also matches when its name without
+        the version matches.
+
+        :param parts: sequence of path components, see split_member_path
+        """
+        if self._paths.matches(_join_path(parts)):
+            return True
+        package_name = parts[-1].rsplit("-", 1)[0]
+        return self._paths.matches(_join_path(tuple(parts[:-1]) + (package_name,)))
@@ -10,6 +10,7 @@ Utils to help to integrate with Hermeto CLI tool
 
 import logging
 
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import Any, Callable, Dict, Optional, Tuple, List
 from pathlib import Path
 import os.path
@@ -28,49 +29,118 @@ class SymlinkSandboxError(Exception):
     """Found symlink(s) pointing outside the sandbox."""
 
 
-def enforce_sandbox(repo_root: Path, remove_unsafe_symlinks: bool = False) -> None:
+def _check_sandbox_entry(full_path: Path, real_path: Path, repo_root: Path,
+                         remove_unsafe_symlinks: bool) -> None:
+    try:
+        real_path.relative_to(repo_root)
+    except ValueError as exc:
+        # the logic in here actually *requires* f-strings with `!r`. using
+        # `%r` DOES NOT WORK (tested)
+        # pylint: disable=logging-fstring-interpolation
+
+        # Unlike the real path, the full path is always relative to the root
+        relative_path = str(full_path.relative_to(repo_root))
+        if remove_unsafe_symlinks:
+            full_path.unlink()
+            logger.warning(
+                f"The destination of {relative_path!r} is outside of cloned repository. "
+                "Removing...",
+            )
+        else:
+            raise SymlinkSandboxError(
+                f"The destination of {relative_path!r} is outside of cloned repository",
+            ) from exc
+
+
+def _scan_sandbox_dir(dir_path: str, dir_real_path: str, repo_root: Path,
+                      remove_unsafe_symlinks: bool) -> List[Tuple[str, str]]:
     """
-    Check that there are no symlinks that try to leave the cloned repository.
+    Check entries of a directory, only symlinks are resolved
 
-    :param (str | Path) repo_root: absolute path to root of cloned repository
+    :param str dir_path: path to the directory
+    :param str dir_real_path: resolved path to the directory
+    :param Path repo_root: absolute path to root of cloned repository
     :param bool remove_unsafe_symlinks: remove unsafe symlinks if any are found
-    :raises OsbsValidationException: if any symlink points outside of cloned repository
+    :return: list of (path, resolved path) of subdirectories, symlinks are not followed
     """
-    for path_to_dir, subdirs, files in os.walk(repo_root):
-        dirpath = Path(path_to_dir)
+    try:
+        with os.scandir(dir_path) as it:
+            entries = list(it)
+    except OSError:
+        # like os.walk, ignore directories which can't be listed
+        return []
+
+    root_prefix = os.path.join(str(repo_root), "")
+    subdirs = []
+    symlinks = []
+    for entry in entries:
+        if entry.is_symlink():
+            symlinks.append(entry.path)
+            continue
 
-        for entry in subdirs + files:
-            # the logic in here actually *requires* f-strings with `!r`. using
-            # `%r` DOES NOT WORK (tested)
+        # the real path of anything else is the real path of the directory + name
+        real_path = os.path.join(dir_real_path, entry.name)
+        if not real_path.startswith(root_prefix):
+            _check_sandbox_entry(Path(entry.path), Path(real_path), repo_root,
+                                 remove_unsafe_symlinks)
+        if entry.is_dir(follow_symlinks=False):
+            subdirs.append((entry.path, real_path))
+
+    for symlink in symlinks:
+        full_path = Path(symlink)
+        try:
+            real = full_path.resolve()
+        except RuntimeError as e:
             # pylint: disable=logging-fstring-interpolation
+            if "Symlink loop from " in str(e):
+                logger.info(f"Symlink loop from {full_path!r}")
+                continue
+            logger.exception("RuntimeError encountered")
+            raise
+        _check_sandbox_entry(full_path, real, repo_root, remove_unsafe_symlinks)
 
-            # apparently pylint doesn't understand Path
-            full_path = dirpath / entry  # pylint: disable=old-division
-
-            try:
-                real_path = full_path.resolve()
-            except RuntimeError as e:
-                if "Symlink loop from " in str(e):
-                    logger.info(f"Symlink loop from {full_path!r}")
-                    continue
-                logger.exception("RuntimeError encountered")
-                raise
-
-            try:
-                real_path.relative_to(repo_root)
-            except ValueError as exc:
-                # Unlike the real path, the full path is always relative to the root
-                relative_path = str(full_path.relative_to(repo_root))
-                if remove_unsafe_symlinks:
-                    full_path.unlink()
-                    logger.warning(
-                        f"The destination of {relative_path!r} is outside of cloned repository. "
-                        "Removing...",
-                    )
-                else:
-                    raise SymlinkSandboxError(
-                        f"The destination of {relative_path!r} is outside of cloned repository",
-                    ) from exc
+    return subdirs
+
+
+def enforce_sandbox(repo_root: Path, remove_unsafe_symlinks: bool = False,
+                    max_workers: int = constants.HERMETO_SANDBOX_SCAN_WORKERS) -> None:
+    """
+    Check that there are no symlinks that try to leave the cloned repository.
+
+    Directories are listed by os.scandir and only symlinks are resolved,
+    real paths of directories are passed down to their subdirectories.
+    Large trees are scanned by several threads, one directory at a time.
+
+    :param (str | Path) repo_root: absolute path to root of cloned repository
+    :param bool remove_unsafe_symlinks: remove unsafe symlinks if any are found
+    :param int max_workers: max number of threads scanning directories
+    :raises OsbsValidationException: if any symlink points outside of cloned repository
+    """
+    repo_root = Path(repo_root)
+    root = (str(repo_root), os.path.realpath(repo_root))
+
+    if max_workers <= 1:
+        pending_dirs = [root]
+        while pending_dirs:
+            pending_dirs.extend(
+                _scan_sandbox_dir(*pending_dirs.pop(), repo_root, remove_unsafe_symlinks)
+            )
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sandbox") as executor:
+        def submit(directory):
+            return executor.submit(_scan_sandbox_dir, *directory, repo_root,
+                                   remove_unsafe_symlinks)
+
+        pending = {submit(root)}
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.update(submit(subdir) for subdir in future.result())
+        finally:
+            for future in pending:
+                future.cancel()
 
 
 def validate_paths(repo_path: Path, remote_sources_packages: dict) -> None:
@@ -6,19 +6,23 @@ This software may be modified and distributed under the terms
 of the BSD license. See the LICENSE file for details.
 """
 
+import contextvars
 import functools
 import subprocess
 import logging
 import tarfile
+import threading
 import json
 
-from typing import Optional, Union, Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union, Dict, Iterable, List, Any, Tuple
 from pathlib import Path
 
 from osbs.utils import ImageName
 
 from atomic_reactor import config
 from atomic_reactor import util
+from atomic_reactor.constants import IMAGE_INSPECT_MAX_WORKERS
 from atomic_reactor.types import ImageInspectionData
 from atomic_reactor.utils import retries
 
@@ -57,6 +61,9 @@ class ImageUtil:
         """
         self._dockerfile_images = dockerfile_images
         self._conf = conf
+        # RegistryClient instances (and their HTTP sessions) cached by registry name
+        self._registry_clients: Dict[str, util.RegistryClient] = {}
+        self._registry_clients_lock = threading.Lock()
 
     def set_dockerfile_images(self, dockerfile_images: util.DockerfileImages) -> None:
         """Set a new dockerfile_images instance."""
@@ -82,6 +89,35 @@ class ImageUtil:
         goarch = self._conf.platform_to_goarch_mapping[platform]
         return self._cached_inspect_image(str(image), goarch)
 
+    def get_inspect_for_images(
+        self, images: Iterable[Tuple[Union[str, ImageName], Optional[str]]]
+    ) -> Dict[Tuple[str, Optional[str]], ImageInspectionData]:
+        """Inspect multiple images at once.
+
+        The images are inspected concurrently by get_inspect_for_image, each image only
+        once for each platform. The results are cached as usual, later calls for the same
+        images do not query the registry.
+
+        :param images: pairs of image and platform (or None), see get_inspect_for_image
+        :return: mapping of (image as a string, platform) to the inspection data
+        """
+        requested = {(str(image), platform): image for image, platform in images}
+        if not requested:
+            return {}
+
+        def inspect(key: Tuple[str, Optional[str]]) -> ImageInspectionData:
+            image, platform = requested[key], key[1]
+            if platform is None:
+                return self.get_inspect_for_image(image)
+            return self.get_inspect_for_image(image, platform)
+
+        max_workers = min(IMAGE_INSPECT_MAX_WORKERS, len(requested))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # in copies of the current context, to count the requests for the running plugin
+            futures = [executor.submit(contextvars.copy_context().run, inspect, key)
+                       for key in requested]
+            return {key: future.result() for key, future in zip(requested, futures)}
+
     def base_image_inspect(self, platform: Optional[str] = None) -> ImageInspectionData:
         """Inspect the base image (the parent image for the final build stage).
 
@@ -109,8 +145,11 @@ class ImageUtil:
         return client.get_inspect_for_image(parsed_image, goarch)
 
     def _get_registry_client(self, registry: str) -> util.RegistryClient:
-        session = util.RegistrySession.create_from_config(self._conf, registry)
-        return util.RegistryClient(session)
+        with self._registry_clients_lock:
+            if registry not in self._registry_clients:
+                session = util.RegistrySession.create_from_config(self._conf, registry)
+                self._registry_clients[registry] = util.RegistryClient(session)
+            return self._registry_clients[registry]
 
     def extract_file_from_image(self, image: Union[str, ImageName],
                                 src_path: str, dst_path: str) -> None:
@@ -216,6 +255,6 @@ class ImageUtil:
                 raise ValueError(f'Tarball at {src_path} has more than 1 layer')
 
             layer_file = tar.getmember(layers[0])
-            util.safe_extractall(tar, dst_path, [layer_file])
+            util.safe_extractall(tar, dst_path, [layer_file], check_links=True)
 
         return layers[0]
@@ -17,6 +17,8 @@ import platform
 from atomic_reactor.inner import DockerBuildWorkflow, ImageBuildWorkflowData
 
 import koji
+import koji.util
+import requests
 
 from atomic_reactor import __version__ as atomic_reactor_version
 from atomic_reactor.constants import (DEFAULT_DOWNLOAD_BLOCK_SIZE,
@@ -24,7 +26,8 @@ from atomic_reactor.constants import (DEFAULT_DOWNLOAD_BLOCK_SIZE,
                                       PROG,
                                       KOJI_MAX_RETRIES,
                                       KOJI_RETRY_INTERVAL,
-                                      KOJI_OFFLINE_RETRY_INTERVAL)
+                                      KOJI_OFFLINE_RETRY_INTERVAL,
+                                      KOJI_UPLOAD_ATTEMPTS)
 from atomic_reactor.types import RpmComponent
 from atomic_reactor.util import (Output, get_image_upload_filename,
                                  get_checksums, get_manifest_media_type,
@@ -92,6 +95,133 @@ class KojiUploadLogger(object):
                               percent_done, size / t1 / 1024 / 1024)
 
 
+def _get_local_adler32(path: str, size: int, blocksize: int) -> str:
+    """Compute adler32 checksum of the first size bytes of a file, as koji does"""
+    digest = koji.util.adler32_constructor()
+    with open(path, 'rb') as f:
+        remaining = size
+        while remaining > 0:
+            chunk = f.read(min(blocksize, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def _get_uploaded_size(session, local_filename: str, server_dir: str, name: str,
+                       blocksize: int) -> int:
+    """
+    Get size of the part of a file which is already uploaded
+
+    :return: int, 0 if nothing is uploaded or the uploaded data doesn't match the file
+    """
+    try:
+        result = session.checkUpload(server_dir, name, verify='adler32')
+    except (koji.GenericError, requests.exceptions.RequestException):
+        logger.exception("failed to check uploaded size of %s", name)
+        return 0
+    if not result:
+        return 0
+
+    uploaded = int(result['size'])
+    if uploaded > os.path.getsize(local_filename):
+        return 0
+    if result['hexdigest'] != _get_local_adler32(local_filename, uploaded, blocksize):
+        return 0
+    return uploaded
+
+
+def _upload_chunks(session, local_filename: str, server_dir: str, name: str,
+                   offset: int, blocksize: int, callback=None) -> None:
+    size = os.path.getsize(local_filename)
+    start = time.time()
+    with open(local_filename, 'rb') as f:
+        f.seek(offset)
+        # an empty file still needs to be created
+        first_chunk = offset == 0
+        while True:
+            lap = time.time()
+            chunk = f.read(blocksize)
+            if not chunk and not first_chunk:
+                break
+            first_chunk = False
+
+            result = session.rawUpload(chunk, offset, server_dir, name, overwrite=True)
+            hexdigest = koji.util.adler32_constructor(chunk).hexdigest()
+            if result['size'] != len(chunk) or result['hexdigest'] != hexdigest:
+                raise koji.GenericError(
+                    f"upload of {name} failed at offset {offset}: server returned size "
+                    f"{result['size']} and checksum {result['hexdigest']}, "
+                    f"expected {len(chunk)} and {hexdigest}"
+                )
+            offset += len(chunk)
+
+            if callback:
+                now = time.time()
+                callback(offset, size, len(chunk), max(now - lap, 0.00001),
+                         max(now - start, 0.00001))
+
+
+def upload_file_resumable(session, local_filename: str, server_dir: str,
+                          name: Optional[str] = None, callback=None,
+                          blocksize: Optional[int] = None,
+                          attempts: int = KOJI_UPLOAD_ATTEMPTS) -> None:
+    """
+    Upload a file in chunks using koji's fast upload API, resume failed uploads
+
+    Failed chunks are retried by the session itself (see create_koji_session).
+    When the upload fails anyway, it is resumed from the data which is already
+    on the server, as long as it matches the local file.
+
+    :param session: koji.ClientSession instance
+    :param local_filename: str, path to the file to upload
+    :param server_dir: str, directory on the server to upload the file to
+    :param name: str, name of the uploaded file, basename of local_filename by default
+    :param callback: callable, called after each chunk, see KojiUploadLogger.callback
+    :param blocksize: int, size of the chunks
+    :param attempts: int, max number of attempts to upload the file
+    """
+    if name is None:
+        name = os.path.basename(local_filename)
+    if not session.opts.get('use_fast_upload'):
+        # the old upload API can't resume uploads, upload the whole file again
+        for attempt in range(1, attempts + 1):
+            try:
+                session.uploadWrapper(local_filename, server_dir, name=name,
+                                      callback=callback, blocksize=blocksize)
+                return
+            except (koji.GenericError, requests.exceptions.RequestException):
+                if attempt == attempts:
+                    raise
+                logger.warning("upload of %s failed, uploading it again", name, exc_info=True)
+
+    if blocksize is None:
+        blocksize = session.opts.get('upload_blocksize', 1048576)
+
+    offset = 0
+    for attempt in range(1, attempts + 1):
+        try:
+            _upload_chunks(session, local_filename, server_dir, name, offset, blocksize,
+                           callback=callback)
+            break
+        except (koji.GenericError, requests.exceptions.RequestException):
+            if attempt == attempts:
+                raise
+            offset = _get_uploaded_size(session, local_filename, server_dir, name, blocksize)
+            logger.warning("upload of %s failed, resuming it at offset %d", name, offset,
+                           exc_info=True)
+
+    # verify the whole file only if the upload was resumed, as koji does after retries
+    resumed = attempt > 1
+    result = session.checkUpload(server_dir, name, verify='adler32' if resumed else None)
+    size = os.path.getsize(local_filename)
+    if result is None or int(result['size']) != size:
+        raise koji.GenericError(f"uploaded file has wrong size: {server_dir}/{name}")
+    if resumed and result['hexdigest'] != _get_local_adler32(local_filename, size, blocksize):
+        raise koji.GenericError(f"uploaded file has wrong checksum: {server_dir}/{name}")
+
+
 def koji_login(session,
                proxyuser=None,
                ssl_certs_dir=None,
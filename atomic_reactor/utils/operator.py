@@ -9,8 +9,10 @@ import os
 import re
 import logging
 from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
 
+from atomic_reactor.constants import PULLSPEC_SCAN_CACHE_SIZE
 from atomic_reactor.dirs import BuildDir
 from ruamel.yaml import YAML
 from ruamel.yaml.comments import CommentedMap, CommentedSeq
@@ -341,6 +343,17 @@ class PullspecRegex(object):
     # "https://example.com/foo:bar" -> "example.com/foo:bar"
     PULLSPEC = re.compile(_pullspec)
 
+    # Non-alphanumeric characters that may surround a pullspec in a candidate
+    _candidate_punct = r"[/\-._@:]"
+    # Find candidates that are pullspecs once non-alphanumeric characters are
+    # stripped from both ends, the pullspec itself is the "pullspec" group.
+    # Produces the same results as the default_pullspec_heuristic() below, the
+    # lookarounds make sure the whole candidate is matched.
+    SCAN = re.compile(
+        r"(?<![a-zA-Z0-9/\-._@:]){punct}*(?P<pullspec>{pullspec}){punct}*(?![a-zA-Z0-9/\-._@:])"
+        .format(punct=_candidate_punct, pullspec=_pullspec)
+    )
+
 
 def default_pullspec_heuristic(text):
     """
@@ -357,6 +370,9 @@ def default_pullspec_heuristic(text):
       - Strip non-alphanumeric characters from both ends
       - Match remainder against the pullspec regex
 
+    All of that is done in a single pass of the PullspecRegex.SCAN regex,
+    results are cached for the most recently scanned texts.
+
     Put simply, this heuristic should find anything in the form:
 
         registry/namespace*/repo:tag
@@ -370,6 +386,28 @@ def default_pullspec_heuristic(text):
     This would produce way too many false positives (and 1 false positive
     is already too many).
 
+    :param text: Arbitrary blob of text in which to find pullspecs
+    :return: List of (start, end) tuples of substring indices
+    """
+    return list(_scan_pullspecs(str(text)))
+
+
+@lru_cache(maxsize=PULLSPEC_SCAN_CACHE_SIZE)
+def _scan_pullspecs(text):
+    pullspecs = []
+    for match in PullspecRegex.SCAN.finditer(text):
+        pullspecs.append(match.span("pullspec"))
+        log.debug("Pullspec heuristic: %s looks like a pullspec", match.group("pullspec"))
+    return tuple(pullspecs)
+
+
+def candidate_pullspec_heuristic(text):
+    """
+    Find pullspecs candidate by candidate, see default_pullspec_heuristic()
+
+    Slower than default_pullspec_heuristic(), the results are the same.
+    Kept as the reference implementation to compare with.
+
     :param text: Arbitrary blob of text in which to find pullspecs
     :return: List of (start, end) tuples of substring indices
     """
@@ -379,7 +417,6 @@ def default_pullspec_heuristic(text):
         candidate = text[i:j]
         if PullspecRegex.FULL.match(candidate):
             pullspecs.append((i, j))
-            log.debug("Pullspec heuristic: %s looks like a pullspec", candidate)
     return pullspecs
 
 
@@ -11,16 +11,20 @@ import logging
 import os
 import paramiko
 import random
+import threading
 import time
 from contextlib import contextmanager
 from datetime import datetime
 from functools import cached_property
 from shlex import quote
-from typing import List, Optional, Tuple, Set
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, Set
 from paramiko.channel import ChannelFile  # just for type annotation
 from atomic_reactor.utils.rpm import rpm_qf_args
 
 SSH_COMMAND_TIMEOUT = 30
+# idle pooled SSH connections are closed after this many seconds
+SSH_POOL_IDLE_TIMEOUT = 120
 SLOTS_RELATIVE_PATH = "osbs_slots"
 RETRY_ON_SSH_EXCEPTIONS = (paramiko.ssh_exception.NoValidConnectionsError,
                            paramiko.ssh_exception.SSHException, ConnectionError, TimeoutError)
@@ -89,6 +93,76 @@ class SSHRetrySession(paramiko.SSHClient):
         return out, err, code
 
 
+class SSHConnectionPool:
+    """ Pool of reusable SSH connections to a single remote host """
+
+    def __init__(self, connect: Callable[[], SSHRetrySession],
+                 idle_timeout: float = SSH_POOL_IDLE_TIMEOUT):
+        """
+        :param connect: callable, opens a new SSH connection to the host
+        :param idle_timeout: float, seconds after which an unused connection is closed
+        """
+        self._connect = connect
+        self._idle_timeout = idle_timeout
+        # (connection, time of release) pairs, most recently released connection is the last
+        self._idle: List[Tuple[SSHRetrySession, float]] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _is_alive(client: SSHRetrySession) -> bool:
+        transport = client.get_transport()
+        return transport is not None and transport.is_active()
+
+    def _evict_idle(self):
+        """ Close connections which were not used for longer than idle timeout """
+        deadline = time.monotonic() - self._idle_timeout
+        with self._lock:
+            expired = [client for client, released in self._idle if released < deadline]
+            self._idle = [(client, released) for client, released in self._idle
+                          if released >= deadline]
+        for client in expired:
+            client.close()
+
+    def acquire(self) -> SSHRetrySession:
+        """ Get a healthy connection from the pool or open a new one """
+        self._evict_idle()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                client, _ = self._idle.pop()
+            if self._is_alive(client):
+                return client
+            client.close()
+
+        return self._connect()
+
+    def release(self, client: SSHRetrySession):
+        """ Return a connection to the pool, broken connections are closed """
+        if self._is_alive(client):
+            with self._lock:
+                self._idle.append((client, time.monotonic()))
+        else:
+            client.close()
+        self._evict_idle()
+
+    @contextmanager
+    def connection(self):
+        """ Context manager to borrow a connection from the pool """
+        client = self.acquire()
+        try:
+            yield client
+        finally:
+            self.release(client)
+
+    def close(self):
+        """ Close all idle connections """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for client, _ in idle:
+            client.close()
+
+
 class SlotData:
 
     def __init__(self, prid: Optional[str] = None, timestamp: Optional[str] = None):
@@ -171,6 +245,7 @@ class RemoteHost:
         self._slots = slots
         self._socket_path = socket_path
         self._slots_dir = slots_dir
+        self._connection_pool = SSHConnectionPool(self._open_ssh_session)
 
     @property
     def hostname(self) -> str:
@@ -247,9 +322,8 @@ class RemoteHost:
         except Exception as ex:
             raise SlotLockError(_errmsg) from ex
 
-        # A short time sleep to wait for the socket to be ready
-        time.sleep(0.1)
-
+        # No need to wait for the command to start, if flock fails, the write
+        # either fails with the channel being closed or cat never echoes the line
         try:
             stdin.write("verify lock\n")
             stdin.flush()
@@ -278,33 +352,31 @@ class RemoteHost:
     @contextmanager
     def _locked_slot(self, slot_id):
         """ Context manager to return a slot with it's being locked until exit """
-        # Open two ssh sessions, one is for reading/writing the slot file,
-        # the other one is for keeping the lock for that slot file. The two
-        # sessions have same lifecycle, they're closed at the same time when
-        # errors happen or exit.
+        # Use one pooled SSH connection with two channels, one is for
+        # reading/writing the slot file, the other one is running the command
+        # keeping the lock for that slot file. The lock is released when the
+        # lock channel is closed on exit or when errors happen.
         try:
-            # A session to run any commands, especially for reading and
-            # writing the slot file
-            slot_session = self._open_ssh_session()
-            # A special session to keep the lock of the slot
-            lock_session = self._open_ssh_session()
+            session = self._connection_pool.acquire()
         except Exception as ex:
-            raise SlotLockError(f"{self.hostname}: failed to open SSH sessions") from ex
+            raise SlotLockError(f"{self.hostname}: failed to open SSH session") from ex
 
         _errmsg = f"{self.hostname}: failed to acquire lock on slot {slot_id}"
         lock_stdin = None
+        lock_stdout = None
         try:
-            lock_stdin, _, _ = self._get_blocking_session_with_locked_slot(
-                lock_session, slot_id
+            lock_stdin, lock_stdout, _ = self._get_blocking_session_with_locked_slot(
+                session, slot_id
             )
-            yield HostSlot(self, slot_session, slot_id)
+            yield HostSlot(self, session, slot_id)
         except Exception as ex:
             raise SlotLockError(_errmsg) from ex
         finally:
             if lock_stdin:
                 lock_stdin.close()
-            slot_session.close()
-            lock_session.close()
+            if lock_stdout:
+                lock_stdout.channel.close()
+            self._connection_pool.release(session)
 
     def _run(self, cmd: str):
         """
@@ -317,12 +389,13 @@ class RemoteHost:
 
     @contextmanager
     def _ssh_session(self):
-        """ Create an SSH connection."""
-        client = self._open_ssh_session()
-        try:
+        """ Get an SSH connection from the pool of connections to this host."""
+        with self._connection_pool.connection() as client:
             yield client
-        finally:
-            client.close()
+
+    def close(self):
+        """ Close idle SSH connections to this host """
+        self._connection_pool.close()
 
     def _open_ssh_session(self):
         """
@@ -457,16 +530,51 @@ class RemoteHost:
                            self.hostname, slot_id, prid)
         return unlocked
 
+    def slots_inventory(self) -> Dict[int, SlotData]:
+        """ Read data of all slots on host with a single remote command
+
+        :return: slot data for each slot ID
+        :rtype: dict
+        """
+        # Touch the slot files to create them in case they don't exist, print
+        # every slot as a "slot_id content" line, with newlines in the content
+        # replaced, so that each slot is a single line
+        slots_dir = quote(self.slots_dir)
+        cmd = (f"for i in $(seq 0 {self.slots - 1}); do "
+               f"touch {slots_dir}/slot_$i && "
+               f"printf '%s %s\\n' $i \"$(tr '\\n' ' ' < {slots_dir}/slot_$i)\" || exit 1; "
+               f"done")
+
+        _errmsg = f"{self.hostname}: cannot read content of slots"
+        try:
+            stdout, stderr, code = self._run(cmd)
+        except Exception as ex:
+            raise SlotReadError(_errmsg) from ex
+
+        if code != 0:
+            _errmsg = f"{_errmsg}: {stderr}" if stderr else _errmsg
+            raise SlotReadError(_errmsg)
+
+        inventory = {slot_id: SlotData() for slot_id in range(self.slots)}
+        for line in stdout.splitlines():
+            slot_id, _, content = line.partition(" ")
+            if not slot_id.isdigit() or int(slot_id) not in inventory:
+                logger.warning("%s: skipping unexpected line in slots content: %r",
+                               self.hostname, line)
+                continue
+            inventory[int(slot_id)] = SlotData.from_string(content.strip())
+        return inventory
+
     def available_slots(self) -> List[int]:
         """ Get slots on host which are in free state """
         logger.debug("%s: retrieve list of available slots", self.hostname)
         available_slots = []
-        with self._ssh_session() as ssh_session:
-            for slot_id in range(self.slots):
-                if not self.is_free(slot_id, ssh_session):
-                    logger.debug("%s: slot %s is not free", self.hostname, slot_id)
-                    continue
-                available_slots.append(slot_id)
+        for slot_id, slot_data in self.slots_inventory().items():
+            # Slots with invalid content are corrupted, they can be used
+            if not slot_data.is_empty and slot_data.is_valid:
+                logger.debug("%s: slot %s is not free", self.hostname, slot_id)
+                continue
+            available_slots.append(slot_id)
 
         return available_slots
 
@@ -626,6 +734,11 @@ class RemoteHostsPool:
         self.hosts = hosts
         self.host_platform = host_platform
 
+    def close(self):
+        """ Close idle SSH connections to all hosts """
+        for host in self.hosts:
+            host.close()
+
     @classmethod
     def from_config(cls, config: dict, platform: str):
         """ Instantiate remote hosts loaded from a config in dict format
@@ -669,24 +782,33 @@ class RemoteHostsPool:
 
         return cls(hosts, platform)
 
+    @staticmethod
+    def _get_available_slots(host: RemoteHost) -> List[int]:
+        """ Get available slots on host, no slots when host is not usable """
+        try:
+            if host.is_operational:
+                return host.available_slots()
+        except Exception as ex:
+            # Specific exceptions should be handled in nested methods
+            logger.warning("%s: unable to get available slots: %s", host.hostname, ex)
+        return []
+
     def lock_resource(self, prid: str) -> Optional[LockedResource]:
         """
         Lock resource for a pipelinerun
 
         :param prid: str, pipelinerun ID
         """
-        resources = []
         random.shuffle(self.hosts)
-        for host in self.hosts:
-            available_slots = []
-            try:
-                if host.is_operational:
-                    available_slots = host.available_slots()
-            except Exception as ex:
-                # Specific exceptions should be handled in nested methods
-                logger.warning("%s: unable to get available slots: %s", host.hostname, ex)
-                continue
+        # Take a snapshot of available slots on all hosts at once
+        if self.hosts:
+            with ThreadPoolExecutor(max_workers=len(self.hosts)) as executor:
+                hosts_slots = list(executor.map(self._get_available_slots, self.hosts))
+        else:
+            hosts_slots = []
 
+        resources = []
+        for host, available_slots in zip(self.hosts, hosts_slots):
             if not available_slots:
                 logger.info("%s: no available slots", host.hostname)
                 continue
@@ -0,0 +1,109 @@
+"""
+Copyright (c) 2026 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+
+import logging
+import resource
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from atomic_reactor.utils.retries import current_http_stats
+
+logger = logging.getLogger(__name__)
+
+PROC_SELF_IO = "/proc/self/io"
+
+
+def read_proc_io(path: str = PROC_SELF_IO) -> Dict[str, int]:
+    """Read I/O counters of the process
+
+    :param path: str, path to the io file in procfs
+    :return: dict, counter name -> value, empty if the counters are not available
+    """
+    try:
+        with open(path) as f:
+            return {name.strip(): int(value) for name, value in
+                    (line.split(":", 1) for line in f if line.strip())}
+    except (OSError, ValueError) as e:
+        logger.debug("can't read I/O counters from %s: %s", path, e)
+        return {}
+
+
+@dataclass(frozen=True)
+class ResourceUsage:
+    """Resource usage of atomic-reactor at a point in time
+
+    HTTP requests are counted for the current scope, see http_stats_scope,
+    e.g. for the running plugin. All the other values are for the whole
+    process, they can't be split between plugins running at the same time.
+    CPU time includes finished subprocesses, e.g. podman or skopeo. Values
+    which can't be read on the current system are None.
+    """
+
+    # seconds
+    cpu_user: float
+    cpu_system: float
+    # peak resident set size, KiB
+    max_rss: int
+    # bytes read from and written to storage
+    read_bytes: Optional[int]
+    write_bytes: Optional[int]
+    # requests made through retrying requests sessions in the current scope
+    # and their total duration
+    http_requests: int
+    http_seconds: float
+    # filesystem usage, see FSWatcher
+    disk_mb_used: Optional[int]
+    disk_inodes_used: Optional[int]
+
+    @classmethod
+    def current(cls, disk_usage: Optional[Dict[str, int]] = None) -> "ResourceUsage":
+        """Get the current resource usage
+
+        :param disk_usage: dict, current filesystem usage as reported by FSWatcher
+        """
+        self_usage = resource.getrusage(resource.RUSAGE_SELF)
+        children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        io_counters = read_proc_io()
+        http_requests, http_seconds = current_http_stats().snapshot()
+        disk_usage = disk_usage or {}
+        return cls(
+            cpu_user=self_usage.ru_utime + children_usage.ru_utime,
+            cpu_system=self_usage.ru_stime + children_usage.ru_stime,
+            max_rss=self_usage.ru_maxrss,
+            read_bytes=io_counters.get("read_bytes"),
+            write_bytes=io_counters.get("write_bytes"),
+            http_requests=http_requests,
+            http_seconds=http_seconds,
+            disk_mb_used=disk_usage.get("mb_used"),
+            disk_inodes_used=disk_usage.get("inodes_used"),
+        )
+
+    def since(self, before: "ResourceUsage") -> Dict[str, Any]:
+        """Get resources used since an earlier point in time
+
+        :param before: ResourceUsage, the earlier usage
+        :return: dict, resource name -> amount used, values which are not
+            available at both points in time are left out
+        """
+        used = {
+            "cpu_user_seconds": self.cpu_user - before.cpu_user,
+            "cpu_system_seconds": self.cpu_system - before.cpu_system,
+            "max_rss_increase_kib": max(self.max_rss - before.max_rss, 0),
+            "http_requests": self.http_requests - before.http_requests,
+            "http_seconds": self.http_seconds - before.http_seconds,
+        }
+        optional = {
+            "read_bytes": (self.read_bytes, before.read_bytes),
+            "write_bytes": (self.write_bytes, before.write_bytes),
+            "disk_mb_used": (self.disk_mb_used, before.disk_mb_used),
+            "disk_inodes_used": (self.disk_inodes_used, before.disk_inodes_used),
+        }
+        for name, (after_value, before_value) in optional.items():
+            if after_value is not None and before_value is not None:
+                used[name] = after_value - before_value
+        return used
@@ -8,7 +8,10 @@ of the BSD license. See the LICENSE file for details.
 
 import logging
 import subprocess
-from typing import List
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
 
 import backoff
 import requests
@@ -56,6 +59,70 @@ def hook_log_error_response_content(response, *args, **kwargs):
         )
 
 
+class HTTPStats(object):
+    """Count HTTP requests made by retrying sessions and their total duration"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.seconds = 0.0
+
+    def record(self, response, *args, **kwargs):
+        """Hook function to record a finished request
+
+        :param response: the requests Response object
+        :type response: requests.Response
+        """
+        with self._lock:
+            self.requests += 1
+            self.seconds += response.elapsed.total_seconds()
+
+    def snapshot(self) -> Tuple[int, float]:
+        """Get the number of requests and their total duration in seconds"""
+        with self._lock:
+            return self.requests, self.seconds
+
+
+# requests made by the whole process
+http_stats = HTTPStats()
+# requests made in the current context, see http_stats_scope
+_scoped_http_stats: ContextVar[Optional[HTTPStats]] = ContextVar("scoped_http_stats",
+                                                                 default=None)
+
+
+def record_http_request(response, *args, **kwargs):
+    """Hook function to record a finished request for the process and the current scope
+
+    :param response: the requests Response object
+    :type response: requests.Response
+    """
+    http_stats.record(response)
+    scoped_stats = _scoped_http_stats.get()
+    if scoped_stats is not None:
+        scoped_stats.record(response)
+
+
+def current_http_stats() -> HTTPStats:
+    """Get stats of the innermost scope, of the whole process outside of any scope"""
+    return _scoped_http_stats.get() or http_stats
+
+
+@contextmanager
+def http_stats_scope() -> Iterator[HTTPStats]:
+    """Count requests made in the current context separately
+
+    Contexts are not inherited by new threads, requests made from a thread
+    are counted in the scope only when the thread runs in a copy of the
+    context, see contextvars.copy_context.
+    """
+    stats = HTTPStats()
+    token = _scoped_http_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _scoped_http_stats.reset(token)
+
+
 def get_retrying_requests_session(client_statuses=HTTP_CLIENT_STATUS_RETRY,
                                   times=HTTP_MAX_RETRIES, delay=HTTP_BACKOFF_FACTOR,
                                   allowed_methods=None, raise_on_status=True):
@@ -77,7 +144,7 @@ def get_retrying_requests_session(client_statuses=HTTP_CLIENT_STATUS_RETRY,
     session = SessionWithTimeout()
     session.mount('http://', HTTPAdapter(max_retries=retry))
     session.mount('https://', HTTPAdapter(max_retries=retry))
-    session.hooks['response'] = [hook_log_error_response_content]
+    session.hooks['response'] = [hook_log_error_response_content, record_http_request]
 
     return session
 
@@ -0,0 +1,100 @@
+"""
+Copyright (c) 2026 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+import subprocess
+
+import pytest
+from flexmock import flexmock
+
+from atomic_reactor.cli import benchmark
+
+
+def mock_result(startup_time):
+    return {
+        "startup_time": startup_time,
+        "modules": 100,
+        "packages": {"osbs": startup_time / 2, "koji": startup_time / 4},
+    }
+
+
+def test_get_task_names():
+    task_names = benchmark.get_task_names()
+
+    assert "clone" in task_names
+    assert "binary-container-exit" in task_names
+    assert "source-container-build" in task_names
+
+
+def test_run_task_benchmark():
+    result = benchmark.run_task_benchmark("clone", runs=1)
+
+    assert result["startup_time"] > 0
+    assert result["modules"] > 0
+    assert "cli_imported" in result["milestones"]
+    assert "plugins_loaded" in result["milestones"]
+
+
+def test_run_task_benchmark_fastest_run():
+    outputs = [b'{"startup_time": 2.0}\n', b'log line\n{"startup_time": 1.0}\n']
+    (flexmock(subprocess)
+     .should_receive("check_output")
+     .and_return(*outputs)
+     .one_by_one())
+
+    assert benchmark.run_task_benchmark("clone", runs=2) == {"startup_time": 1.0}
+
+
+@pytest.mark.parametrize("args, expected_rc, expected_over_budget", [
+    (["clone", "binary-container-exit"], 0, []),
+    (["--budget", "1.5", "clone", "binary-container-exit"], 1, ["binary-container-exit"]),
+    (["--task-budget", "clone=0.5", "clone", "binary-container-exit"], 1, ["clone"]),
+    (["--task-budget", "binary_container_exit=1", "--budget", "0.5",
+      "clone", "binary-container-exit"], 1, ["clone", "binary-container-exit"]),
+])
+def test_main(args, expected_rc, expected_over_budget, capsys):
+    results = {"clone": mock_result(1.0), "binary-container-exit": mock_result(2.0)}
+    (flexmock(benchmark)
+     .should_receive("run_task_benchmark")
+     .replace_with(lambda task_name, runs: results[task_name]))
+
+    assert benchmark.main(args) == expected_rc
+
+    out = capsys.readouterr().out
+    for task_name in ("clone", "binary-container-exit"):
+        assert task_name in out
+    if expected_over_budget:
+        assert out.count("OVER BUDGET") == len(expected_over_budget)
+        assert f"tasks over budget or failed: {', '.join(expected_over_budget)}" in out
+        assert "osbs" in out
+    else:
+        assert "OVER BUDGET" not in out
+
+
+def test_main_all_tasks():
+    flexmock(benchmark).should_receive("get_task_names").and_return(["clone"])
+    (flexmock(benchmark)
+     .should_receive("run_task_benchmark")
+     .with_args("clone", 3)
+     .and_return(mock_result(1.0))
+     .once())
+
+    assert benchmark.main([]) == 0
+
+
+def test_main_task_failed(capsys):
+    (flexmock(benchmark)
+     .should_receive("run_task_benchmark")
+     .and_raise(subprocess.CalledProcessError(1, ["python"])))
+
+    assert benchmark.main(["clone"]) == 1
+    assert "clone                                    failed to start" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("task_budget", ["clone", "clone=fast"])
+def test_invalid_task_budget(task_budget):
+    with pytest.raises(SystemExit):
+        benchmark.parse_args(["--task-budget", task_budget])
@@ -0,0 +1,64 @@
+"""
+Copyright (c) 2026 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+from flexmock import flexmock
+
+from atomic_reactor.cli import benchmark_pullspecs
+from atomic_reactor.utils import operator
+
+CSV_CONTENT = """\
+kind: ClusterServiceVersion
+metadata:
+  annotations:
+    containerImage: registry.example.com/ns/operator:v1
+    alm-examples: '[{"spec": {"image": "registry.example.com/ns/operand:v1"}}]'
+    description: Not a pullspec, https://example.com/docs
+spec:
+  install:
+    spec:
+      deployments: []
+"""
+
+
+def write_csv_files(tmp_path):
+    manifests = tmp_path / "manifests"
+    manifests.mkdir()
+    (manifests / "operator.clusterserviceversion.yaml").write_text(CSV_CONTENT)
+    (manifests / "crd.yaml").write_text("kind: CustomResourceDefinition\n")
+    (manifests / "README.md").write_text("registry.example.com/ns/readme:v1\n")
+    return manifests
+
+
+def test_collect_annotation_texts(tmp_path):
+    files = benchmark_pullspecs.find_csv_files([str(write_csv_files(tmp_path))])
+
+    assert [f.name for f in files] == ["crd.yaml", "operator.clusterserviceversion.yaml"]
+    texts = benchmark_pullspecs.collect_annotation_texts(files)
+    assert texts[0] == "registry.example.com/ns/operator:v1"
+    assert len(texts) == 3
+
+
+def test_main(tmp_path, capsys):
+    manifests = write_csv_files(tmp_path)
+
+    assert benchmark_pullspecs.main(["--runs", "2", str(manifests)]) == 0
+
+    out = capsys.readouterr().out
+    assert "3 annotation strings" in out
+    assert "scan, cached" in out
+    assert "2 pullspecs" in out
+
+
+def test_main_results_differ(tmp_path, capsys):
+    manifests = write_csv_files(tmp_path)
+    (flexmock(benchmark_pullspecs)
+     .should_receive("candidate_pullspec_heuristic")
+     .replace_with(lambda text: []))
+    operator._scan_pullspecs.cache_clear()
+
+    assert benchmark_pullspecs.main(["--runs", "1", str(manifests)]) == 1
+    assert "pullspecs differ from the reference in 2 annotation strings" in capsys.readouterr().out
@@ -35,6 +35,7 @@ def test_run(verbose, quiet, expect_loglevel):
             {
                 "verbose": verbose,
                 "quiet": quiet,
+                "profile_startup": False,
                 "user_params": "{}",
                 "func": task.source_container_build,
             }
@@ -28,6 +28,7 @@ SOURCE_URI = "git://example.org/namespace/repo"
 EXPECTED_ARGS = {
     "quiet": False,
     "verbose": False,
+    "profile_startup": False,
     "build_dir": BUILD_DIR,
     "context_dir": CONTEXT_DIR,
     "config_file": constants.REACTOR_CONFIG_FULL_PATH,
@@ -49,6 +50,7 @@ EXPECTED_ARGS_CONTAINER_INIT = {
 EXPECTED_ARGS_JOB = {
     "quiet": False,
     "verbose": False,
+    "profile_startup": False,
     "config_file": constants.REACTOR_CONFIG_FULL_PATH,
     "namespace": JOB_NAMESPACE,
 }
@@ -178,6 +180,10 @@ def test_parse_args_version(capsys):
             {**EXPECTED_ARGS, "annotations_result": "annotations_file",
              "config_file": "config.yaml", "func": task.binary_container_exit},
         ),
+        (
+            ["--profile-startup", "task", *REQUIRED_COMMON_ARGS, "clone"],
+            {**EXPECTED_ARGS, "profile_startup": True, "func": task.clone},
+        ),
         (
             ["job", *REQUIRED_JOB_ARGS, "remote-hosts-unlocking-recovery"],
             {**EXPECTED_ARGS_JOB, "func": job.remote_hosts_unlocking_recovery},
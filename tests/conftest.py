@@ -15,6 +15,7 @@ import requests.exceptions
 from atomic_reactor.constants import DOCKERFILE_FILENAME
 from atomic_reactor.dirs import ContextDir, RootBuildDir
 from atomic_reactor.source import DummySource
+from atomic_reactor.util import registry_cache
 from tests.constants import LOCALHOST_REGISTRY_HTTP, DOCKER0_REGISTRY_HTTP, TEST_IMAGE
 from tests.util import uuid_value
 
@@ -22,6 +23,15 @@ from osbs.utils import ImageName
 from atomic_reactor.inner import DockerBuildWorkflow
 
 
+@pytest.fixture(autouse=True)
+def clear_registry_cache():
+    """Do not share cached registry responses between tests."""
+    registry_cache.clear()
+    yield
+    registry_cache.clear()
+    registry_cache.persistent_dir = None
+
+
 @pytest.fixture()
 def temp_image_name():
     return ImageName(repo=("atomic-reactor-tests-%s" % uuid_value()))
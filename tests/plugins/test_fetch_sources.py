@@ -311,10 +311,33 @@ def mock_env(workflow, source_dir: Path, scratch=False, koji_build_id=None,
     return PluginsRunner(workflow, plugin_conf)
 
 
+class MockMultiCall(object):
+    """Mimic koji MultiCallSession, forward calls to the mocked session"""
+    def __init__(self, session):
+        self.session = session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def __getattr__(self, name):
+        method = getattr(self.session, name)
+
+        def virtual_call(*args, **kwargs):
+            return flexmock(result=method(*args, **kwargs))
+
+        return virtual_call
+
+
 @pytest.fixture()
 def koji_session():
     session = flexmock()
     flexmock(session).should_receive('ssl_login').and_return(True)
+    (flexmock(session)
+     .should_receive('multicall')
+     .replace_with(lambda strict=False, batch=None: MockMultiCall(session)))
     (flexmock(session)
      .should_receive('listArchives')
      .with_args(object, type='image')
@@ -746,6 +769,28 @@ class TestFetchSources(object):
             with open(os.path.join(sources_dir, f"{rpm['nvr']}.src.rpm"), 'rb') as f:
                 assert f.read() == b'Source RPM'
 
+    def test_srpm_urls_batched(self, requests_mock, koji_session, workflow, source_dir):
+        mock_koji_manifest_download(source_dir, requests_mock)
+        # listRPMs, getRPMHeaders and getBuild are each sent in one multicall
+        (flexmock(koji_session)
+         .should_receive('multicall')
+         .with_args(strict=True, batch=constants.KOJI_MULTICALL_BATCH_SIZE)
+         .replace_with(lambda strict, batch: MockMultiCall(koji_session))
+         .times(3))
+        mock_env(workflow, source_dir, koji_build_nvr=KOJI_BUILD_GO_RPMS['nvr'])
+        plugin = FetchSourcesPlugin(workflow, koji_build_nvr=KOJI_BUILD_GO_RPMS['nvr'])
+        plugin.set_koji_image_build_data()
+
+        srpm_urls = plugin.get_srpm_urls()
+
+        expected_urls = [
+            {'url': '{}/packages/{}/{}/{}/src/{}.src.rpm'.format(
+                KOJI_ROOT, rpm['name'], rpm['version'], rpm['release'], rpm['nvr'])}
+            for rpm in ALL_RPM_BUILDS
+        ]
+        assert sorted(srpm_urls, key=lambda u: u['url']) == \
+            sorted(expected_urls, key=lambda u: u['url'])
+
     @pytest.mark.parametrize('typeinfo_rs', (
         RS_TYPEINFO, RS_TYPEINFO_NO_JSON, RS_TYPEINFO_NO_TAR_GZ
     ))
@@ -1520,3 +1565,19 @@ class TestFetchSources(object):
                     if 'Keeping vendor in app' == check_msg and not vendor_exists:
                         continue
                     assert check_msg in caplog.text
+
+            remote_archive = os.path.join(remote_sources_dir, sorted(remote_list)[0])
+            with tarfile.open(remote_archive) as tar:
+                names = set(tar.getnames())
+            removed = {
+                'Removing excluded file': ['deps/dir1/toremovefile'],
+                'Removing excluded directory': ['deps/dir1/toremovedir',
+                                                'deps/dir1/toremovedir/subdir'],
+                'Removing app': ['app', 'app/file1', 'app/dir1/file1'],
+            }
+            for msg, paths in removed.items():
+                for path in paths:
+                    assert (path not in names) == (msg in exclude_messages)
+            assert {'deps/dir2/toremovefilepost', 'deps/dir2/pretoremovefile',
+                    'deps/dir2/toremovedirpost/subdir'} <= names
+            assert ('app/vendor/vendor_file' in names) == vendor_exists
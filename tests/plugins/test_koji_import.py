@@ -25,7 +25,9 @@ from atomic_reactor.plugins.gather_builds_metadata import GatherBuildsMetadataPl
 from atomic_reactor.plugins.koji_import import (
     KojiImportPlugin,
     KojiImportSourceContainerPlugin,
+    dump_escaped_json,
     escape_non_printable_chars,
+    iter_escaped_json,
 )
 from atomic_reactor.plugins.rpmqa import RPMqaPlugin
 from atomic_reactor.plugins.add_filesystem import AddFilesystemPlugin
@@ -103,6 +105,7 @@ class MockedClientSession(object):
     DEST_TAG = 'images-candidate'
 
     def __init__(self, hub, opts=None, task_states=None):
+        self.opts = opts or {}
         self.metadata: Dict[str, Any] = {}
         # destination filename on Koji => file content
         self.uploaded_files: Dict[str, bytes] = {}
@@ -756,6 +759,45 @@ class TestKojiImport(object):
         else:
             assert build_metadata is False
 
+    @pytest.mark.parametrize('compact', [False, True])
+    def test_compact_metadata_json(self, workflow, source_dir, compact):
+        session = MockedClientSession('')
+        mock_environment(workflow, source_dir,
+                         session=session, name='ns/name', version='1.0', release='1')
+        runner = create_runner(workflow)
+        workflow.conf.conf['koji']['compact_metadata'] = compact
+
+        runner.run()
+
+        uploaded = session.uploaded_files[KOJI_METADATA_FILENAME]
+        assert (b'\n' not in uploaded) == compact
+        assert session.metadata['build']['name'] == 'ns-name'
+
+    def test_upload_retried(self, workflow, source_dir):
+        session = MockedClientSession('')
+        mock_environment(workflow, source_dir,
+                         session=session, name='ns/name', version='1.0', release='1')
+        runner = create_runner(workflow)
+        # the default, files are uploaded one by one
+        assert 'upload_workers' not in workflow.conf.conf['koji']
+
+        upload_wrapper = session.uploadWrapper
+        failed = []
+
+        def fail_once(localfile, path, name=None, **kwargs):
+            if name not in failed:
+                failed.append(name)
+                raise koji.GenericError(f"failed to upload {name}")
+            upload_wrapper(localfile, path, name=name, **kwargs)
+
+        session.uploadWrapper = fail_once
+
+        runner.run()
+
+        assert failed
+        assert sorted(session.uploaded_files) == sorted(failed)
+        assert session.metadata['build']['name'] == 'ns-name'
+
     @pytest.mark.parametrize(('userdata'), [
         None,
         {},
@@ -2535,3 +2577,30 @@ class TestKojiImport(object):
 def test_escape_non_printable_chars(koji_metadata, expected_metadata):
     actual_metadata = escape_non_printable_chars(koji_metadata)
     assert expected_metadata == actual_metadata
+
+
+@pytest.mark.parametrize('indent', [2, None])
+@pytest.mark.parametrize('data', [
+    {"metadata": {"config": {"env": "value\x1Fvalue\n\r\t\x03"}}},
+    {"output": [{"components": [], "extra": {}}, {"arch": "x86_64"}], "tuple": ("a\x1F", 1)},
+    {"numbers": [1, 2.5, -3], "flags": [True, False, None], 1: "unicode \u00e9"},
+    [],
+    "string",
+])
+def test_iter_escaped_json(data, indent):
+    separators = (',', ':') if indent is None else None
+    expected = json.dumps(escape_non_printable_chars(data), indent=indent, separators=separators)
+
+    assert ''.join(iter_escaped_json(data, indent=indent)) == expected
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_dump_escaped_json(tmp_path, compact):
+    data = {"metadata": {"config": {"env": ["\x1F", "\n"]}}}
+    path = tmp_path / 'metadata.json'
+    with open(path, 'w') as f:
+        dump_escaped_json(data, f, compact=compact)
+
+    content = path.read_text()
+    assert json.loads(content) == {"metadata": {"config": {"env": ["\\x1f", "\n"]}}}
+    assert ('\n' not in content) == compact
@@ -744,6 +744,70 @@ class TestPinOperatorDigest(object):
         # plugin must always retun pullspecs
         assert result['pin_operator_digest']['related_images']['pullspecs']
 
+    @pytest.mark.parametrize('max_workers', [1, 4])
+    @responses.activate
+    def test_replacements_resolved_once_in_order(self, max_workers, workflow, repo_dir):
+        names = ['foo', 'bar', 'baz', 'spam', 'eggs']
+        originals = ['{}/ns/{}:1'.format(SOURCE_REGISTRY_URI, name) for name in names]
+        digests = {
+            original: 'sha256:{}'.format(i) for i, original in enumerate(originals)
+        }
+        # images queried for digests and for labels, list.append is thread-safe
+        digest_queries = []
+        inspect_queries = []
+
+        def get_manifest_list_digest(image):
+            digest_queries.append(image.to_str())
+            return digests[image.to_str()]
+
+        (flexmock(atomic_reactor.util.RegistryClient)
+            .should_receive('get_manifest_list_digest')
+            .replace_with(get_manifest_list_digest))
+
+        site_replacements = {
+            SOURCE_REGISTRY_URI: {
+                '{}-package'.format(name): ['new-ns/new-{}'.format(name)] for name in names
+            }
+        }
+        repo_replacements = mock_package_mapping_files(site_replacements)
+        labels = {}
+        for name, original in zip(names, originals):
+            pinned = ImageName.parse(original)
+            pinned.tag = digests[original]
+            labels[pinned.to_str()] = {PKG_LABEL: '{}-package'.format(name)}
+
+        def get_inspect_for_image(image):
+            inspect_queries.append(image.to_str())
+            return {INSPECT_CONFIG: {'Labels': labels[image.to_str()]}}
+
+        (flexmock(atomic_reactor.util.RegistryClient)
+            .should_receive('get_inspect_for_image')
+            .replace_with(get_inspect_for_image))
+
+        site_config = get_site_config(repo_replacements=repo_replacements,
+                                      registry_post_replace={SOURCE_REGISTRY_URI: 'new-registry'})
+        user_config = get_user_config(manifests_dir=OPERATOR_MANIFESTS_DIR)
+        mock_env(workflow, repo_dir, user_config=user_config, site_config=site_config)
+
+        plugin = PinOperatorDigestsPlugin(workflow)
+        plugin.max_workers = max_workers
+        pullspecs = [ImageName.parse(original) for original in reversed(originals + originals[:2])]
+        replacements = plugin._get_replacement_pullspecs_OSBS_resolution(pullspecs)
+
+        # results are in the order of the pullspecs, duplicates included
+        assert [replacement['original'] for replacement in replacements] == pullspecs
+        assert [replacement['new'].to_str() for replacement in replacements] == [
+            'new-registry/new-ns/new-{}@{}'.format(pullspec.repo, digests[pullspec.to_str()])
+            for pullspec in pullspecs
+        ]
+        assert all(replacement['pinned'] and replacement['replaced']
+                   for replacement in replacements)
+        # each pullspec is resolved only once, even if it's listed more than once
+        assert sorted(digest_queries) == sorted(originals)
+        assert sorted(inspect_queries) == sorted(labels)
+        # the mapping file is downloaded only once
+        assert len(responses.calls) == 1
+
     def test_exclude_csvs(self, workflow, repo_dir, caplog):
         manifests_dir = repo_dir.joinpath(OPERATOR_MANIFESTS_DIR)
         manifests_dir.mkdir()
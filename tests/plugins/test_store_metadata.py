@@ -221,6 +221,8 @@ def test_metadata_plugin(workflow, source_dir, tmpdir, failed, init_dirs,
 
     assert "filesystem" in annotations
     assert "fs_data" in annotations['filesystem']
+    for key in ("mounts", "plugins", "summary", "series"):
+        assert key in annotations['filesystem']
 
     assert "digests" in annotations
     digests = annotations['digests']
@@ -6,11 +6,12 @@ This software may be modified and distributed under the terms
 of the BSD license. See the LICENSE file for details.
 """
 
-import io
 import json
+import os
 import re
 import shutil
 import subprocess
+import threading
 import time
 from copy import deepcopy
 from json import JSONDecodeError
@@ -39,9 +40,11 @@ from atomic_reactor.tasks.binary_container_build import (
     InspectError,
     PushError,
     # helpers
+    BuildStepParser,
     PodmanRemote,
     get_authfile_path,
     which_podman,
+    write_build_log,
 )
 from atomic_reactor.utils import remote_host
 from atomic_reactor.utils import retries
@@ -178,13 +181,24 @@ def mock_config(registry_config: Dict[str, Any],
 class MockedPopen:
     def __init__(self, rc: int, output_lines: List[str]):
         self._rc = rc
-        self.stdout = io.StringIO("".join(output_lines))
+        read_fd, write_fd = os.pipe()
+        self.stdout = os.fdopen(read_fd, "rb")
+        # write from a thread, the output may not fit in the pipe buffer
+        #   (surrogate escapes in output_lines allow writing invalid UTF-8)
+        self._writer = threading.Thread(
+            target=self._write,
+            args=(write_fd, "".join(output_lines).encode("utf-8", "surrogateescape")),
+        )
+        self._writer.start()
+
+    @staticmethod
+    def _write(write_fd: int, output: bytes):
+        with os.fdopen(write_fd, "wb") as f:
+            f.write(output)
 
-    def poll(self):
-        if self.stdout.tell() >= len(self.stdout.getvalue()):
-            # no more output, the process has ended
-            return self._rc
-        return None
+    def wait(self):
+        self._writer.join()
+        return self._rc
 
 
 def mock_popen(
@@ -419,6 +433,69 @@ def test_which_podman(podman_path, podman_remote_path, expect_path):
         assert which_podman() == expect_path
 
 
+def test_build_step_parser():
+    step_parser = BuildStepParser()
+    (
+        flexmock(time)
+        .should_receive("monotonic")
+        .and_return(10.0)
+        .and_return(12.5)
+        .and_return(20.0)
+        .and_return(20.0)
+    )
+
+    assert step_parser.feed("STEP 1/2: FROM fedora:latest\n").number == 1
+    assert step_parser.feed("Trying to pull fedora:latest...\n") is None
+    assert step_parser.feed("STEP 2/2: RUN echo STEP 3/2: hello\n").number == 2
+    assert step_parser.feed("STEP 3/2: hello\n").number == 3
+    step_parser.finish()
+
+    assert step_parser.format_timings() == dedent(
+        """\
+        STEP 1/2 (2.5s): FROM fedora:latest
+        STEP 2/2 (7.5s): RUN echo STEP 3/2: hello
+        STEP 3/2 (0.0s): hello"""
+    )
+
+
+def test_build_step_parser_without_total():
+    step_parser = BuildStepParser()
+    flexmock(time).should_receive("monotonic").and_return(1.0).and_return(2.0)
+
+    step_parser.feed("STEP 1: FROM fedora:latest\n")
+    step_parser.feed("COMMIT\n")
+    step_parser.finish()
+
+    assert step_parser.total_steps is None
+    assert step_parser.format_timings() == "STEP 1 (1.0s): FROM fedora:latest"
+
+
+@pytest.mark.parametrize("fail", [False, True])
+def test_write_build_log(fail, tmp_path, caplog):
+    output_lines = ["STEP 1/1: FROM fedora\n", "line 1\n", "line 2\n", "line 3\n", "line 4\n"]
+
+    def build_output():
+        yield from output_lines
+        if fail:
+            raise BuildProcessError("Build failed (rc=1): line 4")
+
+    build_log_path = tmp_path / "build.log"
+    with open(build_log_path, "w") as build_log_file:
+        flexmock(build_log_file).should_call("writelines").times(3)
+
+        if fail:
+            with pytest.raises(BuildProcessError):
+                write_build_log(build_output(), build_log_file, batch_size=2)
+        else:
+            step_parser = write_build_log(build_output(), build_log_file, batch_size=2)
+            assert [step.instruction for step in step_parser.steps] == ["FROM fedora"]
+
+    # everything that was read before the failure is written to the build log
+    assert build_log_path.read_text() == "".join(output_lines)
+    for line in output_lines:
+        assert line.rstrip() in caplog.text
+
+
 class TestPodmanRemote:
     """Tests for the PodmanRemote class."""
 
@@ -547,6 +624,53 @@ class TestPodmanRemote:
             while True:
                 next(returned_lines)
 
+    @pytest.mark.parametrize(
+        "output_lines, expected_lines",
+        [
+            # universal newlines, non-UTF-8 output is replaced
+            (["a\r\n", "b\r", "c\udcff\n"], ["a\n", "b\n", "c\ufffd\n"]),
+            # empty lines are held back with the last non-empty line, the order is kept
+            (["a\n", "\n", "b"], ["a\n", "\n", "b"]),
+            (["\n", "a\n", " \n", "\n"], ["\n", "a\n", " \n", "\n"]),
+            (
+                ["STEP 1/2: FROM x\n", "\n", "foo\n", "\n", "STEP 2/2\n", "last\n"],
+                ["STEP 1/2: FROM x\n", "\n", "foo\n", "\n", "STEP 2/2\n", "last\n"],
+            ),
+            # identical lines are not lost
+            (["a\n", "a\n", "a\n"], ["a\n", "a\n", "a\n"]),
+        ]
+    )
+    def test_build_container_output(self, output_lines, expected_lines, x86_build_dir):
+        mock_popen(0, output_lines)
+
+        podman_remote = PodmanRemote("connection-name")
+        returned_lines = podman_remote.build_container(
+            build_dir=x86_build_dir,
+            build_args=BUILD_ARGS,
+            dest_tag=X86_UNIQUE_IMAGE,
+            flatpak=False,
+            memory_limit=None,
+            podman_capabilities=None,
+        )
+
+        assert list(returned_lines) == expected_lines
+
+    def test_build_container_many_lines(self, x86_build_dir):
+        output_lines = [f"line {i}\n" for i in range(200_000)]
+        mock_popen(0, output_lines)
+
+        podman_remote = PodmanRemote("connection-name")
+        returned_lines = podman_remote.build_container(
+            build_dir=x86_build_dir,
+            build_args=BUILD_ARGS,
+            dest_tag=X86_UNIQUE_IMAGE,
+            flatpak=False,
+            memory_limit=None,
+            podman_capabilities=None,
+        )
+
+        assert list(returned_lines) == output_lines
+
     @pytest.mark.parametrize("authfile", [None, AUTHFILE_PATH])
     @pytest.mark.parametrize("insecure", [True, False])
     def test_push_container(self, authfile, insecure):
@@ -198,6 +198,9 @@ class TestTask:
 
         task.run()
 
+        context_dir = task.get_context_dir()
+        assert util.registry_cache.persistent_dir == context_dir.registry_cache_dir
+
     def test_run_task_ignores_sigterm(self, params):
 
         class TaskIgnoreSigterm(common.Task):
@@ -7,6 +7,7 @@ of the BSD license. See the LICENSE file for details.
 """
 import os
 import tempfile
+import threading
 from pathlib import Path
 from typing import Any, Iterable
 import shutil
@@ -23,6 +24,7 @@ from atomic_reactor.dirs import (
     DockerfileNotExist,
     FileCreationFunc,
     ImageInspectionData,
+    PlatformActionError,
     RootBuildDir,
 )
 from atomic_reactor.source import DummySource
@@ -231,6 +233,42 @@ def test_rootbuilddir_for_each_platform_failure_from_action(build_dir, mock_sour
         root.for_each_platform(failure_action)
 
 
+def test_rootbuilddir_for_each_platform_parallel(build_dir, mock_source):
+    root = RootBuildDir(build_dir)
+    root.init_build_dirs(["x86_64", "s390x", "aarch64"], mock_source)
+    barrier = threading.Barrier(3, timeout=5)
+
+    def action(build_dir: BuildDir) -> str:
+        # all platforms must be handled at the same time to get past the barrier
+        barrier.wait()
+        return f"handled {build_dir.platform}"
+
+    results = root.for_each_platform(action, parallel=True)
+    assert results == {
+        "x86_64": "handled x86_64",
+        "s390x": "handled s390x",
+        "aarch64": "handled aarch64",
+    }
+
+
+def test_rootbuilddir_for_each_platform_parallel_failures(build_dir, mock_source):
+    root = RootBuildDir(build_dir)
+    root.init_build_dirs(["x86_64", "s390x", "aarch64"], mock_source)
+    handled = []
+
+    def action(build_dir: BuildDir) -> None:
+        handled.append(build_dir.platform)
+        if build_dir.platform != "s390x":
+            raise ValueError(f"failed on {build_dir.platform}")
+
+    with pytest.raises(PlatformActionError, match="aarch64, x86_64") as exc_info:
+        root.for_each_platform(action, parallel=True)
+
+    assert sorted(handled) == ["aarch64", "s390x", "x86_64"]
+    assert sorted(exc_info.value.errors) == ["aarch64", "x86_64"]
+    assert str(exc_info.value.errors["x86_64"]) == "failed on x86_64"
+
+
 def create_dockerfile(build_dir: BuildDir) -> Iterable[Path]:
     # Create: ./Dockerfile
     dockerfile = build_dir.path / DOCKERFILE_FILENAME
@@ -311,6 +349,54 @@ def test_rootbuilddir_for_all_platforms_copy_reflink(caplog, build_dir, mock_sou
     assert log_msg2 in caplog.text
 
 
+@pytest.mark.parametrize("immutable", [True, False])
+def test_rootbuilddir_for_all_platforms_copy_immutable(caplog, build_dir, mock_source, immutable):
+    flexmock(reflink).should_receive('supported_at').and_return(False)
+
+    root = RootBuildDir(build_dir)
+    root.init_build_dirs(["x86_64", "s390x", "aarch64"], mock_source)
+    root.for_all_platforms_copy(create_dockerfile, immutable=immutable)
+
+    method_name = 'hardlink_copy' if immutable else shutil.copy2.__name__
+    assert f"copy method used for all platforms copy: {method_name}" in caplog.text
+
+    src_file = build_dir / "aarch64" / "cachito-1" / "app" / "main.py"
+    for platform in ["s390x", "x86_64"]:
+        dest_file = build_dir / platform / "cachito-1" / "app" / "main.py"
+        assert dest_file.read_text() == src_file.read_text()
+        assert dest_file.samefile(src_file) == immutable
+        assert f"copied 3 files (35 bytes) to the {platform} build directory" in caplog.text
+
+
+def test_rootbuilddir_for_all_platforms_copy_hardlink_fails(build_dir, mock_source):
+    flexmock(reflink).should_receive('supported_at').and_return(False)
+    flexmock(os).should_receive('link').and_raise(OSError, "Invalid cross-device link")
+
+    root = RootBuildDir(build_dir)
+    root.init_build_dirs(["x86_64", "s390x"], mock_source)
+    root.for_all_platforms_copy(create_dockerfile, immutable=True)
+
+    src_file = build_dir / "s390x" / "cachito-1" / "app" / "main.py"
+    dest_file = build_dir / "x86_64" / "cachito-1" / "app" / "main.py"
+    assert dest_file.read_text() == src_file.read_text()
+    assert not dest_file.samefile(src_file)
+
+
+def test_rootbuilddir_for_all_platforms_copy_nested_files(build_dir, mock_source):
+    def create_nested_files(build_dir: BuildDir) -> Iterable[Path]:
+        files = create_dockerfile(build_dir)
+        main_py = build_dir.path / "cachito-1" / "app" / "main.py"
+        # the file is inside a created directory, and is listed twice
+        return [*files, main_py, main_py]
+
+    root = RootBuildDir(build_dir)
+    root.init_build_dirs(["x86_64", "s390x"], mock_source)
+    results = root.for_all_platforms_copy(create_nested_files)
+
+    assert len(results) == 5
+    assert build_dir.joinpath("x86_64", "cachito-1", "app", "main.py").exists()
+
+
 def create_file_outside_build_dir(build_dir: BuildDir) -> Iterable[Path]:
     fd, filename = tempfile.mkstemp()
     os.close(fd)
@@ -450,6 +536,10 @@ class TestContextDir:
         # The ContextDir does not ensure workflow.json is created by itself.
         assert not expected.exists()
 
+    def test_get_workflow_field_json(self, tmpdir):
+        expected = Path(tmpdir.join("workflow.plugins_results.json"))
+        assert expected == ContextDir(Path(tmpdir)).get_workflow_field_json("plugins_results")
+
     @pytest.mark.parametrize("platform,error", [
         [None, pytest.raises(ValueError, match="No platform is specified")],
         ["", pytest.raises(ValueError, match="No platform is specified")],
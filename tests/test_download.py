@@ -17,7 +17,7 @@ import pytest
 from flexmock import flexmock
 
 from atomic_reactor.util import get_retrying_requests_session
-from atomic_reactor.download import download_url
+from atomic_reactor.download import DownloadManager, download_url
 from atomic_reactor.constants import CACHITO_ALG_STR
 
 
@@ -80,7 +80,7 @@ class TestDownloadUrl(object):
         dest_dir = tempfile.mkdtemp()
         session = get_retrying_requests_session()
         # get response shows successful connection
-        response = flexmock()
+        response = flexmock(status_code=200, headers={})
         (response
          .should_receive('raise_for_status'))
         # but streaming from the response fails
@@ -96,3 +96,184 @@ class TestDownloadUrl(object):
          .should_receive('sleep'))
         with pytest.raises(requests.exceptions.RequestException):
             download_url(url, dest_dir, session=session)
+
+    def test_resume_download(self):
+        url = 'https://example.com/path/file'
+        dest_dir = tempfile.mkdtemp()
+        session = get_retrying_requests_session()
+
+        def interrupted_stream(**kwargs):
+            yield b'ab'
+            raise requests.exceptions.ConnectionError
+
+        first_response = flexmock(status_code=200, headers={})
+        first_response.should_receive('raise_for_status')
+        first_response.should_receive('iter_content').replace_with(interrupted_stream)
+
+        resumed_response = flexmock(status_code=206, headers={'Content-Range': 'bytes 2-2/3'})
+        resumed_response.should_receive('raise_for_status')
+        resumed_response.should_receive('iter_content').and_return([b'c'])
+
+        (flexmock(session)
+         .should_receive('get')
+         .with_args(url, stream=True, verify=True, headers={'Accept-Encoding': 'identity'})
+         .and_return(first_response)
+         .once())
+        (flexmock(session)
+         .should_receive('get')
+         .with_args(url, stream=True, verify=True,
+                    headers={'Accept-Encoding': 'identity', 'Range': 'bytes=2-'})
+         .and_return(resumed_response)
+         .once())
+        flexmock(time).should_receive('sleep')
+
+        result = download_url(url, dest_dir, session=session,
+                              expected_checksums={'md5': '900150983cd24fb0d6963f7d28e17f72'})
+
+        with open(result, 'rb') as f:
+            assert f.read() == b'abc'
+
+    def test_resume_not_supported(self):
+        url = 'https://example.com/path/file'
+        dest_dir = tempfile.mkdtemp()
+        session = get_retrying_requests_session()
+
+        def interrupted_stream(**kwargs):
+            yield b'ab'
+            raise requests.exceptions.ConnectionError
+
+        first_response = flexmock(status_code=200, headers={})
+        first_response.should_receive('raise_for_status')
+        first_response.should_receive('iter_content').replace_with(interrupted_stream)
+
+        # server ignores the Range header and sends the whole content
+        full_response = flexmock(status_code=200, headers={})
+        full_response.should_receive('raise_for_status')
+        full_response.should_receive('iter_content').and_return([b'abc'])
+
+        (flexmock(session)
+         .should_receive('get')
+         .and_return(first_response)
+         .and_return(full_response)
+         .one_by_one())
+        flexmock(time).should_receive('sleep')
+
+        result = download_url(url, dest_dir, session=session,
+                              expected_checksums={'md5': '900150983cd24fb0d6963f7d28e17f72'})
+
+        with open(result, 'rb') as f:
+            assert f.read() == b'abc'
+
+    @pytest.mark.parametrize('status_code, response_headers', [
+        # range starts elsewhere than requested
+        (206, {'Content-Range': 'bytes 0-2/3'}),
+        (206, {}),
+        # range is not satisfiable, e.g. the file has changed
+        (416, {'Content-Range': 'bytes */1'}),
+    ])
+    def test_resume_wrong_range(self, status_code, response_headers):
+        url = 'https://example.com/path/file'
+        dest_dir = tempfile.mkdtemp()
+        session = get_retrying_requests_session()
+
+        def interrupted_stream(**kwargs):
+            yield b'ab'
+            raise requests.exceptions.ConnectionError
+
+        first_response = flexmock(status_code=200, headers={})
+        first_response.should_receive('raise_for_status')
+        first_response.should_receive('iter_content').replace_with(interrupted_stream)
+
+        range_response = flexmock(status_code=status_code, headers=response_headers)
+        range_response.should_receive('close').once()
+        range_response.should_receive('raise_for_status').never()
+        range_response.should_receive('iter_content').never()
+
+        full_response = flexmock(status_code=200, headers={})
+        full_response.should_receive('raise_for_status')
+        full_response.should_receive('iter_content').and_return([b'abc'])
+
+        (flexmock(session)
+         .should_receive('get')
+         .with_args(url, stream=True, verify=True, headers={'Accept-Encoding': 'identity'})
+         .and_return(first_response)
+         .and_return(full_response)
+         .one_by_one()
+         .twice())
+        (flexmock(session)
+         .should_receive('get')
+         .with_args(url, stream=True, verify=True,
+                    headers={'Accept-Encoding': 'identity', 'Range': 'bytes=2-'})
+         .and_return(range_response)
+         .once())
+        flexmock(time).should_receive('sleep')
+
+        result = download_url(url, dest_dir, session=session,
+                              expected_checksums={'md5': '900150983cd24fb0d6963f7d28e17f72'})
+
+        with open(result, 'rb') as f:
+            assert f.read() == b'abc'
+
+    def test_resume_encoded_content(self):
+        url = 'https://example.com/path/file'
+        dest_dir = tempfile.mkdtemp()
+        session = get_retrying_requests_session()
+
+        def interrupted_stream(**kwargs):
+            yield b'ab'
+            raise requests.exceptions.ConnectionError
+
+        # server encodes the content anyway, the decoded size is no offset
+        first_response = flexmock(status_code=200, headers={'Content-Encoding': 'gzip'})
+        first_response.should_receive('raise_for_status')
+        first_response.should_receive('iter_content').replace_with(interrupted_stream)
+
+        full_response = flexmock(status_code=200, headers={'Content-Encoding': 'gzip'})
+        full_response.should_receive('raise_for_status')
+        full_response.should_receive('iter_content').and_return([b'abc'])
+
+        (flexmock(session)
+         .should_receive('get')
+         .with_args(url, stream=True, verify=True, headers={'Accept-Encoding': 'identity'})
+         .and_return(first_response)
+         .and_return(full_response)
+         .one_by_one()
+         .twice())
+        flexmock(time).should_receive('sleep')
+
+        result = download_url(url, dest_dir, session=session,
+                              expected_checksums={'md5': '900150983cd24fb0d6963f7d28e17f72'})
+
+        with open(result, 'rb') as f:
+            assert f.read() == b'abc'
+
+
+class TestDownloadManager(object):
+    @responses.activate
+    def test_download_all(self):
+        dest_dir = tempfile.mkdtemp()
+        downloads = []
+        for i in range(10):
+            url = 'https://example{}.com/path/file{}'.format(i % 3, i)
+            responses.add(responses.GET, url, body='content{}'.format(i))
+            downloads.append({'url': url, 'dest_dir': dest_dir})
+
+        with DownloadManager(max_workers=4, max_connections_per_host=2) as manager:
+            results = manager.download_all(downloads)
+
+        assert [os.path.basename(path) for path in results] == \
+            ['file{}'.format(i) for i in range(10)]
+        for i, path in enumerate(results):
+            with open(path) as f:
+                assert f.read() == 'content{}'.format(i)
+
+    @responses.activate
+    def test_download_all_failure(self):
+        dest_dir = tempfile.mkdtemp()
+        url = 'https://example.com/path/file'
+        responses.add(responses.GET, url, body='abc')
+
+        with DownloadManager() as manager:
+            with pytest.raises(ValueError, match='does not match expected checksum'):
+                manager.download_all([{'url': url, 'dest_dir': dest_dir,
+                                       'expected_checksums': {'md5': 'wrong'}}])
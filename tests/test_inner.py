@@ -25,12 +25,13 @@ from osbs.utils import ImageName
 
 from atomic_reactor.inner import (BuildResults, BuildResultsEncoder,
                                   BuildResultsJSONDecoder, DockerBuildWorkflow,
-                                  FSWatcher, ImageBuildWorkflowData, TagConf)
+                                  FSWatcher, ImageBuildWorkflowData, TagConf,
+                                  WorkflowDataEncoder)
 from atomic_reactor.source import PathSource, DummySource
 from atomic_reactor.util import (
     DockerfileImages, validate_with_schema, graceful_chain_get
 )
-from atomic_reactor.dirs import ContextDir
+from atomic_reactor.dirs import ContextDir, RootBuildDir
 from atomic_reactor.plugin import Plugin, PluginFailedException
 from tests.util import is_string_type
 from tests.constants import DOCKERFILE_MULTISTAGE_CUSTOM_BAD_PATH
@@ -317,8 +318,8 @@ def test_show_version(has_version, context_dir, build_dir, workflow: DockerBuild
         kwargs['client_version'] = version
 
     workflow = DockerBuildWorkflow(
-        context_dir,
-        build_dir,
+        ContextDir(context_dir),
+        RootBuildDir(build_dir),
         namespace=NAMESPACE,
         pipeline_run_name=PIPELINE_RUN_NAME,
         source=None,
@@ -431,6 +432,20 @@ def test_fs_watcher_update(monkeypatch):
     assert data["mb_free"] == 99
 
 
+def test_fs_watcher_get_current_usage(monkeypatch):
+    w = FSWatcher()
+    usage = w.get_current_usage()
+    assert "mb_used" in usage
+    # the record of highest usage is not updated
+    assert w.get_usage_data() == {}
+
+    def statvfs(path):
+        raise OSError("no such filesystem")
+
+    monkeypatch.setattr(os, "statvfs", statvfs)
+    assert w.get_current_usage() is None
+
+
 def test_fs_watcher(monkeypatch):
     w = FSWatcher()
     monkeypatch.setattr(time, "sleep", lambda x: x)  # don't waste a second of test time
@@ -441,6 +456,120 @@ def test_fs_watcher(monkeypatch):
     assert "mb_used" in w.get_usage_data()
 
 
+def mock_statvfs(monkeypatch, used_blocks):
+    """Pretend every path is on its own filesystem, with usage set in used_blocks"""
+    def statvfs(path):
+        used = used_blocks[path]
+        return flexmock(f_frsize=1000, f_blocks=100 * 1000, f_bfree=100 * 1000 - used,
+                        f_files=100, f_ffree=100 - used // 1000)
+
+    devices = {path: device for device, path in enumerate(used_blocks)}
+    monkeypatch.setattr(os, "statvfs", statvfs)
+    monkeypatch.setattr(os, "stat", lambda path: flexmock(st_dev=devices[path]))
+
+
+def test_fs_watcher_plugin_peaks(monkeypatch):
+    used_blocks = {"/": 1000, "/build": 2000}
+    mock_statvfs(monkeypatch, used_blocks)
+    w = FSWatcher(mounts={"build_dir": "/build"})
+
+    w.plugin_started("fetch")
+    used_blocks["/build"] = 5000
+    w._sample()
+    w.plugin_started("compress")
+    used_blocks["/build"] = 3000
+    w.plugin_finished("fetch")
+    used_blocks["/"] = 4000
+    w.plugin_finished("compress")
+
+    report = w.get_usage_report()
+    assert report["plugins"] == {
+        "fetch": {
+            "root": {"mb_used": 1, "inodes_used": 1, "mb_added": 0, "inodes_added": 0},
+            "build_dir": {"mb_used": 5, "inodes_used": 5, "mb_added": 3, "inodes_added": 3},
+        },
+        "compress": {
+            "root": {"mb_used": 4, "inodes_used": 4, "mb_added": 3, "inodes_added": 3},
+            "build_dir": {"mb_used": 5, "inodes_used": 5, "mb_added": 0, "inodes_added": 0},
+        },
+    }
+    assert report["mounts"] == {
+        "root": {"paths": {"root": "/"}, "mb_total": 100, "inodes_total": 100},
+        "build_dir": {"paths": {"build_dir": "/build"}, "mb_total": 100, "inodes_total": 100},
+    }
+    assert w.get_usage_data()["mb_used"] == 4
+
+
+def test_fs_watcher_series(monkeypatch):
+    used_blocks = {"/": 1000, "/build": 2000, "/tmp": 0}
+    mock_statvfs(monkeypatch, used_blocks)
+
+    def stat(path):
+        if path == "/missing":
+            raise FileNotFoundError(path)
+        return flexmock(st_dev=0 if path == "/tmp" else 1)
+
+    monkeypatch.setattr(os, "stat", stat)
+    w = FSWatcher(mounts={"tmp": "/tmp", "missing": "/missing", "build_dir": "/build"},
+                  history_size=2)
+
+    w._sample()
+    # unchanged usage is not recorded
+    w._sample()
+    used_blocks["/"] = 3000
+    w._sample()
+    used_blocks["/"] = 4000
+    w._sample()
+
+    report = w.get_usage_report()
+    # filesystems are watched only once
+    assert report["mounts"] == {
+        "root": {"paths": {"root": "/", "build_dir": "/build"},
+                 "mb_total": 100, "inodes_total": 100},
+        "tmp": {"paths": {"tmp": "/tmp"}, "mb_total": 100, "inodes_total": 100},
+    }
+    series = report["series"]
+    assert series["interval"] == w.interval
+    assert series["fields"] == [
+        "seconds", "root.mb_used", "root.inodes_used", "tmp.mb_used", "tmp.inodes_used",
+    ]
+    assert series["recorded"] == 2
+    assert [sample[1:] for sample in series["samples"]] == [[3, 3, 0, 0], [4, 4, 0, 0]]
+    assert series["samples"][0][0] <= series["samples"][1][0]
+    # the summary is not limited by the size of the ring buffer
+    assert report["summary"] == {
+        "root": {"mb_used": {"min": 1, "max": 4, "last": 4},
+                 "inodes_used": {"min": 1, "max": 4, "last": 4}},
+        "tmp": {"mb_used": {"min": 0, "max": 0, "last": 0},
+                "inodes_used": {"min": 0, "max": 0, "last": 0}},
+    }
+
+
+def test_fs_watcher_report_size(monkeypatch):
+    used_blocks = {"/": 0}
+    mock_statvfs(monkeypatch, used_blocks)
+    w = FSWatcher()
+
+    for used in range(1000, 100_000, 1000):
+        used_blocks["/"] = used
+        w._sample()
+    # usage drops, the peaks are kept in the downsampled series anyway
+    used_blocks["/"] = 0
+    w._sample()
+
+    report = w.get_usage_report(max_samples=10)
+    series = report["series"]
+    assert series["recorded"] == 100
+    assert len(series["samples"]) == 10
+    assert [sample[1] for sample in series["samples"]] == [
+        10, 20, 30, 40, 50, 60, 70, 80, 90, 99,
+    ]
+    # each sample has the time of the last change in its period
+    assert series["samples"][-1][0] == w._series[-1][0]
+    assert report["summary"]["root"]["mb_used"] == {"min": 0, "max": 99, "last": 0}
+    assert len(json.dumps(w.get_usage_report())) < 5000
+
+
 class TestTagConf:
     """Test class TagConf"""
 
@@ -522,6 +651,25 @@ class TestTagConf:
         assert actual == expected
 
 
+def read_saved_fields(context_dir: ContextDir) -> Dict[str, Any]:
+    data = json.loads(context_dir.workflow_json.read_text())
+    for name in ImageBuildWorkflowData.lazy_fields:
+        path = context_dir.get_workflow_field_json(name)
+        if path.exists():
+            data[name] = json.loads(path.read_text())
+    return data
+
+
+def write_saved_fields(context_dir: ContextDir, data: Dict[str, Any]) -> None:
+    main_data = {}
+    for name, value in data.items():
+        if name in ImageBuildWorkflowData.lazy_fields:
+            context_dir.get_workflow_field_json(name).write_text(json.dumps(value))
+        else:
+            main_data[name] = value
+    context_dir.workflow_json.write_text(json.dumps(main_data), encoding="utf-8")
+
+
 class TestWorkflowData:
     """Test class ImageBuildWorkflowData."""
 
@@ -584,14 +732,19 @@ class TestWorkflowData:
         data.plugins_results["plugin_1"] = "result"
         data.save(context_dir)
 
-        saved_data = json.loads(context_dir.workflow_json.read_bytes())
+        saved_data = read_saved_fields(context_dir)
         # Make data invalid
         graceful_chain_get(saved_data, *data_path, make_copy=False)[prop_name] = wrong_value
-        context_dir.workflow_json.write_text(json.dumps(saved_data), encoding="utf-8")
+        write_saved_fields(context_dir, saved_data)
 
         with pytest.raises(osbs.exceptions.OsbsValidationException):
             ImageBuildWorkflowData.load_from_dir(context_dir)
 
+        # data saved by older versions, as a single object
+        context_dir.workflow_json.write_text(json.dumps(saved_data), encoding="utf-8")
+        with pytest.raises(osbs.exceptions.OsbsValidationException):
+            ImageBuildWorkflowData.load_from_dir(context_dir)
+
     def test_save_and_load(self, tmpdir):
         """Test save workflow data and then load them back properly."""
         tag_conf = TagConf()
@@ -636,7 +789,7 @@ class TestWorkflowData:
         assert context_dir.workflow_json.exists()
 
         # Verify the saved data matches the schema
-        saved_data = json.loads(context_dir.workflow_json.read_bytes())
+        saved_data = read_saved_fields(context_dir)
         try:
             validate_with_schema(saved_data, "schemas/workflow_data.json")
         except osbs.exceptions.OsbsValidationException as e:
@@ -648,3 +801,104 @@ class TestWorkflowData:
         assert wf_data.dockerfile_images == loaded_wf_data.dockerfile_images
         assert wf_data.tag_conf == loaded_wf_data.tag_conf
         assert wf_data.plugins_results == loaded_wf_data.plugins_results
+
+    def test_load_data_saved_as_object(self, tmpdir):
+        """Test loading data saved by older versions, as a single object."""
+        context_dir = ContextDir(Path(tmpdir.join("context_dir").mkdir()))
+        wf_data = ImageBuildWorkflowData(dockerfile_images=DockerfileImages(["scratch"]))
+        wf_data.tag_conf.add_floating_image("registry/httpd:2.4")
+        wf_data.plugins_results["plugin_1"] = "result"
+        context_dir.workflow_json.write_text(
+            json.dumps(wf_data.as_dict(), cls=WorkflowDataEncoder), encoding="utf-8"
+        )
+
+        loaded_wf_data = ImageBuildWorkflowData.load_from_dir(context_dir)
+        assert loaded_wf_data == wf_data
+
+        # the data is rewritten in the current format
+        loaded_wf_data.save(context_dir)
+        assert "plugins_results" not in json.loads(context_dir.workflow_json.read_text())
+        assert read_saved_fields(context_dir) == json.loads(
+            json.dumps(wf_data.as_dict(), cls=WorkflowDataEncoder)
+        )
+
+    def test_load_missing_fields(self, tmpdir):
+        context_dir = ContextDir(Path(tmpdir.join("context_dir").mkdir()))
+        ImageBuildWorkflowData().save(context_dir)
+        saved_data = read_saved_fields(context_dir)
+        del saved_data["tag_conf"]
+        write_saved_fields(context_dir, saved_data)
+
+        with pytest.raises(osbs.exceptions.OsbsValidationException, match="tag_conf"):
+            ImageBuildWorkflowData.load_from_dir(context_dir)
+
+    def test_lazy_fields(self, tmpdir):
+        context_dir = ContextDir(Path(tmpdir.join("context_dir").mkdir()))
+        wf_data = ImageBuildWorkflowData()
+        wf_data.plugins_results["tag_and_push"] = [ImageName.parse("registry/image:latest")]
+        wf_data.koji_upload_files.append({"dest_filename": "x86_64-build.log"})
+        wf_data.save(context_dir)
+
+        loaded_wf_data = ImageBuildWorkflowData.load_from_dir(context_dir)
+        for name in ImageBuildWorkflowData.lazy_fields:
+            assert name not in vars(loaded_wf_data)
+
+        assert loaded_wf_data.plugins_results == wf_data.plugins_results
+        assert "plugins_results" in vars(loaded_wf_data)
+        assert "image_components" not in vars(loaded_wf_data)
+        # invalid lazy field is found when it is accessed
+        with pytest.raises(osbs.exceptions.OsbsValidationException):
+            loaded_wf_data.koji_upload_files
+
+        with pytest.raises(AttributeError):
+            loaded_wf_data.unknown_field
+
+    def test_save_changed_fields(self, tmpdir):
+        context_dir = ContextDir(Path(tmpdir.join("context_dir").mkdir()))
+        wf_data = ImageBuildWorkflowData()
+        wf_data.save(context_dir)
+
+        saved_files = [context_dir.workflow_json] + [
+            context_dir.get_workflow_field_json(name)
+            for name in sorted(ImageBuildWorkflowData.lazy_fields)
+        ]
+
+        def get_inodes():
+            # files are replaced when they are written
+            return {path.name: path.stat().st_ino for path in saved_files}
+
+        assert set(json.loads(context_dir.workflow_json.read_text())) == {
+            f.name for f in fields(ImageBuildWorkflowData)
+        } - ImageBuildWorkflowData.lazy_fields
+        inodes = get_inodes()
+
+        loaded_wf_data = ImageBuildWorkflowData.load_from_dir(context_dir)
+        loaded_wf_data.save(context_dir)
+        # nothing changed, nothing is written
+        assert get_inodes() == inodes
+
+        loaded_wf_data.plugins_results["plugin_a"] = "result"
+        loaded_wf_data.task_canceled = True
+        loaded_wf_data.save(context_dir)
+        new_inodes = get_inodes()
+        assert {name for name in inodes if inodes[name] != new_inodes[name]} == {
+            "workflow.json", "workflow.plugins_results.json",
+        }
+
+        reloaded_wf_data = ImageBuildWorkflowData.load_from_dir(context_dir)
+        assert reloaded_wf_data == loaded_wf_data
+
+    def test_saved_data_read_by_tekton_tasks(self, tmpdir):
+        """Test workflow.json can be read as the *-set-results tekton tasks do."""
+        context_dir = ContextDir(Path(tmpdir.join("context_dir").mkdir()))
+        wf_data = ImageBuildWorkflowData()
+        wf_data.plugins_results["plugin_a"] = "result"
+        wf_data.annotations["repositories"] = {"primary": ["registry/image:1.0"]}
+        wf_data.annotations["koji-build-id"] = "123"
+        wf_data.save(context_dir)
+
+        # jq -c '.annotations.repositories' workflow.json
+        # jq -c '.annotations["koji-build-id"]' workflow.json
+        saved_data = json.loads(context_dir.workflow_json.read_text())
+        assert saved_data["annotations"]["repositories"] == {"primary": ["registry/image:1.0"]}
+        assert saved_data["annotations"]["koji-build-id"] == "123"
@@ -5,15 +5,21 @@ All rights reserved.
 This software may be modified and distributed under the terms
 of the BSD license. See the LICENSE file for details.
 """
+import contextlib
+import importlib
 import os.path
+import signal
+import threading
 import time
 import inspect
 import sys
-from typing import Any, Dict, List, Final
+from typing import Any, Callable, Dict, List, Final, Optional, Sequence
 
 from flexmock import flexmock
 import pytest
+import responses
 
+from atomic_reactor import plugin as plugin_module
 from atomic_reactor.inner import DockerBuildWorkflow
 from atomic_reactor.plugin import (
     Plugin,
@@ -21,9 +27,12 @@ from atomic_reactor.plugin import (
     PluginFailedException,
     PluginsRunner,
     SleepPlugin,
+    TaskCanceledException,
 )
+from atomic_reactor.plugins import PLUGIN_MODULES
 from atomic_reactor.plugins.add_filesystem import AddFilesystemPlugin
 from atomic_reactor.plugins.tag_and_push import TagAndPushPlugin
+from atomic_reactor.utils.retries import get_retrying_requests_session
 
 from tests.constants import DOCKERFILE_GIT
 
@@ -75,7 +84,8 @@ def test_load_plugins(use_plugin_file, workflow):
     test loading plugins
     """
     plugins_files = [inspect.getfile(PushImagePlugin)] if use_plugin_file else []
-    runner = PluginsRunner(workflow, [], plugin_files=plugins_files)
+    plugins_conf = [{"name": AddFilesystemPlugin.key}, {"name": TagAndPushPlugin.key}]
+    runner = PluginsRunner(workflow, plugins_conf, plugin_files=plugins_files)
 
     assert runner.plugin_classes is not None
     assert len(runner.plugin_classes) > 0
@@ -83,12 +93,39 @@ def test_load_plugins(use_plugin_file, workflow):
     # Randomly verify the plugin existence
     assert AddFilesystemPlugin.key in runner.plugin_classes
     assert TagAndPushPlugin.key in runner.plugin_classes
+    # plugins which are not requested are not loaded
+    assert "verify_media" not in runner.plugin_classes
 
     if use_plugin_file:
         assert PushImagePlugin.key in runner.plugin_classes
         assert CleanupPlugin.key in runner.plugin_classes
 
 
+def test_load_plugins_not_indexed(workflow):
+    flexmock(plugin_module, PLUGIN_MODULES={})
+    runner = PluginsRunner(workflow, [{"name": AddFilesystemPlugin.key}])
+
+    assert AddFilesystemPlugin.key in runner.plugin_classes
+    assert "verify_media" in runner.plugin_classes
+
+
+def test_plugin_modules_index():
+    """PLUGIN_MODULES has to list all the built-in plugins"""
+    plugins_dir = os.path.dirname(inspect.getfile(AddFilesystemPlugin))
+    found = {}
+    for f in os.listdir(plugins_dir):
+        module_name, ext = os.path.splitext(f)
+        if ext != ".py" or module_name == "__init__":
+            continue
+        module = importlib.import_module(f"atomic_reactor.plugins.{module_name}")
+        for binding in vars(module).values():
+            if (inspect.isclass(binding) and issubclass(binding, Plugin) and
+                    binding.__module__ == module.__name__ and not inspect.isabstract(binding)):
+                found[binding.key] = module_name
+
+    assert found == PLUGIN_MODULES
+
+
 @pytest.mark.parametrize("plugins_conf,expected", [
     [[{"name": "cool_plugin", "required": False}], []],
     [
@@ -253,6 +290,32 @@ def test_store_plugin_result(workflow: DockerBuildWorkflow):
     assert "pushed" == runner.plugins_results[PushImagePlugin.key]
 
 
+def test_record_plugin_resources(workflow: DockerBuildWorkflow):
+    attributes = {}
+    span = flexmock(set_attribute=attributes.__setitem__)
+    (flexmock(plugin_module.tracer)
+     .should_receive("start_as_current_span")
+     .with_args(PushImagePlugin.key)
+     .and_return(contextlib.nullcontext(span))
+     .once())
+
+    runner = PluginsRunner(workflow, [{"name": PushImagePlugin.key}], plugin_files=[THIS_FILE])
+    runner.run()
+
+    assert PushImagePlugin.key in workflow.fs_watcher.get_usage_report()["plugins"]
+    resources = workflow.data.plugins_resources[PushImagePlugin.key]
+    for name in ("cpu_user_seconds", "cpu_system_seconds", "max_rss_increase_kib",
+                 "http_requests", "http_seconds", "disk_mb_used"):
+        assert name in resources
+    assert resources["cpu_user_seconds"] >= 0
+    assert resources["http_requests"] == 0
+    assert resources["concurrent_with"] == []
+    assert attributes == {
+        "duration_seconds": workflow.data.plugins_durations[PushImagePlugin.key],
+        **resources,
+    }
+
+
 @pytest.mark.parametrize("allow_plugin_fail", [True, False])
 def test_run_plugins_in_keep_going_mode(
         allow_plugin_fail: bool, workflow: DockerBuildWorkflow, caplog
@@ -283,3 +346,197 @@ def test_run_plugins_in_keep_going_mode(
     # The subsequent plug should get a chance to run after previous error.
     assert "continuing..." in caplog.text
     assert runner.plugins_results[CleanupPlugin.key] is None
+
+
+def make_plugin(
+        key: str,
+        reads: Optional[Sequence[str]] = None,
+        writes: Optional[Sequence[str]] = None,
+        action: Optional[Callable[[Plugin], Any]] = None,
+) -> PluginExecutionInfo:
+    def run(self):
+        return action(self) if action else key
+
+    plugin_class = type(key, (Plugin,), {"key": key, "reads": reads, "writes": writes,
+                                         "run": run})
+    return PluginExecutionInfo(plugin_name=key, plugin_class=plugin_class, conf={},
+                               is_allowed_to_fail=False)
+
+
+@pytest.mark.parametrize("declarations,expected", [
+    # nothing declared, plugins run in the configured order
+    ([(None, None), (None, None), (None, None)], [set(), {0}, {0, 1}]),
+    # independent plugins
+    ([((), ("a",)), ((), ("b",)), (("c",), ())], [set(), set(), set()]),
+    # read after write, write after read, write after write
+    ([((), ("a.x",)), (("a",), ()), ((), ("a.x",)), ((), ("a.x.y",))],
+     [set(), {0}, {0, 1}, {0, 1, 2}]),
+    # undeclared plugin in the middle is a barrier
+    ([((), ("a",)), (None, None), ((), ("b",))], [set(), {0}, {1}]),
+    # plugin results
+    ([((), ()), (("plugins_results.p0",), ()), (("plugins_results",), ())],
+     [set(), {0}, {0, 1}]),
+    # names must match whole components
+    ([((), ("build_dir",)), (("build_dirs",), ())], [set(), set()]),
+])
+def test_get_dependencies(declarations, expected, workflow: DockerBuildWorkflow):
+    runner = PluginsRunner(workflow, [])
+    plugins = [make_plugin(f"p{i}", reads, writes)
+               for i, (reads, writes) in enumerate(declarations)]
+
+    assert runner._get_dependencies(plugins) == expected
+
+
+def test_run_independent_plugins_concurrently(workflow: DockerBuildWorkflow):
+    barrier = threading.Barrier(2, timeout=10)
+    order = []
+
+    def wait_for_other(plugin):
+        barrier.wait()
+        order.append(plugin.key)
+        return plugin.key
+
+    runner = PluginsRunner(workflow, [])
+    runner.available_plugins = [
+        make_plugin("first", reads=(), writes=("a",), action=wait_for_other),
+        make_plugin("second", reads=(), writes=("b",), action=wait_for_other),
+        make_plugin("third", reads=("a", "b"), writes=(),
+                    action=lambda plugin: list(order)),
+    ]
+
+    results = runner.run()
+
+    assert results["first"] == "first"
+    assert results["second"] == "second"
+    # the dependent plugin runs after both are finished
+    assert sorted(results["third"]) == ["first", "second"]
+    for key in ("first", "second", "third"):
+        assert key in workflow.data.plugins_timestamps
+        assert key in workflow.data.plugins_durations
+
+
+@responses.activate
+def test_record_concurrent_plugins_resources(workflow: DockerBuildWorkflow):
+    api_url = "https://example.com/api"
+    responses.add(responses.GET, api_url, json={})
+    session = get_retrying_requests_session()
+    barrier = threading.Barrier(2, timeout=10)
+
+    def make_requests(count):
+        def action(plugin):
+            barrier.wait()
+            for _ in range(count):
+                session.get(api_url)
+            barrier.wait()
+        return action
+
+    runner = PluginsRunner(workflow, [])
+    runner.available_plugins = [
+        make_plugin("first", reads=(), writes=("a",), action=make_requests(2)),
+        make_plugin("second", reads=(), writes=("b",), action=make_requests(1)),
+        make_plugin("third", reads=("a", "b"), writes=(),
+                    action=lambda plugin: session.get(api_url)),
+    ]
+
+    runner.run()
+
+    resources = workflow.data.plugins_resources
+    # requests are counted per plugin, although the plugins overlap
+    assert {key: resources[key]["http_requests"] for key in resources} == {
+        "first": 2, "second": 1, "third": 1,
+    }
+    # the other values are process-wide, overlapping plugins are listed
+    assert resources["first"]["concurrent_with"] == ["second"]
+    assert resources["second"]["concurrent_with"] == ["first"]
+    assert resources["third"]["concurrent_with"] == []
+
+
+def test_run_conflicting_plugins_in_order(workflow: DockerBuildWorkflow):
+    main_thread = threading.current_thread()
+    threads = {}
+
+    def record_thread(plugin):
+        threads[plugin.key] = threading.current_thread()
+        return plugin.key
+
+    runner = PluginsRunner(workflow, [])
+    runner.available_plugins = [
+        make_plugin("writer", reads=(), writes=("a",), action=record_thread),
+        make_plugin("reader", reads=("plugins_results.writer", "a"), writes=(),
+                    action=lambda plugin: runner.plugins_results["writer"]),
+        make_plugin("undeclared", action=record_thread),
+    ]
+
+    results = runner.run()
+
+    assert results["reader"] == "writer"
+    # plugins which can't run along with others stay in the main thread
+    assert threads == {"writer": main_thread, "undeclared": main_thread}
+
+
+@pytest.mark.parametrize("keep_going", [True, False])
+def test_run_concurrent_plugins_failure(keep_going: bool, workflow: DockerBuildWorkflow):
+    barrier = threading.Barrier(2, timeout=10)
+
+    def fail(plugin):
+        barrier.wait()
+        raise IOError("no permission")
+
+    def finish_slowly(plugin):
+        barrier.wait()
+        time.sleep(0.1)
+        return "finished"
+
+    runner = PluginsRunner(workflow, [], keep_going=keep_going)
+    runner.available_plugins = [
+        make_plugin("failing", reads=(), writes=("a",), action=fail),
+        make_plugin("slow", reads=(), writes=("b",), action=finish_slowly),
+        make_plugin("dependent", reads=("a",), writes=()),
+    ]
+
+    with pytest.raises(PluginFailedException, match="no permission"):
+        runner.run()
+
+    assert "no permission" in workflow.data.plugins_errors["failing"]
+    # running plugin is allowed to finish
+    assert runner.plugins_results["slow"] == "finished"
+    assert "slow" in workflow.data.plugins_durations
+    if keep_going:
+        assert runner.plugins_results["dependent"] == "dependent"
+    else:
+        assert "dependent" not in runner.plugins_results
+
+
+def test_run_concurrent_plugins_canceled(monkeypatch, workflow: DockerBuildWorkflow):
+    monkeypatch.setattr(plugin_module, "PLUGINS_MAX_WORKERS", 1)
+    release = threading.Event()
+
+    def cancel_task(signum, frame):
+        raise TaskCanceledException("Tekton task was canceled")
+
+    def run_until_released(plugin):
+        # the signal may be delivered to this thread, not to the main one
+        os.kill(os.getpid(), signal.SIGTERM)
+        release.wait(10)
+        return "released"
+
+    runner = PluginsRunner(workflow, [])
+    runner.available_plugins = [
+        make_plugin("running", reads=(), writes=("a",), action=run_until_released),
+        make_plugin("queued", reads=(), writes=("b",)),
+    ]
+
+    original_handler = signal.signal(signal.SIGTERM, cancel_task)
+    try:
+        start = time.monotonic()
+        with pytest.raises(TaskCanceledException):
+            runner.run()
+        # the running plugin is not waited for
+        assert time.monotonic() - start < 5
+        assert not release.is_set()
+    finally:
+        signal.signal(signal.SIGTERM, original_handler)
+        release.set()
+
+    # the plugin waiting for a worker is never started
+    assert "queued" not in runner.plugins_results
@@ -0,0 +1,131 @@
+"""
+Copyright (c) 2026 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+import importlib.machinery
+import logging
+import sys
+
+import pytest
+from flexmock import flexmock
+
+from atomic_reactor import profiling
+from atomic_reactor.constants import PROFILE_STARTUP_ENV, PROFILE_STARTUP_OPTION
+from atomic_reactor.profiling import StartupProfiler
+
+
+@pytest.fixture
+def profiler():
+    profiler = StartupProfiler()
+    yield profiler
+    profiler.stop()
+
+
+@pytest.fixture
+def modules(tmp_path, monkeypatch):
+    """Package importing a module"""
+    package = tmp_path / "profiled_pkg"
+    package.mkdir()
+    (package / "__init__.py").write_text("from profiled_pkg import child\n")
+    (package / "child.py").write_text("VALUE = 42\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield
+    for name in ("profiled_pkg", "profiled_pkg.child"):
+        sys.modules.pop(name, None)
+
+
+@pytest.mark.usefixtures("modules")
+def test_record_imports(profiler):
+    profiler.start()
+    import profiled_pkg
+    profiler.stop()
+
+    assert profiled_pkg.child.VALUE == 42
+    # modules don't see the wrapping loader
+    assert isinstance(profiled_pkg.__loader__, importlib.machinery.SourceFileLoader)
+    assert isinstance(profiled_pkg.__spec__.loader, importlib.machinery.SourceFileLoader)
+
+    pkg_self, pkg_cumulative = profiler.imports["profiled_pkg"]
+    child_self, child_cumulative = profiler.imports["profiled_pkg.child"]
+    assert child_self == pytest.approx(child_cumulative)
+    assert pkg_cumulative >= child_cumulative
+    assert pkg_self == pytest.approx(pkg_cumulative - child_cumulative)
+
+
+@pytest.mark.usefixtures("modules")
+def test_stop(profiler):
+    profiler.start()
+    profiler.stop()
+    assert not any(isinstance(finder, profiling._TimingFinder) for finder in sys.meta_path)
+
+    import profiled_pkg  # noqa: F401
+
+    assert profiler.imports == {}
+
+
+def test_mark(profiler):
+    profiler.mark("disabled")
+    assert profiler.milestones == {}
+
+    profiler.start()
+    flexmock(profiler).should_receive("elapsed").and_return(1.0, 2.0).one_by_one()
+    profiler.mark("first")
+    profiler.mark("first")
+    profiler.mark("second")
+
+    assert profiler.milestones == {"first": 1.0, "second": 2.0}
+
+
+def test_summary(profiler):
+    profiler.imports = {
+        "koji": (0.5, 0.5),
+        "osbs": (0.1, 0.6),
+        "osbs.api": (0.3, 0.3),
+        "osbs.utils": (0.2, 0.2),
+    }
+    profiler.milestones = {"first_plugin": 2.0}
+
+    summary = profiler.summary(top=2)
+
+    assert summary["modules"] == 4
+    assert summary["import_time"] == pytest.approx(1.1)
+    assert list(summary["packages"]) == ["osbs", "koji"]
+    assert summary["packages"]["osbs"] == pytest.approx(0.6)
+    assert summary["slowest_modules"] == [
+        {"module": "koji", "self": 0.5, "cumulative": 0.5},
+        {"module": "osbs.api", "self": 0.3, "cumulative": 0.3},
+    ]
+    assert summary["milestones"] == {"first_plugin": 2.0}
+
+
+def test_finish(profiler, caplog):
+    profiler.start()
+    profiler.imports = {"koji": (0.5, 0.5)}
+    with caplog.at_level(logging.INFO, logger="atomic_reactor.profiling"):
+        profiler.finish()
+        # only the first call logs the profile
+        profiler.finish()
+
+    assert profiler._finder is None
+    assert caplog.text.count("startup profile: 1 modules imported in 0.500s") == 1
+    assert "importing koji took 0.500s" in caplog.text
+    assert "profile_finished at" in caplog.text
+
+
+@pytest.mark.parametrize("env_value, argv, expected", [
+    (None, ["atomic-reactor"], False),
+    ("0", ["atomic-reactor"], False),
+    ("1", ["atomic-reactor"], True),
+    (None, ["atomic-reactor", PROFILE_STARTUP_OPTION, "task"], True),
+])
+def test_profiling_requested(env_value, argv, expected, monkeypatch):
+    if env_value is None:
+        monkeypatch.delenv(PROFILE_STARTUP_ENV, raising=False)
+    else:
+        monkeypatch.setenv(PROFILE_STARTUP_ENV, env_value)
+    monkeypatch.setattr(sys, "argv", argv)
+
+    assert profiling.profiling_requested() == expected
@@ -6,6 +6,7 @@ This software may be modified and distributed under the terms
 of the BSD license. See the LICENSE file for details.
 """
 
+import hashlib
 import io
 import json
 import logging
@@ -34,13 +35,16 @@ from atomic_reactor.constants import (IMAGE_TYPE_DOCKER_ARCHIVE, IMAGE_TYPE_OCI,
                                       MEDIA_TYPE_DOCKER_V2_SCHEMA1, MEDIA_TYPE_DOCKER_V2_SCHEMA2,
                                       MEDIA_TYPE_DOCKER_V2_MANIFEST_LIST,
                                       DOCKERIGNORE, RELATIVE_REPOS_PATH,
+                                      REGISTRY_CACHE_TAG_TTL,
                                       )
 from atomic_reactor.util import (figure_out_build_file,
                                  render_yum_repo, process_substitutions,
-                                 get_checksums, print_version_of_tools,
+                                 get_checksums, get_checksums_for_files, ChecksumCache,
+                                 print_version_of_tools,
                                  get_version_of_tools,
                                  human_size, CommandResult,
                                  registry_hostname, Dockercfg, RegistrySession,
+                                 RegistryCache, registry_cache,
                                  get_manifest_digests, ManifestDigest,
                                  get_manifest_list, get_all_manifests,
                                  get_inspect_for_image, get_manifest,
@@ -210,6 +214,75 @@ def test_get_hexdigests(tmpdir, content, algorithms, expected, write_to_file, sh
         assert checksums == expected
 
 
+def test_get_checksums_large_file(tmpdir):
+    content = os.urandom(3 * 1024 * 1024 + 123)
+    path = tmpdir.join('large')
+    path.write_binary(content)
+
+    expected = {'md5sum': hashlib.md5(content).hexdigest(),
+                'sha256sum': hashlib.sha256(content).hexdigest()}
+    assert get_checksums(str(path), ['md5', 'sha256']) == expected
+    assert get_checksums(io.BytesIO(content), ['md5', 'sha256']) == expected
+
+
+def test_checksum_cache(tmpdir, monkeypatch):
+    cache = ChecksumCache(max_entries=2)
+    path = tmpdir.join('file')
+    path.write_binary(b'abc')
+
+    opened = []
+    real_open = open
+
+    def counting_open(file, *args, **kwargs):
+        opened.append(file)
+        return real_open(file, *args, **kwargs)
+
+    monkeypatch.setattr(atomic_reactor.util, 'open', counting_open, raising=False)
+
+    md5 = {'md5sum': '900150983cd24fb0d6963f7d28e17f72'}
+    assert cache.get_checksums(str(path), ['md5']) == md5
+    assert cache.get_checksums(str(path), ['md5']) == md5
+    assert len(opened) == 1
+
+    # only the missing checksum is computed
+    sha256 = 'ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad'
+    assert cache.get_checksums(str(path), ['sha256', 'md5']) == {'sha256sum': sha256, **md5}
+    assert cache.get_checksums(str(path), ['md5', 'sha256']) == {'sha256sum': sha256, **md5}
+    assert len(opened) == 2
+
+    # changed file gets new checksums
+    path.write_binary(b'abd')
+    assert cache.get_checksums(str(path), ['md5']) != md5
+    assert len(opened) == 3
+
+    # the oldest entries are dropped
+    for name in ('other1', 'other2'):
+        tmpdir.join(name).write_binary(b'abc')
+        assert cache.get_checksums(str(tmpdir.join(name)), ['md5']) == md5
+    assert len(cache._entries) == 2
+    cache.get_checksums(str(path), ['md5'])
+    assert len(opened) == 6
+
+
+def test_get_checksums_for_files(tmpdir):
+    atomic_reactor.util.checksum_cache.clear()
+    paths = []
+    for i in range(5):
+        path = tmpdir.join(f'file{i}')
+        path.write_binary(str(i).encode())
+        paths.append(str(path))
+
+    checksums = get_checksums_for_files(paths + paths[:1], ['md5'])
+
+    assert checksums == {
+        path: {'md5sum': hashlib.md5(str(i).encode()).hexdigest()}
+        for i, path in enumerate(paths)
+    }
+    assert get_checksums_for_files([], ['md5']) == {}
+    with pytest.raises(ValueError):
+        get_checksums_for_files(paths, ['sha1'])
+
+
 @pytest.mark.parametrize('image_type, expected', [
     (IMAGE_TYPE_DOCKER_ARCHIVE, 'docker-image-XXX.x86_64.tar.gz'),
     (IMAGE_TYPE_OCI_TAR, 'oci-image-XXX.x86_64.tar.gz'),
@@ -1749,6 +1822,187 @@ class TestRegistryClient(object):
         assert client.get_manifest_list_digest(image) == expected
 
 
+class TestRegistryCache(object):
+    """Tests for caching of registry responses"""
+
+    registry_url = 'https://reg.test'
+
+    def mock_manifest(self, reference, body='{"schemaVersion": 2}', status=200):
+        url = '{}/v2/namespace/fedora/manifests/{}'.format(self.registry_url, reference)
+        responses.add(responses.GET, url, body=body, status=status)
+        return url
+
+    @responses.activate
+    def test_digest_reference_is_cached(self):
+        digest = 'sha256:' + 'a' * 64
+        self.mock_manifest(digest)
+        session = RegistrySession(self.registry_url)
+        image = ImageName.parse('namespace/fedora:32')
+
+        first = atomic_reactor.util.query_registry(session, image, digest=digest, version='v2')
+        # another session (and client) for the same registry shares the cache
+        other_session = RegistrySession(self.registry_url)
+        second = atomic_reactor.util.query_registry(other_session, image, digest=digest,
+                                                    version='v2')
+
+        assert second is first
+        assert len(responses.calls) == 1
+        assert registry_cache.stats() == {'hits': 1, 'disk_hits': 0, 'misses': 1, 'entries': 1,
+                                          'size': len(first.content)}
+
+    @responses.activate
+    def test_tag_reference_expires(self):
+        self.mock_manifest('32')
+        session = RegistrySession(self.registry_url)
+        image = ImageName.parse('namespace/fedora:32')
+
+        flexmock(atomic_reactor.util.time).should_receive('monotonic').and_return(
+            100, 100 + REGISTRY_CACHE_TAG_TTL - 1, 100 + REGISTRY_CACHE_TAG_TTL + 1, 200
+        ).one_by_one()
+
+        for _ in range(3):
+            atomic_reactor.util.query_registry(session, image, version='v2')
+
+        # the third query happens after the cached response expired
+        assert len(responses.calls) == 2
+        assert (registry_cache.hits, registry_cache.misses) == (1, 2)
+
+    @responses.activate
+    def test_push_invalidates_tag_references(self):
+        digest = 'sha256:' + 'a' * 64
+        self.mock_manifest('32')
+        self.mock_manifest(digest)
+        url = self.mock_manifest('latest')
+        responses.add(responses.PUT, url)
+        session = RegistrySession(self.registry_url)
+        image = ImageName.parse('namespace/fedora:32')
+
+        atomic_reactor.util.query_registry(session, image, version='v2')
+        atomic_reactor.util.query_registry(session, image, digest=digest, version='v2')
+        session.put('/v2/namespace/fedora/manifests/latest', data='{}')
+        atomic_reactor.util.query_registry(session, image, version='v2')
+        atomic_reactor.util.query_registry(session, image, digest=digest, version='v2')
+
+        assert [call.request.url.rsplit('/', 1)[-1] for call in responses.calls] == [
+            '32', digest, 'latest', '32',
+        ]
+
+    @responses.activate
+    def test_responses_during_push_are_not_kept(self):
+        url = self.mock_manifest('32')
+        image = ImageName.parse('namespace/fedora:32')
+        session = RegistrySession(self.registry_url)
+
+        def query_while_pushing(request):
+            # e.g. a plugin running at the same time
+            atomic_reactor.util.query_registry(RegistrySession(self.registry_url), image,
+                                               version='v2')
+            return 201, {}, ''
+
+        responses.add_callback(responses.PUT, url, callback=query_while_pushing)
+        session.put('/v2/namespace/fedora/manifests/32', data='{}')
+        atomic_reactor.util.query_registry(session, image, version='v2')
+
+        # the query during the push is recorded first, when the push finishes
+        assert [call.request.method for call in responses.calls] == ['GET', 'PUT', 'GET']
+
+    @responses.activate
+    def test_cached_per_credentials(self, tmp_path):
+        digest = 'sha256:' + 'a' * 64
+        self.mock_manifest(digest)
+        image = ImageName.parse('namespace/fedora:32')
+
+        def make_session(name, credentials):
+            dockercfg_dir = tmp_path / name
+            dockercfg_dir.mkdir()
+            (dockercfg_dir / '.dockercfg').write_text(
+                json.dumps({registry_hostname(self.registry_url): credentials}))
+            return RegistrySession(self.registry_url, dockercfg_path=str(dockercfg_dir))
+
+        sessions = [
+            RegistrySession(self.registry_url),
+            make_session('first', {'username': 'john.doe', 'password': 'letmein'}),
+            make_session('second', {'username': 'john.doe', 'password': 'other'}),
+            # the same credentials
+            make_session('third', {'username': 'john.doe', 'password': 'letmein'}),
+        ]
+        for session in sessions:
+            atomic_reactor.util.query_registry(session, image, digest=digest, version='v2')
+
+        assert len(responses.calls) == 3
+        assert [call.request.headers.get('Authorization') is not None
+                for call in responses.calls] == [False, True, True]
+        assert registry_cache.stats()['hits'] == 1
+
+    @responses.activate
+    def test_errors_are_not_cached(self):
+        self.mock_manifest('32', status=404)
+        session = RegistrySession(self.registry_url)
+        image = ImageName.parse('namespace/fedora:32')
+
+        for _ in range(2):
+            with pytest.raises(HTTPError):
+                atomic_reactor.util.query_registry(session, image, version='v2')
+
+        assert len(responses.calls) == 2
+        assert registry_cache.stats()['entries'] == 0
+
+    @responses.activate
+    def test_persistent_dir(self, tmp_path):
+        digest = 'sha256:' + 'a' * 64
+        self.mock_manifest(digest, body='{"schemaVersion": 2, "digest": "%s"}' % digest)
+        registry_cache.persistent_dir = tmp_path
+        session = RegistrySession(self.registry_url)
+        image = ImageName.parse('namespace/fedora:32')
+
+        first = atomic_reactor.util.query_registry(session, image, digest=digest, version='v2')
+        # tag references are not stored on disk
+        self.mock_manifest('32')
+        atomic_reactor.util.query_registry(session, image, version='v2')
+        assert len(list(tmp_path.iterdir())) == 1
+
+        # e.g. a later task, starting with an empty in-memory cache
+        registry_cache.clear()
+        second = atomic_reactor.util.query_registry(session, image, digest=digest, version='v2')
+
+        assert len(responses.calls) == 2
+        assert second.content == first.content
+        assert second.json() == first.json()
+        assert second.headers == first.headers
+        assert registry_cache.stats()['disk_hits'] == 1
+
+    def test_persistent_dir_unreadable_file(self, tmp_path):
+        cache = RegistryCache()
+        cache.persistent_dir = tmp_path
+        cache.put(('a',), flexmock(url='u', status_code=200, headers={}, content=b'{}'),
+                  immutable=True)
+        for path in tmp_path.iterdir():
+            path.write_text('not json')
+
+        cache.clear()
+        assert cache.get(('a',), immutable=True) is None
+
+    def test_max_size(self):
+        cache = RegistryCache(max_size=10)
+
+        def response(content):
+            return flexmock(content=content)
+
+        cache.put(('a',), response(b'12345'), immutable=True)
+        cache.put(('b',), response(b'12345'), immutable=True)
+        # a is now the most recently used entry
+        assert cache.get(('a',)) is not None
+        cache.put(('c',), response(b'123'), immutable=True)
+        # too big to be cached at all
+        cache.put(('d',), response(b'12345678901'), immutable=True)
+
+        assert cache.get(('a',)) is not None
+        assert cache.get(('b',)) is None
+        assert cache.get(('c',)) is not None
+        assert cache.get(('d',)) is None
+        assert cache.stats() == {'hits': 3, 'disk_hits': 0, 'misses': 2, 'entries': 2, 'size': 8}
+
+
 @pytest.mark.parametrize(('source_registry', 'organization'), [
     (None, None),
     ('source_registry.com', None),
@@ -2026,3 +2280,121 @@ def test_safe_extractall_exception(tmpdir):
         # Specifically, 'Attempted path traversal in tar file'
         with pytest.raises(tarfile.ExtractError):
             safe_extractall(tar_handle, tmpdir_path)
+
+
+def add_tar_member(tar, name, type=tarfile.REGTYPE, content=b'', linkname='', mode=0o644):
+    member = tarfile.TarInfo(name)
+    member.type = type
+    member.linkname = linkname
+    member.mode = mode
+    member.size = len(content)
+    tar.addfile(member, io.BytesIO(content))
+
+
+def test_safe_extractall_stream(tmp_path):
+    archive = tmp_path / 'archive.tar.gz'
+    with tarfile.open(archive, 'w:gz') as tar:
+        # content of a read-only directory can be extracted
+        add_tar_member(tar, 'app', tarfile.DIRTYPE, mode=0o555)
+        add_tar_member(tar, 'app/file', content=b'content')
+        add_tar_member(tar, 'app/link', tarfile.SYMTYPE, linkname='file')
+        add_tar_member(tar, 'app/hardlink', tarfile.LNKTYPE, linkname='app/file')
+        add_tar_member(tar, 'app/up', tarfile.SYMTYPE, linkname='..')
+    dest = tmp_path / 'dest'
+
+    with tarfile.open(archive, 'r|gz') as tar:
+        result = safe_extractall(tar, str(dest))
+
+    assert (result.entries, result.bytes) == (5, len(b'content'))
+    assert (dest / 'app' / 'link').read_bytes() == b'content'
+    assert (dest / 'app' / 'hardlink').read_bytes() == b'content'
+    assert os.stat(dest / 'app').st_mode & 0o777 == 0o555
+    os.chmod(dest / 'app', 0o755)
+
+
+def test_safe_extractall_members(tmp_path):
+    archive = tmp_path / 'archive.tar'
+    with tarfile.open(archive, 'w') as tar:
+        add_tar_member(tar, 'wanted', content=b'content')
+        add_tar_member(tar, '../unwanted', content=b'content')
+
+    with tarfile.open(archive) as tar:
+        result = safe_extractall(tar, str(tmp_path / 'dest'), [tar.getmember('wanted')])
+
+    assert result.entries == 1
+    assert os.listdir(tmp_path / 'dest') == ['wanted']
+
+
+@pytest.mark.parametrize(('members', 'check_links'), [
+    ([('/etc/hosts', tarfile.REGTYPE, '')], False),
+    ([('../file', tarfile.REGTYPE, '')], False),
+    ([('link', tarfile.SYMTYPE, '/etc')], True),
+    ([('app/link', tarfile.SYMTYPE, '../..')], True),
+    ([('hardlink', tarfile.LNKTYPE, '../etc/hosts')], True),
+    # the links are inside when checked lexically, but not on the filesystem
+    ([('app/sub', tarfile.DIRTYPE, ''),
+      ('app/sub/up', tarfile.SYMTYPE, '..'),
+      ('app/sub/up/link', tarfile.SYMTYPE, '../..'),
+      ('app/sub/up/link/file', tarfile.REGTYPE, '')], False),
+    ([('app/sub', tarfile.DIRTYPE, ''),
+      ('app/sub/up', tarfile.SYMTYPE, '..'),
+      ('app/sub/up/link', tarfile.SYMTYPE, '../..')], True),
+    ([('link', tarfile.SYMTYPE, '.'),
+      ('link/link2', tarfile.SYMTYPE, '..'),
+      ('link/link2/file', tarfile.REGTYPE, '')], False),
+])
+def test_safe_extractall_path_traversal(tmp_path, members, check_links):
+    archive = tmp_path / 'archive.tar'
+    with tarfile.open(archive, 'w') as tar:
+        for name, member_type, linkname in members:
+            add_tar_member(tar, name, member_type, linkname=linkname)
+    dest = tmp_path / 'dest'
+    dest.mkdir()
+
+    with tarfile.open(archive, 'r|') as tar:
+        with pytest.raises(tarfile.ExtractError):
+            safe_extractall(tar, str(dest), check_links=check_links)
+
+    assert not (tmp_path / 'file').exists()
+    assert not (tmp_path / 'link').exists()
+    # nothing is left over from the extraction
+    assert os.listdir(dest) == []
+
+
+def test_safe_extractall_links_outside(tmp_path):
+    archive = tmp_path / 'archive.tar'
+    with tarfile.open(archive, 'w') as tar:
+        add_tar_member(tar, 'app/absolute', tarfile.SYMTYPE, linkname='/etc/hosts')
+        add_tar_member(tar, 'app/relative', tarfile.SYMTYPE, linkname='../../outside')
+    dest = tmp_path / 'dest'
+
+    # links aren't followed by the extraction, they are extracted unless check_links is set
+    with tarfile.open(archive) as tar:
+        result = safe_extractall(tar, str(dest))
+
+    assert result.entries == 2
+    assert os.readlink(dest / 'app' / 'absolute') == '/etc/hosts'
+    assert os.readlink(dest / 'app' / 'relative') == '../../outside'
+
+
+def test_safe_extractall_cleanup(tmp_path):
+    archive = tmp_path / 'archive.tar'
+    with tarfile.open(archive, 'w') as tar:
+        add_tar_member(tar, 'app', tarfile.DIRTYPE, mode=0o555)
+        add_tar_member(tar, 'app/file', content=b'content')
+        add_tar_member(tar, 'other/sub/file', content=b'content')
+        add_tar_member(tar, 'existing/file', content=b'content')
+        add_tar_member(tar, 'link', tarfile.SYMTYPE, linkname='app')
+        add_tar_member(tar, '../unsafe', content=b'content')
+    dest = tmp_path / 'dest'
+    (dest / 'existing').mkdir(parents=True)
+    (dest / 'existing' / 'kept').write_text('kept')
+
+    with tarfile.open(archive, 'r|') as tar:
+        with pytest.raises(tarfile.ExtractError):
+            safe_extractall(tar, str(dest))
+
+    # only the content which existed before the extraction is left
+    assert os.listdir(dest) == ['existing']
+    assert os.listdir(dest / 'existing') == ['kept']
+    assert not (tmp_path / 'unsafe').exists()
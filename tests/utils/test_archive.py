@@ -0,0 +1,118 @@
+"""
+Copyright (c) 2026 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+import gzip
+import io
+import os
+import random
+import tarfile
+
+import pytest
+
+from atomic_reactor.utils.archive import (ParallelGzipWriter, filter_tar_archive,
+                                          filter_tar_archive_in_place, split_member_path)
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("app/vendor/file", ("app", "vendor", "file")),
+    ("./app/vendor/", ("app", "vendor")),
+    ("/app//file", ("app", "file")),
+    (".", ()),
+])
+def test_split_member_path(name, expected):
+    assert split_member_path(name) == expected
+
+
+@pytest.mark.parametrize("size", [0, 10, 100000, 345678])
+def test_parallel_gzip_writer(size):
+    rand = random.Random(size)
+    data = bytes(rand.choice(b"abcdefgh ") for _ in range(size))
+    compressed = io.BytesIO()
+
+    with ParallelGzipWriter(compressed, block_size=50000, max_workers=2) as writer:
+        for i in range(0, size, 7777):
+            writer.write(data[i:i + 7777])
+
+    assert writer.closed
+    assert gzip.decompress(compressed.getvalue()) == data
+
+
+def test_parallel_gzip_writer_closed():
+    writer = ParallelGzipWriter(io.BytesIO())
+    writer.close()
+    writer.close()
+
+    with pytest.raises(ValueError):
+        writer.write(b"data")
+
+
+def create_archive(path, mode="w:gz"):
+    with tarfile.open(path, mode) as tar:
+        for name in ("app", "app/vendor", "deps"):
+            member = tarfile.TarInfo(name)
+            member.type = tarfile.DIRTYPE
+            tar.addfile(member)
+        for name in ("app/main.go", "app/vendor/lib.go", "deps/big"):
+            content = name.encode() * (1000 if name == "deps/big" else 1)
+            member = tarfile.TarInfo(name)
+            member.size = len(content)
+            tar.addfile(member, io.BytesIO(content))
+        link = tarfile.TarInfo("app/link")
+        link.type = tarfile.LNKTYPE
+        link.linkname = "deps/big"
+        tar.addfile(link)
+
+
+@pytest.mark.parametrize("mode", ["w", "w:gz", "w:bz2"])
+def test_filter_tar_archive(tmp_path, mode):
+    src = str(tmp_path / "src.tar")
+    dest = str(tmp_path / "dest.tar.gz")
+    create_archive(src, mode)
+
+    result = filter_tar_archive(src, dest, lambda member: member.name != "deps/big")
+
+    # the hard link to the removed file is removed as well
+    assert (result.kept, result.removed) == (5, 2)
+    assert result.removed_bytes == len(b"deps/big" * 1000)
+    # the new archive is one gzip stream, it can be read in stream mode
+    with tarfile.open(dest, "r|gz") as tar:
+        contents = {member.name: tar.extractfile(member).read() if member.isfile() else None
+                    for member in tar}
+    assert contents == {
+        "app": None,
+        "app/vendor": None,
+        "deps": None,
+        "app/main.go": b"app/main.go",
+        "app/vendor/lib.go": b"app/vendor/lib.go",
+    }
+
+
+def test_filter_tar_archive_in_place(tmp_path):
+    path = str(tmp_path / "archive.tar.gz")
+    create_archive(path)
+
+    result = filter_tar_archive_in_place(path, lambda member: not member.name.startswith("app"))
+
+    assert (result.kept, result.removed) == (2, 5)
+    with tarfile.open(path) as tar:
+        assert tar.getnames() == ["deps", "deps/big"]
+    assert os.listdir(tmp_path) == ["archive.tar.gz"]
+
+
+def test_filter_tar_archive_in_place_failure(tmp_path):
+    path = tmp_path / "archive.tar.gz"
+    create_archive(str(path))
+    original = path.read_bytes()
+
+    def keep(member):
+        raise RuntimeError("failed")
+
+    with pytest.raises(RuntimeError):
+        filter_tar_archive_in_place(str(path), keep)
+
+    assert path.read_bytes() == original
+    assert os.listdir(tmp_path) == ["archive.tar.gz"]
@@ -0,0 +1,70 @@
+"""
+Copyright (c) 2026 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+import pytest
+
+from atomic_reactor.utils.archive import split_member_path
+from atomic_reactor.utils.denylist import SourcesDenylistMatcher
+
+DENYLIST = ["/gomod/github.com/foo/bar", "/npm/lodash", "/npm/@scope/pkg", "/pip/requests"]
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("npm/lodash", True),
+    ("github.com/npm/lodash", True),
+    ("@npm/lodash", True),
+    ("xnpm/lodash", True),
+    ("npm/lodashx", False),
+    ("lodash", False),
+    ("gomod/github.com/foo/bar", True),
+    ("github.com/foo/bar", False),
+    ("npm/@scope/pkg", True),
+    ("", False),
+])
+def test_matches_name(name, expected):
+    assert SourcesDenylistMatcher(DENYLIST).matches_name(name) == expected
+
+
+def test_matches_name_empty_entry():
+    # an empty entry is a suffix of every name
+    assert SourcesDenylistMatcher(["/"]).matches_name("anything")
+    assert not SourcesDenylistMatcher([]).matches_name("anything")
+
+
+@pytest.mark.parametrize("path, expected_dir, expected_file", [
+    ("deps/npm/lodash", True, True),
+    ("deps/npm/lodash-4.17.21.tgz", False, True),
+    ("deps/npm/lodash-es-4.17.21.tgz", False, False),
+    ("deps/xnpm/lodash", False, False),
+    ("deps/npm/lodash/index.js", False, False),
+    ("deps/pip/requests-2.31.0.tar.gz", False, True),
+    ("deps/gomod/pkg/mod/github.com/foo/bar", False, False),
+    ("gomod/github.com/foo/bar", True, True),
+])
+def test_matches_path(path, expected_dir, expected_file):
+    matcher = SourcesDenylistMatcher(DENYLIST)
+    parts = split_member_path(path)
+
+    assert matcher.matches_dir(parts) == expected_dir
+    assert matcher.matches_file(parts) == expected_file
+
+
+@pytest.mark.parametrize("entry, path, expected", [
+    # entries are matched as plain string suffixes of '/' + path
+    ("/npm/lodash", "deps/npm/lodash", True),
+    ("/npm/lodash", "npm/lodash", True),
+    ("/npm/lodash", "deps/xnpm/lodash", False),
+    ("npm/lodash", "deps/xnpm/lodash", True),
+    ("/npm/lo", "deps/npm/lodash", False),
+    ("/npm/lodash/", "deps/npm/lodash", False),
+    ("/npm/./lodash", "deps/npm/lodash", False),
+])
+def test_matches_path_string_suffix(entry, path, expected):
+    matcher = SourcesDenylistMatcher([entry])
+    parts = split_member_path(path)
+
+    assert matcher.matches_dir(parts) == expected
@@ -769,6 +769,43 @@ def test_enforce_sandbox(file_tree, bad_symlink, tmp_path):
         enforce_sandbox(tmp_path, remove_unsafe_symlinks=True)
 
 
+@pytest.mark.parametrize("max_workers", [1, 3])
+def test_enforce_sandbox_large_tree(tmp_path, max_workers):
+    file_tree = {
+        f"dir{i}": {
+            f"subdir{j}": {"file": "foo", "symlink_ok": Symlink(f"../../dir{j}")}
+            for j in range(5)
+        }
+        for i in range(5)
+    }
+    file_tree["dir3"]["subdir4"]["deeper"] = {"symlink_bad": Symlink("../../../..")}
+    write_file_tree(file_tree, tmp_path)
+
+    error = "The destination of 'dir3/subdir4/deeper/symlink_bad' is outside of cloned repository"
+    with pytest.raises(SymlinkSandboxError, match=error):
+        enforce_sandbox(tmp_path, remove_unsafe_symlinks=False, max_workers=max_workers)
+
+    enforce_sandbox(tmp_path, remove_unsafe_symlinks=True, max_workers=max_workers)
+    assert not (tmp_path / "dir3/subdir4/deeper/symlink_bad").is_symlink()
+    assert (tmp_path / "dir3/subdir4/symlink_ok").is_symlink()
+
+
+def test_enforce_sandbox_resolves_only_symlinks(tmp_path):
+    file_tree = {"subdir": {"file": "foo", "symlink": Symlink("file")}, "file": "bar"}
+    write_file_tree(file_tree, tmp_path)
+    resolved = []
+    original_resolve = Path.resolve
+
+    def resolve(path, *args, **kwargs):
+        resolved.append(path)
+        return original_resolve(path, *args, **kwargs)
+
+    with mock.patch("pathlib.Path.resolve", autospec=True, side_effect=resolve):
+        enforce_sandbox(tmp_path)
+
+    assert resolved == [tmp_path / "subdir" / "symlink"]
+
+
 def test_enforce_sandbox_symlink_loop(tmp_path, caplog):
     file_tree = {"foo_b": Symlink("foo_a"), "foo_a": Symlink("foo_b")}
     write_file_tree(file_tree, tmp_path)
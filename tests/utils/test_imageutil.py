@@ -132,6 +132,57 @@ class TestImageUtil:
         with pytest.raises(ValueError, match=r"ImageName\(.*\) is not inspectable"):
             image_util.get_inspect_for_image(custom_image)
 
+    def test_get_inspect_for_images(self, df_images):
+        """Test that get_inspect_for_images inspects each (image, platform) pair once."""
+        image_util = imageutil.ImageUtil(df_images, self.config)
+        image_1 = ImageName.parse("registry.com/some-image:1")
+        image_2 = "registry.com/other-image:2"
+
+        inspected = []
+
+        def mock_inspect(image, platform=None):
+            inspected.append((str(image), platform))
+            return {"image": str(image), "platform": platform}
+
+        flexmock(image_util).should_receive("get_inspect_for_image").replace_with(mock_inspect)
+
+        results = image_util.get_inspect_for_images([
+            (image_1, None),
+            (image_1.to_str(), None),  # duplicate
+            (image_1, "x86_64"),
+            (image_2, None),
+        ])
+
+        assert len(inspected) == 3
+        assert set(inspected) == {
+            (image_1.to_str(), None),
+            (image_1.to_str(), "x86_64"),
+            (image_2, None),
+        }
+        assert results == {
+            (image_1.to_str(), None): {"image": image_1.to_str(), "platform": None},
+            (image_1.to_str(), "x86_64"): {"image": image_1.to_str(), "platform": "x86_64"},
+            (image_2, None): {"image": image_2, "platform": None},
+        }
+
+    def test_get_inspect_for_images_fills_cache(self, df_images):
+        """Test that the batch inspection results are cached for get_inspect_for_image."""
+        image_util = imageutil.ImageUtil(df_images, self.config)
+        image = ImageName.parse("registry.com/some-image:1")
+
+        self.mock_get_registry_client(image, expect_arch="amd64")
+
+        results = image_util.get_inspect_for_images([(image, "x86_64")])
+        assert results == {(image.to_str(), "x86_64"): self.inspect_data}
+        # the registry client mock expects exactly one call
+        assert image_util.get_inspect_for_image(image, "amd64") == self.inspect_data
+
+    def test_get_inspect_for_images_not_inspectable(self, df_images):
+        image_util = imageutil.ImageUtil(df_images, self.config)
+
+        with pytest.raises(ValueError, match="'koji/image-build' is not inspectable"):
+            image_util.get_inspect_for_images([("koji/image-build", None)])
+
     @pytest.mark.parametrize("platform", [None, "x86_64"])
     def test_base_image_inspect(self, platform, df_images):
         """Test that base_image_inspect just calls get_inspect_for_image with the right args."""
@@ -153,7 +204,10 @@ class TestImageUtil:
         assert image_util.base_image_inspect() == {}
 
     def test_get_registry_client(self):
-        """Test the method that makes a RegistryClient (other tests mock this method)."""
+        """Test the method that makes a RegistryClient (other tests mock this method).
+
+        The client is created only once for each registry.
+        """
         image_util = imageutil.ImageUtil(util.DockerfileImages([]), self.config)
 
         registry_session = flexmock()
@@ -171,7 +225,8 @@ class TestImageUtil:
             .once()
         )
 
-        image_util._get_registry_client("registry.com")
+        client = image_util._get_registry_client("registry.com")
+        assert image_util._get_registry_client("registry.com") is client
 
     def test_extract_file_from_image_non_empty_dst_dir(self, tmpdir):
         image_util = imageutil.ImageUtil(util.DockerfileImages([]), self.config)
@@ -455,3 +510,22 @@ class TestImageUtil:
                 ValueError, match="manifest.json file has multiple entries, expected only one"
         ):
             image_util.extract_filesystem_layer(src_path, dst_path)
+
+    def test_extract_filesystem_layer_link_outside(self, tmpdir):
+        image_util = imageutil.ImageUtil(util.DockerfileImages([]), self.config)
+        src_path = Path(tmpdir) / 'tarball.tar'
+        dst_path = Path(tmpdir) / 'dst'
+        manifest_file_content = b'[{"Config": "config.json", "Layers": ["layer.tar"]}]'
+
+        with tarfile.open(src_path, 'w') as tar:
+            manifest = tarfile.TarInfo('manifest.json')
+            manifest.size = len(manifest_file_content)
+            tar.addfile(manifest, io.BytesIO(manifest_file_content))
+            layer = tarfile.TarInfo('layer.tar')
+            layer.type = tarfile.SYMTYPE
+            layer.linkname = '/etc/hosts'
+            tar.addfile(layer)
+
+        with pytest.raises(tarfile.ExtractError):
+            image_util.extract_filesystem_layer(src_path, dst_path)
+        assert not (dst_path / 'layer.tar').exists()
@@ -20,7 +20,7 @@ from osbs.utils import ImageName
 from atomic_reactor.utils.koji import (koji_login, create_koji_session,
                                        TaskWatcher, tag_koji_build,
                                        get_koji_module_build, KojiUploadLogger,
-                                       get_output)
+                                       get_output, upload_file_resumable)
 from atomic_reactor.plugin import TaskCanceledException
 from atomic_reactor.constants import (KOJI_MAX_RETRIES,
                                       KOJI_OFFLINE_RETRY_INTERVAL,
@@ -429,6 +429,122 @@ class TestKojiUploadLogger(object):
             upload_logger.callback(offset, totalsize, step, 1.0, 1.0)
 
 
+def adler32(data):
+    return koji.util.adler32_constructor(data).hexdigest()
+
+
+class FakeUploadSession(object):
+    """Koji session keeping uploaded files in memory"""
+
+    def __init__(self, use_fast_upload=True, fail_at=()):
+        self.opts = {'use_fast_upload': use_fast_upload}
+        self.files = {}
+        # offsets of chunks which fail to upload, once each
+        self.fail_at = list(fail_at)
+        self.offsets = []
+
+    def rawUpload(self, chunk, offset, path, name, overwrite=False):
+        self.offsets.append(offset)
+        if offset in self.fail_at:
+            self.fail_at.remove(offset)
+            raise koji.GenericError('connection lost')
+        data = self.files.get((path, name), b'')
+        self.files[(path, name)] = data[:offset] + chunk
+        return {'size': len(chunk), 'hexdigest': adler32(chunk)}
+
+    def uploadWrapper(self, localfile, path, name=None, callback=None, blocksize=None):
+        with open(localfile, 'rb') as f:
+            self.files[(path, name)] = f.read()
+
+    def checkUpload(self, path, name, verify=None):
+        if (path, name) not in self.files:
+            return None
+        data = self.files[(path, name)]
+        return {'size': len(data), 'hexdigest': adler32(data) if verify else None}
+
+
+class TestUploadFileResumable(object):
+    CONTENT = b'0123456789'
+
+    @pytest.fixture
+    def local_file(self, tmpdir):
+        path = tmpdir.join('file.tar.gz')
+        path.write_binary(self.CONTENT)
+        return str(path)
+
+    @pytest.mark.parametrize(('fail_at', 'expected_offsets'), [
+        ([], [0, 3, 6, 9]),
+        # resumed where it failed
+        ([6], [0, 3, 6, 6, 9]),
+        ([0, 9], [0, 0, 3, 6, 9, 9]),
+    ])
+    def test_upload(self, local_file, fail_at, expected_offsets):
+        session = FakeUploadSession(fail_at=fail_at)
+        callback = flexmock()
+        callback.should_receive('callback').times(len(expected_offsets) - len(fail_at))
+
+        upload_file_resumable(session, local_file, 'server-dir', callback=callback.callback,
+                              blocksize=3)
+
+        assert session.files == {('server-dir', 'file.tar.gz'): self.CONTENT}
+        assert session.offsets == expected_offsets
+
+    def test_upload_empty_file(self, tmpdir):
+        local_file = tmpdir.join('empty')
+        local_file.write_binary(b'')
+        session = FakeUploadSession()
+
+        upload_file_resumable(session, str(local_file), 'server-dir', name='dest')
+
+        assert session.files == {('server-dir', 'dest'): b''}
+
+    def test_restart_if_uploaded_data_differs(self, local_file):
+        session = FakeUploadSession(fail_at=[6])
+        (flexmock(session)
+         .should_receive('checkUpload')
+         .and_return({'size': 6, 'hexdigest': adler32(b'abcdef')},
+                     {'size': 10, 'hexdigest': adler32(self.CONTENT)})
+         .one_by_one())
+
+        upload_file_resumable(session, local_file, 'server-dir', blocksize=3)
+
+        assert session.offsets == [0, 3, 6, 0, 3, 6, 9]
+        assert session.files == {('server-dir', 'file.tar.gz'): self.CONTENT}
+
+    def test_too_many_failures(self, local_file):
+        session = FakeUploadSession(fail_at=[3, 3, 3])
+
+        with pytest.raises(koji.GenericError, match='connection lost'):
+            upload_file_resumable(session, local_file, 'server-dir', blocksize=3, attempts=3)
+
+    def test_wrong_uploaded_size(self, local_file):
+        session = FakeUploadSession()
+        flexmock(session).should_receive('checkUpload').and_return({'size': 9})
+
+        with pytest.raises(koji.GenericError, match='wrong size'):
+            upload_file_resumable(session, local_file, 'server-dir')
+
+    def test_old_upload_api(self, local_file):
+        session = FakeUploadSession(use_fast_upload=False)
+        calls = []
+        upload_wrapper = session.uploadWrapper
+
+        def fail_once(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise koji.GenericError('connection lost')
+            upload_wrapper(*args, **kwargs)
+
+        session.uploadWrapper = fail_once
+
+        upload_file_resumable(session, local_file, 'server-dir', name='dest')
+
+        # the whole file is uploaded again
+        assert calls == [(local_file, 'server-dir')] * 2
+        assert session.files == {('server-dir', 'dest'): self.CONTENT}
+        assert session.offsets == []
+
+
 # Test whether extra.docker.parent_id should be set
 @pytest.mark.parametrize('from_scratch', [True, False])
 @pytest.mark.parametrize('no_v2_digest', [True, False])
@@ -24,6 +24,7 @@ from atomic_reactor.utils.operator import (
     OperatorCSV,
     OperatorManifest,
     NotOperatorCSV,
+    candidate_pullspec_heuristic,
     default_pullspec_heuristic,
     get_yaml_parser,
 )
@@ -190,6 +191,34 @@ SHA = "5d141ae1081640587636880dbe8489439353df883379158fa8742d5a3be75475"
 def test_pullspec_heuristic(text, expected):
     pullspecs = [text[i:j] for i, j in default_pullspec_heuristic(text)]
     assert pullspecs == expected
+    assert candidate_pullspec_heuristic(text) == default_pullspec_heuristic(text)
+
+
+@pytest.mark.parametrize("text", [
+    "--",
+    "-- a.b/c:1",
+    "::a.b/c:1:: ::",
+    "a.b/c:1/d.e/f:1",
+    "https://a.b/c:1",
+    "a.b/c@sha256:{sha}a".format(sha=SHA),
+    "a.b/c@sha256:{sha}:".format(sha=SHA),
+    "a.b/c:1@d.e/f:1",
+    "x" * 1000 + ".y/z:1",
+])
+def test_pullspec_heuristic_same_as_reference(text):
+    assert default_pullspec_heuristic(text) == candidate_pullspec_heuristic(text)
+
+
+def test_pullspec_heuristic_cache():
+    operator_module._scan_pullspecs.cache_clear()
+    text = "a.b/c:1, d.e/f:1"
+
+    pullspecs = default_pullspec_heuristic(text)
+    # callers get their own list
+    pullspecs.clear()
+
+    assert default_pullspec_heuristic(text) == [(0, 7), (9, 16)]
+    assert operator_module._scan_pullspecs.cache_info().hits == 1
 
 
 class PullSpec(object):
@@ -29,7 +29,7 @@ flexmock(backoff).should_receive("on_exception").and_return(_do_nothing_decorato
 
 
 from atomic_reactor.utils.remote_host import (  # noqa
-    SSHRetrySession, RemoteHost, RemoteHostsPool
+    SSHConnectionPool, SSHRetrySession, RemoteHost, RemoteHostsPool, SlotReadError
 )
 
 
@@ -67,6 +67,19 @@ def make_ssh_result(
     return None, out, err
 
 
+def make_inventory_ssh_result(*slots_content: str) -> Tuple[None, Mock, Mock]:
+    """ Produce a fake ssh result of reading all slots at once """
+    # newlines in the slot content are replaced by the remote command
+    stdout = "\n".join(f"{slot_id} {content.replace(chr(10), ' ')}"
+                       for slot_id, content in enumerate(slots_content))
+    return make_ssh_result(stdout=stdout)
+
+
+def inventory_cmd(slots_dir: str, slots: int) -> str:
+    return (f"for i in $(seq 0 {slots - 1}); do touch {slots_dir}/slot_$i && "
+            f"printf '%s %s\\n' $i \"$(tr '\\n' ' ' < {slots_dir}/slot_$i)\" || exit 1; done")
+
+
 def make_flock_ssh_result(
     stdout: str = "",
     stderr: str = "",
@@ -85,6 +98,7 @@ def make_flock_ssh_result(
 
     chan = flexmock()
     chan.should_receive("recv_exit_status").and_return(code)
+    chan.should_receive("close")
     out = flexmock(channel=chan)
     out.should_receive("read.decode.strip").and_return(stdout)
     out.should_receive("readline").and_return(stdout)
@@ -421,6 +435,9 @@ def test_pool_lock_resource(slot_content, expected_log, expected_result, failure
         if cmd == "mkdir -p /var/tmp/osbs_slots":
             return make_ssh_result()
 
+        if cmd == inventory_cmd("/var/tmp/osbs_slots", 3):
+            return make_inventory_ssh_result(slot_content, slot_content, slot_content)
+
         read_patt = re.compile(
             r"touch /var/tmp/osbs_slots/slot_.* && cat /var/tmp/osbs_slots/slot_.*"
         )
@@ -465,20 +482,17 @@ def test_pool_lock_resource(slot_content, expected_log, expected_result, failure
     ("pr123@2022-02-15T10:22:33.234234", "pr124@2022-02-15T10:22:33.234234", "", {2}, {0, 1}),
     ("pr123@2022-02-15T10:22:33.234234", "pr124@2022-02-15T10:22:33.234234",
      "pr124@2022-02-15T10:22:33.234234", set(), {0, 1, 2}),
+    # corrupted slot with more lines is free
+    ("pr123@2022-02-15T10:22:33.234234\ngarbage\n", "pr124@2022-02-15T10:22:33.234234", "",
+     {0, 2}, {1}),
 ))
 def test_available_and_occupied_slots(caplog, slot0, slot1, slot2, available, occupied):
     host = RemoteHost(hostname="remote-host-001", username="builder",
                       ssh_keyfile="/path/to/key", slots=3, socket_path=SOCKET_PATH)
 
     def mocked_command(cmd, *args, **kwargs):
-        if cmd == "touch /home/builder/osbs_slots/slot_0 && cat /home/builder/osbs_slots/slot_0":
-            return make_ssh_result(stdout=slot0)
-
-        if cmd == "touch /home/builder/osbs_slots/slot_1 && cat /home/builder/osbs_slots/slot_1":
-            return make_ssh_result(stdout=slot1)
-
-        if cmd == "touch /home/builder/osbs_slots/slot_2 && cat /home/builder/osbs_slots/slot_2":
-            return make_ssh_result(stdout=slot2)
+        if cmd == inventory_cmd("/home/builder/osbs_slots", 3):
+            return make_inventory_ssh_result(slot0, slot1, slot2)
 
         assert False, f"Unexpected command: {cmd}"
 
@@ -492,6 +506,63 @@ def test_available_and_occupied_slots(caplog, slot0, slot1, slot2, available, oc
     assert host.occupied_slots() == occupied
 
 
+@pytest.mark.parametrize(("stdout", "stderr", "code", "expected"), (
+    ("0 \n1 pr123@2022-02-15T10:22:33.234234\n2 invalid", "", 0,
+     {0: (None, None), 1: ("pr123", "2022-02-15T10:22:33.234234"), 2: ("invalid", "")}),
+    # content of multi-line slot is printed as a single line
+    ("0 pr123@2022-02-15T10:22:33.234234 garbage \n1 \n2 ", "", 0,
+     {0: ("pr123", "2022-02-15T10:22:33.234234 garbage"), 1: (None, None), 2: (None, None)}),
+    # lines which aren't "<slot_id> <content>" are skipped
+    ("0 \ngarbage\n\n7 pr123@2022-02-15T10:22:33.234234\n2 pr124@2022-02-15T10:22:33.234234",
+     "", 0,
+     {0: (None, None), 1: (None, None), 2: ("pr124", "2022-02-15T10:22:33.234234")}),
+    ("", "touch: cannot touch: Permission denied", 1, None),
+))
+def test_slots_inventory(stdout, stderr, code, expected):
+    host = RemoteHost(hostname="remote-host-001", username="builder",
+                      ssh_keyfile="/path/to/key", slots=3, socket_path=SOCKET_PATH)
+
+    (
+        flexmock(SSHRetrySession)
+        .should_receive("exec_command")
+        .with_args(inventory_cmd("/home/builder/osbs_slots", 3), timeout=int)
+        .and_return(make_ssh_result(stdout, stderr, code))
+        .once()
+    )
+
+    if expected is None:
+        with pytest.raises(SlotReadError, match=stderr):
+            host.slots_inventory()
+    else:
+        inventory = host.slots_inventory()
+        assert {slot_id: (data.prid, data.timestamp)
+                for slot_id, data in inventory.items()} == expected
+
+
+def test_pool_queries_all_hosts():
+    hosts = [
+        RemoteHost(hostname=f"remote-host-00{i}", username="builder",
+                   ssh_keyfile="/path/to/key", slots=2, socket_path=SOCKET_PATH)
+        for i in range(3)
+    ]
+    free_slots = {"remote-host-000": [0], "remote-host-001": [0, 1], "remote-host-002": []}
+    flexmock(RemoteHost).should_receive("is_operational").and_return(True)
+    for host in hosts:
+        (
+            flexmock(host)
+            .should_receive("available_slots")
+            .and_return(free_slots[host.hostname])
+            .once()
+        )
+    flexmock(hosts[1]).should_receive("lock").and_return(True).once()
+
+    pool = RemoteHostsPool(hosts, "x86_64")
+    locked = pool.lock_resource("pr123")
+
+    # the host with the highest ratio of available slots is used first
+    assert locked.host.hostname == "remote-host-001"
+
+
 @pytest.mark.parametrize(("slot0", "slot1", "slot2", "prid0", "prid1", "prid2"), (
     ("", "", "", None, None, None),
     ("pr123@2022-02-15T10:22:33.234234", "", "", "pr123", None, None),
@@ -525,3 +596,68 @@ def test_prid_in_slot(caplog, slot0, slot1, slot2, prid0, prid1, prid2):
     assert host.prid_in_slot(0) == prid0
     assert host.prid_in_slot(1) == prid1
     assert host.prid_in_slot(2) == prid2
+
+
+def make_ssh_client(alive: bool = True) -> Mock:
+    """ Produce a fake ssh client with an active or a broken transport """
+    transport = flexmock()
+    transport.should_receive("is_active").and_return(alive)
+    client = flexmock()
+    client.should_receive("get_transport").and_return(transport)
+    return client
+
+
+def test_connection_pool_reuses_connection():
+    client = make_ssh_client()
+    client.should_receive("close").never()
+    clients = iter([client])
+    pool = SSHConnectionPool(lambda: next(clients))
+
+    with pool.connection() as first:
+        assert first is client
+    with pool.connection() as second:
+        assert second is client
+
+
+def test_connection_pool_drops_broken_connection():
+    broken = make_ssh_client(alive=False)
+    broken.should_receive("close").once()
+    healthy = make_ssh_client()
+    clients = iter([broken, healthy])
+    pool = SSHConnectionPool(lambda: next(clients))
+
+    with pool.connection() as client:
+        assert client is broken
+    with pool.connection() as client:
+        assert client is healthy
+
+
+def test_connection_pool_evicts_idle_connections():
+    client = make_ssh_client()
+    client.should_receive("close").once()
+    new_client = make_ssh_client()
+    clients = iter([client, new_client])
+    (
+        flexmock(time)
+        .should_receive("monotonic")
+        .and_return(0)  # eviction before first acquire
+        .and_return(0)  # first connection released
+        .and_return(0)  # eviction after release
+        .and_return(200)  # eviction before second acquire
+    )
+    pool = SSHConnectionPool(lambda: next(clients), idle_timeout=120)
+
+    with pool.connection():
+        pass
+    with pool.connection() as second:
+        assert second is new_client
+
+
+def test_connection_pool_close():
+    client = make_ssh_client()
+    client.should_receive("close").once()
+    pool = SSHConnectionPool(lambda: client)
+
+    with pool.connection():
+        pass
+    pool.close()
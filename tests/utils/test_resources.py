@@ -0,0 +1,103 @@
+"""
+Copyright (c) 2026 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+import resource
+
+from flexmock import flexmock
+
+from atomic_reactor.utils import resources
+from atomic_reactor.utils.resources import ResourceUsage, read_proc_io
+
+PROC_IO = """\
+rchar: 4292
+wchar: 366
+syscr: 11
+syscw: 4
+read_bytes: 8192
+write_bytes: 4096
+cancelled_write_bytes: 0
+"""
+
+
+def test_read_proc_io(tmp_path):
+    io_file = tmp_path / "io"
+    io_file.write_text(PROC_IO)
+
+    counters = read_proc_io(str(io_file))
+
+    assert counters["read_bytes"] == 8192
+    assert counters["write_bytes"] == 4096
+    assert counters["cancelled_write_bytes"] == 0
+
+
+def test_read_proc_io_not_available(tmp_path):
+    assert read_proc_io(str(tmp_path / "missing")) == {}
+
+    io_file = tmp_path / "io"
+    io_file.write_text("garbage\n")
+    assert read_proc_io(str(io_file)) == {}
+
+
+def test_current_usage():
+    (flexmock(resource)
+     .should_receive("getrusage")
+     .with_args(resource.RUSAGE_SELF)
+     .and_return(flexmock(ru_utime=1.5, ru_stime=0.5, ru_maxrss=2048)))
+    (flexmock(resource)
+     .should_receive("getrusage")
+     .with_args(resource.RUSAGE_CHILDREN)
+     .and_return(flexmock(ru_utime=2.0, ru_stime=1.0, ru_maxrss=4096)))
+    flexmock(resources).should_receive("read_proc_io").and_return({"read_bytes": 10,
+                                                                  "write_bytes": 20})
+    (flexmock(resources)
+     .should_receive("current_http_stats")
+     .and_return(flexmock(snapshot=lambda: (3, 0.75))))
+
+    usage = ResourceUsage.current({"mb_used": 100, "inodes_used": 5})
+
+    assert usage == ResourceUsage(
+        cpu_user=3.5, cpu_system=1.5, max_rss=2048,
+        read_bytes=10, write_bytes=20,
+        http_requests=3, http_seconds=0.75,
+        disk_mb_used=100, disk_inodes_used=5,
+    )
+
+
+def test_current_usage_real():
+    usage = ResourceUsage.current()
+
+    assert usage.cpu_user > 0
+    assert usage.max_rss > 0
+    assert usage.disk_mb_used is None
+
+
+def test_since():
+    before = ResourceUsage(
+        cpu_user=1.0, cpu_system=0.5, max_rss=2048,
+        read_bytes=None, write_bytes=100,
+        http_requests=1, http_seconds=0.5,
+        disk_mb_used=100, disk_inodes_used=10,
+    )
+    after = ResourceUsage(
+        cpu_user=3.0, cpu_system=1.0, max_rss=3072,
+        read_bytes=50, write_bytes=300,
+        http_requests=4, http_seconds=2.0,
+        disk_mb_used=90, disk_inodes_used=20,
+    )
+
+    assert after.since(before) == {
+        "cpu_user_seconds": 2.0,
+        "cpu_system_seconds": 0.5,
+        "max_rss_increase_kib": 1024,
+        # read_bytes is not available before
+        "write_bytes": 200,
+        "http_requests": 3,
+        "http_seconds": 1.5,
+        "disk_mb_used": -10,
+        "disk_inodes_used": 10,
+    }
+    assert before.since(after)["max_rss_increase_kib"] == 0
@@ -6,8 +6,10 @@ This software may be modified and distributed under the terms
 of the BSD license. See the LICENSE file for details.
 """
 
+import contextvars
 import json
 import subprocess
+import threading
 import time
 
 import requests
@@ -91,6 +93,51 @@ def test_log_error_response(http_code, caplog):
         assert expected not in caplog.text
 
 
+@responses.activate
+def test_http_stats():
+    api_url = 'https://localhost/api/v1/foo'
+    responses.add(responses.GET, api_url, json={}, status=200)
+    requests_before, seconds_before = retries.http_stats.snapshot()
+
+    session = retries.get_retrying_requests_session()
+    session.get(api_url)
+    session.get(api_url)
+
+    requests_after, seconds_after = retries.http_stats.snapshot()
+    assert requests_after - requests_before == 2
+    assert seconds_after >= seconds_before
+
+
+@responses.activate
+def test_http_stats_scope():
+    api_url = 'https://localhost/api/v1/foo'
+    responses.add(responses.GET, api_url, json={}, status=200)
+    session = retries.get_retrying_requests_session()
+    requests_before, _ = retries.http_stats.snapshot()
+
+    with retries.http_stats_scope() as stats:
+        assert retries.current_http_stats() is stats
+        session.get(api_url)
+        # counted only when the thread runs in a copy of the context
+        threads = [
+            threading.Thread(target=session.get, args=(api_url,)),
+            threading.Thread(target=contextvars.copy_context().run, args=(session.get, api_url)),
+        ]
+        for thread in threads:
+            thread.start()
+            thread.join()
+
+        with retries.http_stats_scope() as inner_stats:
+            session.get(api_url)
+
+    session.get(api_url)
+
+    assert stats.snapshot()[0] == 2
+    assert inner_stats.snapshot()[0] == 1
+    assert retries.current_http_stats() is retries.http_stats
+    assert retries.http_stats.snapshot()[0] - requests_before == 5
+
+
 @pytest.mark.parametrize('retries_needed', [0, 1, SUBPROCESS_MAX_RETRIES])
 def test_run_cmd_success(retries_needed, caplog):
     cmd = ["skopeo", "copy", "docker://a", "docker://b"]